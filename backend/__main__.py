@@ -9,11 +9,46 @@ dotenv_path = os.path.join(project_root, '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
 # Now that the environment is loaded, import the app.
-from backend.app import app, db, socketio
+from backend.app import app, db, socketio, relay_worker_events
+from backend.analysis_runs import ANALYSIS_RUNS_RESUME_ON_STARTUP, resume_interrupted_runs
+from backend.batch_analysis import unfinished_batch_run_ids, wait_for_batch_run
+from backend.job_queue import queue_enabled
+from backend.schema import upgrade_schema
+
+def _is_serving_process():
+    # debug=True turns on werkzeug's reloader: this module then runs once in a watcher process
+    # and again in the child that serves requests. Background tasks belong only in the child.
+    return os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+
+def _resume_interrupted_runs():
+    with app.app_context():
+        for run_id, resumed in resume_interrupted_runs().items():
+            print(f"Resumed analysis run {run_id} ({resumed} resumes)")
+
+def _resume_batch_polling():
+    # A bulk run's poller lives in the process that submitted it, so runs outlive it across restarts.
+    with app.app_context():
+        run_ids = unfinished_batch_run_ids()
+    for run_id in run_ids:
+        print(f"Resumed polling bulk analysis run {run_id}")
+        socketio.start_background_task(wait_for_batch_run, run_id)
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+
+    # In queue mode uploads run on `python -m backend.worker`; their progress events are relayed from here.
+    if queue_enabled():
+        if _is_serving_process():
+            socketio.start_background_task(relay_worker_events)
+        else:
+            print("Uploads are queued for background workers; start them with `python -m backend.worker`.")
+    elif ANALYSIS_RUNS_RESUME_ON_STARTUP and _is_serving_process():
+        # Inline runs only ever run in this process, so any still marked running were interrupted.
+        socketio.start_background_task(_resume_interrupted_runs)
+    if _is_serving_process():
+        _resume_batch_polling()
     
     # Use SocketIO for development (supports WebSockets)
     # For production, you might want to use waitress with a separate WebSocket server
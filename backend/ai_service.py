@@ -1,5 +1,26 @@
 import os
+import json
 from openai import OpenAI
+from backend.json_stream import TopLevelFieldParser
+from backend.providers import get_provider
+from backend.rate_limiter import call_with_retry, call_once_async, estimate_request_tokens
+
+# Model used for full resume analysis by the OpenAI provider; see providers.py for the others.
+ANALYSIS_MODEL = "gpt-4o"
+# Typical size of an analysis response, used to reserve tokens-per-minute budget before a call.
+ANALYSIS_EXPECTED_OUTPUT_TOKENS = 1000
+
+# A faster, cheaper model for simple extraction tasks such as job titles.
+TITLE_MODEL = "gpt-3.5-turbo"
+# Returned when no title could be extracted.
+JOB_TITLE_NOT_FOUND = "Job Title Not Found"
+
+# Bump this whenever the analysis prompt or schema changes, so cached analyses
+# produced by an older prompt are no longer reused.
+PROMPT_VERSION = "2"
+
+# Stream analysis responses so headline fields (name, score) can be reported before the full analysis arrives.
+ANALYSIS_STREAMING = os.environ.get('ANALYSIS_STREAMING', 'true').lower() != 'false'
 
 # Global client instance, initialized to None.
 _client = None
@@ -10,87 +31,192 @@ def get_client():
     if _client is None:
         # This code will only run the first time get_client() is called.
         # By this time, the .env file will have been loaded by __main__.py.
-        _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # Retries are handled by backend.rate_limiter, which shares backoff across workers.
+        _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
     return _client
 
-def analyze_resume_with_ai(job_description, resume_text):
+def create_async_client(provider=None):
     """
-    Analyzes a single resume against a job description using the OpenAI API,
-    returning a rich, structured JSON analysis based on a detailed schema.
+    Creates a new async client for a provider (default: the configured one). Async clients are
+    bound to the event loop they are used on, so callers create one per loop and close it when they are done.
     """
-    client = get_client()
+    return get_provider(provider).create_async_client()
 
-    prompt = f"""
-You are an expert talent acquisition specialist with a keen eye for technical and professional roles. 
-Analyze the following resume against the provided job description and return a JSON object that strictly follows the specified schema.
+# The static part of the analysis prompt. It is sent first and never varies, so together with
+# the job description it forms a prefix the provider can cache across every resume of a job.
+ANALYSIS_SYSTEM_PROMPT = """You are a helpful assistant that provides analysis in a structured JSON format according to the user's schema.
+You are an expert talent acquisition specialist with a keen eye for technical and professional roles.
+Analyze the resume the user provides against the provided job description and return a JSON object that strictly follows the specified schema.
 
 **Output Schema:**
 Your entire response MUST be a single JSON object. Do not include any text outside of this JSON.
 The JSON must have the following structure:
-{{
+{
   "candidate_name": "The full name of the candidate as extracted from the resume. Make a best effort to find the name. If it is truly not available, return 'Name Not Found'.",
   "fit_score": "An integer from 0-100 representing the candidate's overall fit for the role.",
   "bucket": "A string categorizing the candidate. Choose from: '🚀 Green-Room Rocket' (top-tier, >90), '⚡ Book-the-Call' (strong candidate, 80-89), '🛠️ Bench Prospect' (potential but with gaps, 65-79), or '🗄️ Swipe-Left Archive' (not a fit, <65).",
   "reasoning": "A concise, one-sentence explanation for the assigned bucket and score.",
   "summary_points": ["An array of 2-3 string bullet points summarizing the candidate's key strengths and experiences relevant to the job."],
-  "skill_matrix": {{
+  "skill_matrix": {
     "matches": ["An array of strings listing skills from the job description that the candidate demonstrably has."],
     "gaps": ["An array of strings listing critical skills from the job description that appear to be missing."]
-  }},
+  },
   "timeline": [
-    {{
+    {
       "period": "e.g., 2022-Now",
       "role": "e.g., Sr. ML Eng, Acme AI",
       "details": "A brief but impactful summary of their accomplishment in that role."
-    }}
+    }
   ],
-  "logistics": {{
+  "logistics": {
     "compensation": "Extract desired compensation if available, otherwise 'Not specified'.",
     "notice_period": "Extract notice period if available, otherwise 'Not specified'.",
     "work_authorization": "Extract work authorization if available, otherwise 'Not specified'.",
     "location": "Extract current location or relocation preferences if available, otherwise 'Not specified'."
-  }}
-}}
+  }
+}
+"""
 
----
-**Job Description:**
+def build_analysis_messages(job_description, resume_text):
+    """
+    Builds the chat messages for a resume analysis request. The job description comes
+    before the resume so the prompt prefix stays identical for every resume of a job.
+    """
+    prompt = f"""**Job Description:**
 {job_description}
 ---
 **Resume:**
 {resume_text}
 ---
 """
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_packed_analysis_messages(job_description, resumes):
+    """
+    Builds one request that analyzes several (filename, resume_text) pairs. The system prompt
+    and job description come first, exactly as in single requests, so the cached prefix is shared.
+    """
+    prompt = f"""**Job Description:**
+{job_description}
+---
+"""
+    for filename, resume_text in resumes:
+        prompt += f"""**Resume ({filename}):**
+{resume_text}
+---
+"""
+    prompt += """Analyze each resume above separately against the job description.
+Return a single JSON object of the form {"analyses": [...]} with one object per resume, in the same order.
+Each object must follow the output schema and also include a "filename" field set to the resume's filename exactly as given.
+"""
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_packed_analyses(content, filenames):
+    """
+    Splits a packed response into {filename: analysis_json}. Analyses for unknown or repeated
+    filenames are dropped; resumes missing from the result are simply absent.
+    Raises ValueError if the response is not a JSON object with an "analyses" list.
+    """
+    data = json.loads(content)
+    analyses = data.get('analyses') if isinstance(data, dict) else None
+    if not isinstance(analyses, list):
+        raise ValueError("Packed analysis response has no 'analyses' list")
+    expected = set(filenames)
+    results = {}
+    for analysis in analyses:
+        if not isinstance(analysis, dict):
+            continue
+        filename = analysis.pop('filename', None)
+        if filename in expected and filename not in results:
+            results[filename] = json.dumps(analysis, ensure_ascii=False)
+    return results
+
+def analyze_resume_with_ai(job_description, resume_text, provider=None):
+    """
+    Analyzes a single resume against a job description with the given (or configured)
+    provider, returning a rich, structured JSON analysis based on a detailed schema.
+    Throttling and transient errors are retried under the shared rate limiter; if the
+    analysis still fails, the returned JSON carries "error": True so it is never saved as a score.
+    """
+    messages = build_analysis_messages(job_description, resume_text)
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides analysis in a structured JSON format according to the user's schema."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
+        provider = get_provider(provider)
+        model = provider.analysis_model
+        response = call_with_retry(
+            lambda: provider.complete(messages, model, json_output=True),
+            model,
+            estimate_request_tokens(messages, ANALYSIS_EXPECTED_OUTPUT_TOKENS),
+            limiter=provider.rate_limiter(model)
         )
-        return response.choices[0].message.content
+        return response.content
     except Exception as e:
         print(f"An error occurred during AI analysis: {e}")
-        error_response = {{
-            "fit_score": 0,
+        error_response = {
+            "error": True,
+            "error_details": str(e),
             "bucket": "Error",
             "reasoning": "An error occurred during analysis.",
             "summary_points": [],
-            "skill_matrix": {{"matches": [], "gaps": []}},
+            "skill_matrix": {"matches": [], "gaps": []},
             "timeline": [],
-            "logistics": {{}}
-        }}
-        import json
+            "logistics": {}
+        }
         return json.dumps(error_response)
 
-def extract_job_title_with_ai(job_description):
+async def analyze_resume_with_ai_async(job_description, resume_text, client, on_field=None, provider=None):
     """
-    Analyzes a job description using the OpenAI API to extract just the job title.
+    Async counterpart of analyze_resume_with_ai, using a client from create_async_client(provider).
+    The call waits for the shared rate limiter; errors are raised to the caller,
+    which decides whether to retry or skip the resume.
+    With on_field, the response is streamed and on_field(key, value) is called for
+    each top-level field of the analysis as soon as it is complete.
     """
-    client = get_client()
+    provider = get_provider(provider)
+    model = provider.analysis_model
+    messages = build_analysis_messages(job_description, resume_text)
+    on_delta = None
+    if on_field is not None:
+        parser = TopLevelFieldParser()
 
+        def on_delta(text):
+            for key, value in parser.feed(text):
+                on_field(key, value)
+
+    response = await call_once_async(
+        lambda: provider.complete_async(client, messages, model, json_output=True, on_delta=on_delta),
+        model,
+        estimate_request_tokens(messages, ANALYSIS_EXPECTED_OUTPUT_TOKENS),
+        limiter=provider.rate_limiter(model)
+    )
+    return response.content
+
+async def analyze_resume_pack_async(job_description, resumes, client, provider=None):
+    """
+    Analyzes several (filename, resume_text) pairs in one request. Returns {filename: analysis_json}
+    for the resumes the model answered; errors, including a malformed response, are raised.
+    """
+    provider = get_provider(provider)
+    model = provider.analysis_model
+    messages = build_packed_analysis_messages(job_description, resumes)
+    response = await call_once_async(
+        lambda: provider.complete_async(client, messages, model, json_output=True),
+        model,
+        estimate_request_tokens(messages, ANALYSIS_EXPECTED_OUTPUT_TOKENS * len(resumes)),
+        limiter=provider.rate_limiter(model)
+    )
+    return parse_packed_analyses(response.content, [filename for filename, _ in resumes])
+
+def extract_job_title_with_ai(job_description, provider=None):
+    """
+    Analyzes a job description with the given (or configured) provider to extract just the job title.
+    """
     prompt = f"""
 Please analyze the following job description and extract the official job title.
 Return only the job title and nothing else.
@@ -103,18 +229,22 @@ For example, if the description says "We are looking for a Senior Software Engin
 **Job Title:**
 """
 
+    messages = [
+        {"role": "system", "content": "You are an assistant that extracts specific information."},
+        {"role": "user", "content": prompt}
+    ]
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Using a faster, cheaper model for this simple task
-            messages=[
-                {"role": "system", "content": "You are an assistant that extracts specific information."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            max_tokens=50
+        provider = get_provider(provider)
+        model = provider.title_model
+        response = call_with_retry(
+            lambda: provider.complete(messages, model, max_tokens=50, temperature=0),
+            model,
+            estimate_request_tokens(messages, 50),
+            limiter=provider.rate_limiter(model)
         )
         # Strip any potential leading/trailing whitespace or quotes
-        return response.choices[0].message.content.strip().strip('"')
+        return response.content.strip().strip('"')
     except Exception as e:
         print(f"An error occurred during job title extraction: {e}")
-        return "Job Title Not Found" 
\ No newline at end of file
+        return JOB_TITLE_NOT_FOUND 
\ No newline at end of file
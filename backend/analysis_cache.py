@@ -0,0 +1,143 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from backend.ai_service import ANALYSIS_MODEL, PROMPT_VERSION
+from backend.cache_util import CacheStats, chunked, evict_least_recently_used, lifetime_hits, touch_entries
+
+# Cache settings can be tuned per deployment through environment variables.
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', 20000))
+ANALYSIS_CACHE_MAX_AGE_DAYS = int(os.environ.get('ANALYSIS_CACHE_MAX_AGE_DAYS', 30))
+
+_stats = CacheStats()
+
+
+def hash_text(text):
+    """Returns the SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_cache_key(job_description, content_hash, model=ANALYSIS_MODEL, prompt_version=PROMPT_VERSION):
+    """
+    Builds the cache key for an analysis. Any change to the job description,
+    the resume content, the model or the prompt version produces a new key.
+    """
+    raw_key = f"{hash_text(job_description)}:{content_hash}:{model}:{prompt_version}"
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+def _expiry_cutoff():
+    return datetime.utcnow() - timedelta(days=ANALYSIS_CACHE_MAX_AGE_DAYS)
+
+
+def get_cached_analyses(cache_keys):
+    """
+    Looks up many cache keys at once and returns a dict of cache_key -> analysis JSON
+    for every fresh entry. Must be called inside an app context.
+    """
+    from backend.app import db, AnalysisCacheEntry
+
+    cache_keys = list(set(cache_keys))
+    if not cache_keys:
+        return {}
+
+    cutoff = _expiry_cutoff()
+    hits = []
+    for chunk in chunked(cache_keys):
+        hits.extend(AnalysisCacheEntry.query.filter(
+            AnalysisCacheEntry.cache_key.in_(chunk),
+            AnalysisCacheEntry.created_at >= cutoff
+        ).all())
+    found = {entry.cache_key: entry.analysis for entry in hits}
+    touch_entries(db, hits, 'analysis')
+
+    _stats.bump('hits', len(found))
+    _stats.bump('misses', len(cache_keys) - len(found))
+    return found
+
+
+def store_analyses(entries):
+    """
+    Stores fresh analyses in the cache. Each entry is a dict with 'job_description',
+    'content_hash', 'analysis_json' and optionally the 'model' that produced it
+    (default ANALYSIS_MODEL). Existing keys are left untouched.
+    Must be called inside an app context.
+    """
+    from backend.app import db, AnalysisCacheEntry
+
+    new_entries = {}
+    for entry in entries:
+        model = entry.get('model', ANALYSIS_MODEL)
+        cache_key = make_cache_key(entry['job_description'], entry['content_hash'], model=model)
+        new_entries[cache_key] = AnalysisCacheEntry(
+            cache_key=cache_key,
+            job_description_hash=hash_text(entry['job_description']),
+            content_hash=entry['content_hash'],
+            model=model,
+            prompt_version=PROMPT_VERSION,
+            analysis=entry['analysis_json']
+        )
+    if not new_entries:
+        return 0
+
+    for chunk in chunked(list(new_entries)):
+        existing = db.session.query(AnalysisCacheEntry.cache_key).filter(
+            AnalysisCacheEntry.cache_key.in_(chunk)
+        ).all()
+        for (cache_key,) in existing:
+            new_entries.pop(cache_key, None)
+
+    if not new_entries:
+        return 0
+
+    try:
+        db.session.add_all(new_entries.values())
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to store analyses in cache: {e}")
+        return 0
+
+    _stats.bump('stores', len(new_entries))
+    evict_stale_entries()
+    return len(new_entries)
+
+
+def evict_stale_entries():
+    """
+    Deletes entries older than the maximum age, then the least recently used
+    entries above the maximum cache size. Returns the number of deleted rows.
+    """
+    from backend.app import db, AnalysisCacheEntry
+
+    try:
+        deleted = AnalysisCacheEntry.query.filter(
+            AnalysisCacheEntry.created_at < _expiry_cutoff()
+        ).delete(synchronize_session=False)
+        deleted += evict_least_recently_used(db, AnalysisCacheEntry, ANALYSIS_CACHE_MAX_ENTRIES)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to evict analysis cache entries: {e}")
+        return 0
+
+    _stats.bump('evictions', deleted)
+    return deleted
+
+
+def get_cache_stats():
+    """Returns process-level hit/miss counters together with persisted cache totals."""
+    from backend.app import db, AnalysisCacheEntry
+
+    stats = _stats.snapshot()
+    stats['entries'] = AnalysisCacheEntry.query.count()
+    stats['lifetime_hits'] = lifetime_hits(db, AnalysisCacheEntry)
+    stats['max_entries'] = ANALYSIS_CACHE_MAX_ENTRIES
+    stats['max_age_days'] = ANALYSIS_CACHE_MAX_AGE_DAYS
+    stats['model'] = ANALYSIS_MODEL
+    stats['prompt_version'] = PROMPT_VERSION
+    return stats
+
+
+def reset_cache_stats():
+    """Resets the in-process counters."""
+    _stats.reset()
@@ -0,0 +1,253 @@
+import json
+import os
+
+from sqlalchemy import update
+from sqlalchemy.orm import undefer
+
+from backend.ingestion import resume_content
+from backend.progress import resume_progress, record_progress, withdraw_progress
+
+# Runs are recorded in chunks of this many resumes.
+ANALYSIS_RUN_INSERT_CHUNK = 500
+# In inline execution mode the web server continues interrupted runs when it starts.
+ANALYSIS_RUNS_RESUME_ON_STARTUP = os.environ.get('ANALYSIS_RUNS_RESUME_ON_STARTUP', 'true').lower() == 'true'
+
+UNFINISHED_ITEM_STATUSES = ('pending', 'analyzing')
+
+
+def start_run(job_id, resumes_data, use_cache=True, prefilter=None, provider=None, max_concurrency=None):
+    """
+    Records a run with one pending item per resume. Returns (run, resumes_data), where the resume
+    dicts carry the 'run_item_id' that process_job_resumes checkpoints against.
+    Must be called inside an app context.
+    """
+    from backend.app import db, AnalysisRun, AnalysisRunItem
+
+    run = AnalysisRun(
+        job_id=job_id,
+        use_cache=use_cache,
+        provider=provider,
+        prefilter=json.dumps(prefilter) if prefilter else None,
+        total_items=len(resumes_data),
+        max_concurrency=max_concurrency,
+    )
+    db.session.add(run)
+    db.session.flush()
+    tracked = []
+    for start in range(0, len(resumes_data), ANALYSIS_RUN_INSERT_CHUNK):
+        chunk = resumes_data[start:start + ANALYSIS_RUN_INSERT_CHUNK]
+        items = [
+            AnalysisRunItem(
+                run_id=run.id,
+                filename=rd['filename'],
+                content=resume_content(rd),
+                content_hash=rd['content_hash'],
+                simhash=rd.get('simhash'),
+            )
+            for rd in chunk
+        ]
+        db.session.add_all(items)
+        db.session.flush()
+        tracked.extend(dict(rd, run_item_id=item.id) for rd, item in zip(chunk, items))
+        for item in items:
+            db.session.expunge(item)
+    db.session.commit()
+    return run, tracked
+
+
+def mark_items(item_ids, status, error=None):
+    """Checkpoints items. Saved ('done') items drop their copy of the resume text."""
+    from backend.app import db, AnalysisRunItem
+
+    item_ids = [item_id for item_id in item_ids if item_id is not None]
+    if not item_ids:
+        return
+    values = {'status': status, 'error': error}
+    if status == 'done':
+        values['content'] = None
+    elif status == 'analyzing':
+        values['attempts'] = AnalysisRunItem.attempts + 1
+    try:
+        for start in range(0, len(item_ids), ANALYSIS_RUN_INSERT_CHUNK):
+            db.session.execute(
+                update(AnalysisRunItem)
+                .where(AnalysisRunItem.id.in_(item_ids[start:start + ANALYSIS_RUN_INSERT_CHUNK]))
+                .values(**values)
+            )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to checkpoint {len(item_ids)} run items as {status}: {e}")
+
+
+def item_counts(run_id):
+    """Returns {status: count} for a run's items."""
+    from backend.app import db, AnalysisRunItem
+
+    counts = {'pending': 0, 'analyzing': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+    counts.update(dict(
+        db.session.query(AnalysisRunItem.status, db.func.count(AnalysisRunItem.id))
+        .filter_by(run_id=run_id).group_by(AnalysisRunItem.status).all()
+    ))
+    return counts
+
+
+def finish_run(run_id):
+    """
+    Marks a run complete once none of its items are waiting any more, or cancelled (with its
+    unfinished items) if cancellation was requested. Returns the item counts.
+    """
+    from backend.app import db, AnalysisRun, AnalysisRunItem
+
+    run = db.session.get(AnalysisRun, run_id)
+    if run.status == 'cancelling':
+        unfinished = db.session.query(AnalysisRunItem.id).filter(
+            AnalysisRunItem.run_id == run_id, AnalysisRunItem.status.in_(UNFINISHED_ITEM_STATUSES)
+        )
+        mark_items([item_id for (item_id,) in unfinished], 'cancelled')
+        run = db.session.get(AnalysisRun, run_id)
+        run.status = 'cancelled'
+        db.session.commit()
+        return item_counts(run_id)
+
+    counts = item_counts(run_id)
+    if not any(counts[status] for status in UNFINISHED_ITEM_STATUSES):
+        run.status = 'complete'
+        db.session.commit()
+    return counts
+
+
+def supersede_runs(run_ids):
+    """
+    Closes out runs left behind by an earlier attempt at a queued upload that is being processed
+    again. Their saved resumes are kept (the new attempt skips them as duplicates); their unfinished
+    items are cancelled and taken off the job's progress, since the new attempt counts them afresh.
+    Returns the number of runs closed.
+    """
+    from backend.app import db, AnalysisRun, AnalysisRunItem
+
+    runs = AnalysisRun.query.filter(AnalysisRun.id.in_(run_ids), AnalysisRun.status.in_(('running', 'cancelling'))).all()
+    for run in runs:
+        unfinished = [
+            item_id for (item_id,) in db.session.query(AnalysisRunItem.id).filter(
+                AnalysisRunItem.run_id == run.id, AnalysisRunItem.status.in_(UNFINISHED_ITEM_STATUSES)
+            )
+        ]
+        run.status = 'superseded'
+        db.session.commit()
+        mark_items(unfinished, 'cancelled')
+        withdraw_progress(run.job_id, len(unfinished))
+    return len(runs)
+
+
+def run_controls(run_id):
+    """What a running analysis polls for: {'cancelled': bool, 'max_concurrency': int or None}."""
+    from backend.app import db, AnalysisRun
+
+    row = db.session.query(AnalysisRun.status, AnalysisRun.max_concurrency).filter(AnalysisRun.id == run_id).first()
+    if row is None:
+        # The run was deleted with its job.
+        return {'cancelled': True, 'max_concurrency': None}
+    return {'cancelled': row.status in ('cancelling', 'cancelled'), 'max_concurrency': row.max_concurrency}
+
+
+def request_cancel(job_id):
+    """Asks every running run of the job to stop. Returns the number of runs affected."""
+    from backend.app import db, AnalysisRun
+
+    cancelled = AnalysisRun.query.filter_by(job_id=job_id, status='running').update(
+        {'status': 'cancelling'}, synchronize_session=False
+    )
+    db.session.commit()
+    return cancelled
+
+
+def delete_job_runs(job_id):
+    """
+    Deletes the job's runs and their items, for when the job itself is deleted; the caller commits.
+    A run still analyzing stops at its next poll. Returns the number of runs deleted.
+    """
+    from backend.app import db, AnalysisRun, AnalysisRunItem
+
+    run_ids = db.select(AnalysisRun.id).where(AnalysisRun.job_id == job_id)
+    AnalysisRunItem.query.filter(AnalysisRunItem.run_id.in_(run_ids)).delete(synchronize_session=False)
+    return AnalysisRun.query.filter(AnalysisRun.job_id == job_id).delete(synchronize_session=False)
+
+
+def set_max_concurrency(job_id, max_concurrency):
+    """Changes the concurrency cap of the job's running runs; they pick it up within a poll interval."""
+    from backend.app import db, AnalysisRun
+
+    updated = AnalysisRun.query.filter(
+        AnalysisRun.job_id == job_id, AnalysisRun.status == 'running'
+    ).update({'max_concurrency': max_concurrency}, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+
+def resume_run(run_id, retry_failed=False):
+    """
+    Continues a run: only its pending and interrupted items are analyzed again (and, with
+    retry_failed, the failed ones). Items whose resume was saved before the interruption are
+    marked done without a new analysis. Returns the number of resumes sent for analysis.
+    """
+    from backend.app import db, AnalysisRun, AnalysisRunItem, Resume, check_job_completion
+    from backend.tasks import process_job_resumes
+
+    run = db.session.get(AnalysisRun, run_id)
+    if run is None:
+        return 0
+    statuses = UNFINISHED_ITEM_STATUSES + (('failed',) if retry_failed else ())
+    items = (
+        AnalysisRunItem.query.filter(AnalysisRunItem.run_id == run.id, AnalysisRunItem.status.in_(statuses))
+        .options(undefer(AnalysisRunItem.content)).order_by(AnalysisRunItem.id).all()
+    )
+    item_hashes = list({item.content_hash for item in items})
+    saved_hashes = set()
+    for start in range(0, len(item_hashes), ANALYSIS_RUN_INSERT_CHUNK):
+        saved_hashes.update(content_hash for (content_hash,) in db.session.query(Resume.content_hash).filter(
+            Resume.job_id == run.job_id,
+            Resume.content_hash.in_(item_hashes[start:start + ANALYSIS_RUN_INSERT_CHUNK])
+        ))
+    already_saved = [item.id for item in items if item.content_hash in saved_hashes]
+    retried_failed = sum(1 for item in items if item.status == 'failed')
+    resumes_data = [
+        {
+            'filename': item.filename,
+            'content': item.content,
+            'content_hash': item.content_hash,
+            'simhash': item.simhash,
+            'run_item_id': item.id,
+        }
+        for item in items if item.content_hash not in saved_hashes
+    ]
+    job_id, job_description = run.job_id, run.job.description
+    use_cache, provider, max_concurrency = run.use_cache, run.provider, run.max_concurrency
+    prefilter = json.loads(run.prefilter) if run.prefilter else None
+    run.status = 'running'
+    db.session.commit()
+    for item in items:
+        db.session.expunge(item)
+
+    resume_progress(job_id, len(items), retried_failed=retried_failed)
+    mark_items(already_saved, 'done')
+    # Progress is recorded after the checkpoint, so these saves were never counted.
+    record_progress(job_id, analyzed=len(already_saved))
+    if resumes_data:
+        process_job_resumes(job_id, resumes_data, job_description, use_cache=use_cache,
+                            prefilter=prefilter, provider=provider, run_id=run_id, max_concurrency=max_concurrency)
+    else:
+        finish_run(run_id)
+        check_job_completion(job_id)
+    return len(resumes_data)
+
+
+def resume_interrupted_runs():
+    """
+    Continues every run still marked running. Only call this when nothing else is analyzing,
+    e.g. when the server starts. Returns {run_id: resumes sent for analysis}.
+    """
+    from backend.app import AnalysisRun
+
+    run_ids = [run.id for run in AnalysisRun.query.filter_by(status='running').order_by(AnalysisRun.id).all()]
+    return {run_id: resume_run(run_id) for run_id in run_ids}
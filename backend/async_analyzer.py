@@ -0,0 +1,352 @@
+import asyncio
+import os
+import time
+
+from backend.ai_service import create_async_client, analyze_resume_with_ai_async, analyze_resume_pack_async
+from backend.packing import ANALYSIS_PACKING, plan_packs, resume_prompt_text
+from backend.providers import get_provider, get_fallback_provider_name
+from backend.rate_limiter import OPENAI_MAX_RETRIES, is_retryable_error, is_throttle_error, record_failure
+
+# Concurrency settings for the async analysis engine. The engine starts at
+# ANALYSIS_CONCURRENCY in-flight requests and adapts between the min and max.
+ANALYSIS_CONCURRENCY = int(os.environ.get('ANALYSIS_CONCURRENCY', 20))
+ANALYSIS_MIN_CONCURRENCY = int(os.environ.get('ANALYSIS_MIN_CONCURRENCY', 2))
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get('ANALYSIS_MAX_CONCURRENCY', 200))
+# Requests slower than this are treated as a sign the provider is saturated.
+ANALYSIS_TARGET_LATENCY_SECONDS = float(os.environ.get('ANALYSIS_TARGET_LATENCY_SECONDS', 30))
+# How often a running analysis checks for cancellation and max_concurrency changes.
+ANALYSIS_CONTROL_POLL_SECONDS = float(os.environ.get('ANALYSIS_CONTROL_POLL_SECONDS', 1.0))
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    An async semaphore whose limit adapts to the provider. The limit grows by one per
+    success until the first throttle (slow start), then by one per window of successes.
+    It halves on every 429 and shrinks slightly when latency exceeds the target.
+    """
+
+    def __init__(self, initial=ANALYSIS_CONCURRENCY, minimum=ANALYSIS_MIN_CONCURRENCY,
+                 maximum=ANALYSIS_MAX_CONCURRENCY, target_latency=ANALYSIS_TARGET_LATENCY_SECONDS):
+        self.minimum = self._configured_minimum = max(1, minimum)
+        self.maximum = self._configured_maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.throttle_count = 0
+        self._slow_start = True
+        self._successes_since_change = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record_success(self, latency):
+        if latency > self.target_latency:
+            self._set_limit(int(self.limit * 0.9))
+            return
+        self._successes_since_change += 1
+        if self._slow_start or self._successes_since_change >= self.limit:
+            self._set_limit(self.limit + 1)
+
+    def record_throttle(self):
+        self.throttle_count += 1
+        self._slow_start = False
+        self._set_limit(self.limit // 2)
+
+    def set_maximum(self, maximum):
+        """Caps the limit below the configured maximum, e.g. a job's max_concurrency. None removes the cap."""
+        maximum = self._configured_maximum if maximum is None else max(1, min(maximum, self._configured_maximum))
+        self.maximum = maximum
+        self.minimum = min(self._configured_minimum, maximum)
+        self._set_limit(self.limit)
+
+    def _set_limit(self, new_limit):
+        new_limit = min(max(new_limit, self.minimum), self.maximum)
+        if new_limit != self.limit:
+            self.limit = new_limit
+            self._successes_since_change = 0
+
+    def snapshot(self):
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'throttle_count': self.throttle_count,
+        }
+
+
+class _ScheduledLimiter:
+    """
+    A job's adaptive limiter with a fair-share slot (see scheduler.py) taken inside it, so the
+    job's own limit and its share of the process's capacity both apply to each request.
+    """
+
+    def __init__(self, limiter, share):
+        self.limiter = limiter
+        self.share = share
+
+    async def __aenter__(self):
+        await self.limiter.acquire()
+        try:
+            await self.share.__aenter__()
+        except BaseException:
+            await self.limiter.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.share.__aexit__(exc_type, exc, tb)
+        await self.limiter.release()
+
+    def record_success(self, latency):
+        self.limiter.record_success(latency)
+
+    def record_throttle(self):
+        self.limiter.record_throttle()
+
+
+class _ProviderSession:
+    """One provider's async client for the duration of a run. name=None means the configured default."""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        provider = get_provider(name)
+        self.analysis_model = provider.analysis_model
+        self.rate_limiter = provider.rate_limiter(provider.analysis_model)
+
+    @property
+    def request_kwargs(self):
+        return {'provider': self.name} if self.name else {}
+
+
+async def _with_retries(request_fn, limiter, rate_limiter):
+    """Awaits request_fn() under the concurrency limiter, retrying retryable errors with shared backoff."""
+    attempt = 0
+    while True:
+        async with limiter:
+            started = time.monotonic()
+            try:
+                result = await request_fn()
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= OPENAI_MAX_RETRIES:
+                    raise
+                if is_throttle_error(e):
+                    limiter.record_throttle()
+                retry_error = e
+            else:
+                limiter.record_success(time.monotonic() - started)
+                return result
+
+        attempt += 1
+        await asyncio.sleep(record_failure(rate_limiter, retry_error, attempt))
+
+
+async def _analyze_one(resume_data, job_description, session, limiter, on_field=None, token_savings=None):
+    request_kwargs = dict(session.request_kwargs, **({'on_field': on_field} if on_field else {}))
+    prompt_text = resume_prompt_text(resume_data, token_savings)
+    analysis_json = await _with_retries(
+        lambda: analyze_resume_with_ai_async(
+            job_description, prompt_text, session.client, **request_kwargs
+        ),
+        limiter,
+        session.rate_limiter
+    )
+    return dict(resume_data, analysis_json=analysis_json, analysis_model=session.analysis_model)
+
+
+async def _analyze_pack(pack, job_description, session, limiter, on_partial=None, fallback=None, outcomes=None,
+                        token_savings=None):
+    """
+    Analyzes a pack of resumes and returns (resume_data, result, exc) per resume. If the packed
+    request fails or comes back malformed, the resumes it did not answer are analyzed one by one.
+    Resumes the provider keeps failing on with retryable errors are tried once more on the fallback session.
+    Outcomes are appended to `outcomes` as each resume finishes, so they survive the pack being cancelled.
+    """
+    outcomes = [] if outcomes is None else outcomes
+    remaining = pack
+    if len(pack) > 1:
+        try:
+            members = [(rd['filename'], resume_prompt_text(rd, token_savings)) for rd in pack]
+            analyses = await _with_retries(
+                lambda: analyze_resume_pack_async(job_description, members, session.client, **session.request_kwargs),
+                limiter,
+                session.rate_limiter
+            )
+        except Exception as e:
+            print(f"Packed analysis of {len(pack)} resumes failed, analyzing them one by one: {e}")
+            analyses = {}
+        remaining = []
+        for resume_data in pack:
+            if resume_data['filename'] in analyses:
+                outcomes.append((resume_data, dict(
+                    resume_data, analysis_json=analyses[resume_data['filename']], analysis_model=session.analysis_model
+                ), None))
+            else:
+                remaining.append(resume_data)
+
+    async def analyze(resume_data, on_field):
+        try:
+            return resume_data, await _analyze_one(resume_data, job_description, session, limiter, on_field, token_savings), None
+        except Exception as exc:
+            if fallback is None or not is_retryable_error(exc):
+                return resume_data, None, exc
+            print(f"Provider failed on {resume_data.get('filename')}, failing over to {fallback.name}: {exc}")
+        try:
+            return resume_data, await _analyze_one(resume_data, job_description, fallback, limiter, on_field, token_savings), None
+        except Exception as exc:
+            return resume_data, None, exc
+
+    async def run(resume_data):
+        on_field = None
+        if on_partial:
+            def on_field(key, value):
+                on_partial(resume_data, key, value)
+        outcomes.append(await analyze(resume_data, on_field))
+
+    await asyncio.gather(*(run(rd) for rd in remaining))
+    return outcomes
+
+
+async def _watch_controls(check_controls, limiter, tasks, stopped):
+    """Applies max_concurrency changes and cancels every outstanding request once the job is cancelled."""
+    while True:
+        try:
+            controls = check_controls()
+        except Exception as e:
+            print(f"Failed to check analysis controls: {e}")
+            controls = {}
+        if 'max_concurrency' in controls:
+            limiter.set_maximum(controls['max_concurrency'])
+        if controls.get('cancelled'):
+            stopped.set()
+            for task in tasks:
+                task.cancel()
+            return
+        await asyncio.sleep(ANALYSIS_CONTROL_POLL_SECONDS)
+
+
+async def _analyze_all(resumes_data, job_description, on_result, on_error, limiter, on_partial=None, packing=False,
+                       provider=None, share=None, check_controls=None, token_savings=None):
+    limiter = adaptive_limiter = limiter or AdaptiveConcurrencyLimiter()
+    if share is not None:
+        limiter = _ScheduledLimiter(limiter, share)
+    analyzed_results = []
+    skipped_files = []
+
+    try:
+        session = _ProviderSession(provider, create_async_client(provider))
+    except Exception as exc:
+        # Without a client (e.g. no API key configured) every resume fails the same way.
+        for resume_data in resumes_data:
+            skipped_files.append({'status': 'error', 'filename': resume_data.get('filename', 'unknown file'), 'reason': str(exc)})
+            if on_error:
+                on_error(resume_data, exc)
+        return analyzed_results, skipped_files
+
+    fallback = None
+    fallback_name = get_fallback_provider_name(provider)
+    if fallback_name:
+        try:
+            fallback = _ProviderSession(fallback_name, create_async_client(fallback_name))
+        except Exception as exc:
+            print(f"Fallback provider {fallback_name} is unavailable: {exc}")
+
+    packs = plan_packs(resumes_data) if packing else [[rd] for rd in resumes_data]
+
+    # The watcher is created first so a max_concurrency cap applies from the first request.
+    tasks = []
+    stopped = asyncio.Event()
+    watcher = asyncio.create_task(_watch_controls(check_controls, adaptive_limiter, tasks, stopped)) if check_controls else None
+    pack_outcomes = [[] for _ in packs]
+    tasks.extend(
+        asyncio.create_task(_analyze_pack(pack, job_description, session, limiter, on_partial, fallback, outcomes, token_savings))
+        for pack, outcomes in zip(packs, pack_outcomes)
+    )
+    reported = set()
+
+    def report(outcomes):
+        for resume_data, result, exc in outcomes:
+            if id(resume_data) in reported:
+                continue
+            reported.add(id(resume_data))
+            if exc is None:
+                analyzed_results.append(result)
+                if on_result:
+                    on_result(result)
+            else:
+                filename = resume_data.get('filename', 'unknown file')
+                skipped_files.append({'status': 'error', 'filename': filename, 'reason': str(exc)})
+                if on_error:
+                    on_error(resume_data, exc)
+
+    try:
+        for next_finished in asyncio.as_completed(tasks):
+            try:
+                report(await next_finished)
+            except asyncio.CancelledError:
+                if not stopped.is_set():
+                    raise
+    finally:
+        if watcher:
+            watcher.cancel()
+        await session.client.close()
+        if fallback:
+            await fallback.client.close()
+
+    if stopped.is_set():
+        # Resumes that finished before their pack was cancelled are kept: their analysis was paid for.
+        for outcomes in pack_outcomes:
+            report(outcomes)
+        # Cancelled requests were aborted; their resumes are reported without calling on_error.
+        for pack in packs:
+            for resume_data in pack:
+                if id(resume_data) not in reported:
+                    skipped_files.append({'status': 'cancelled', 'filename': resume_data.get('filename', 'unknown file'), 'reason': 'Cancelled'})
+    return analyzed_results, skipped_files
+
+
+def analyze_resumes_concurrently(resumes_data, job_description, on_result=None, on_error=None, limiter=None,
+                                 on_partial=None, packing=None, provider=None, share=None, check_controls=None,
+                                 token_savings=None):
+    """
+    Analyzes resumes on a single event loop with an adaptive number of in-flight requests.
+    Each result is the input resume dict plus 'analysis_json' and the 'analysis_model' that produced it
+    (a fallback provider's model if it failed over). Returns (analyzed_results, skipped_files),
+    where skipped_files entries have the same shape process_job_resumes reports.
+    The on_result/on_error callbacks run on the calling thread as each resume finishes.
+    With on_partial, responses are streamed and on_partial(resume_data, key, value) is called
+    for each top-level analysis field as it arrives. A retried resume may report its fields again.
+    With packing (default ANALYSIS_PACKING), short resumes are analyzed several to a request;
+    packed requests are not streamed.
+    provider names the analysis provider (default ANALYSIS_PROVIDER); see providers.py.
+    share is the job's JobShare from the fair-share scheduler; without it requests are not scheduled.
+    check_controls is polled every ANALYSIS_CONTROL_POLL_SECONDS for {'cancelled', 'max_concurrency'}:
+    max_concurrency caps the adaptive limit, and on cancellation in-flight requests are aborted and
+    unfinished resumes come back in skipped_files with status 'cancelled'.
+    Each resume's prompt text is normalized and fit to the token budget as its request is sent
+    (see packing.resume_prompt_text); the savings are added to token_savings if given.
+    """
+    if not resumes_data:
+        return [], []
+    packing = ANALYSIS_PACKING if packing is None else packing
+    return asyncio.run(_analyze_all(
+        resumes_data, job_description, on_result, on_error, limiter, on_partial, packing, provider, share, check_controls,
+        token_savings
+    ))
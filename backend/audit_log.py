@@ -0,0 +1,196 @@
+# Structured audit log of AI analyses, written as JSON Lines by a background thread.
+# Callers only put records on a bounded queue; batching, fsync and rotation happen on the writer thread.
+# Each process (web server, queue workers) writes and rotates its own file, so no process renames a
+# file another one is still appending to.
+import atexit
+import glob
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+AUDIT_LOG_ENABLED = os.environ.get('AUDIT_LOG_ENABLED', 'true').lower() == 'true'
+# Each process appends to this path with its pid before the extension, e.g. ai_analysis_audit.1234.jsonl.
+AUDIT_LOG_PATH = os.environ.get('AUDIT_LOG_PATH', os.path.join(basedir, 'logs', 'ai_analysis_audit.jsonl'))
+# The current file is rotated once it would exceed this size, or is older than AUDIT_LOG_ROTATE_SECONDS (0 = never).
+AUDIT_LOG_MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', 100 * 1024 * 1024))
+AUDIT_LOG_ROTATE_SECONDS = float(os.environ.get('AUDIT_LOG_ROTATE_SECONDS', 24 * 60 * 60))
+# Rotated files kept, across all processes; older ones are deleted.
+AUDIT_LOG_BACKUP_COUNT = int(os.environ.get('AUDIT_LOG_BACKUP_COUNT', 14))
+# 'batch' fsyncs after every batch written, 'never' leaves flushing to the OS.
+AUDIT_LOG_FSYNC = os.environ.get('AUDIT_LOG_FSYNC', 'batch').lower()
+AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', 500))
+AUDIT_LOG_FLUSH_SECONDS = float(os.environ.get('AUDIT_LOG_FLUSH_SECONDS', 1.0))
+# Records beyond this many waiting ones are dropped (and counted) rather than blocking analysis.
+AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', 10000))
+# Fraction of records written, e.g. 0.1 to keep one analysis in ten.
+AUDIT_LOG_SAMPLE_RATE = float(os.environ.get('AUDIT_LOG_SAMPLE_RATE', 1.0))
+
+
+class AuditLogWriter:
+    """
+    Appends records to a JSON Lines file from a background thread. Rotated files matching
+    backups_glob (by default the path's own backups) are pruned to the newest backup_count.
+    """
+
+    def __init__(self, path=None, max_bytes=None, rotate_seconds=None, backup_count=None, fsync=None,
+                 batch_size=None, flush_seconds=None, queue_size=None, sample_rate=None, backups_glob=None):
+        self.path = path or process_log_path()
+        self.backups_glob = backups_glob or glob.escape(self.path) + '.*'
+        self.max_bytes = AUDIT_LOG_MAX_BYTES if max_bytes is None else max_bytes
+        self.rotate_seconds = AUDIT_LOG_ROTATE_SECONDS if rotate_seconds is None else rotate_seconds
+        self.backup_count = AUDIT_LOG_BACKUP_COUNT if backup_count is None else backup_count
+        self.fsync = AUDIT_LOG_FSYNC if fsync is None else fsync
+        self.batch_size = batch_size or AUDIT_LOG_BATCH_SIZE
+        self.flush_seconds = AUDIT_LOG_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.sample_rate = AUDIT_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.stats = {'written': 0, 'dropped': 0, 'sampled_out': 0, 'rotations': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size or AUDIT_LOG_QUEUE_SIZE)
+        self._file = None
+        self._opened_at = None
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """Queues a record (a JSON-serializable dict). Never blocks; returns False if it was not queued."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self._count('sampled_out')
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        return True
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def flush(self):
+        """Blocks until every queued record has been written."""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_seconds)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self._write_batch(records)
+            except Exception as e:
+                self._count('errors')
+                print(f"Failed to write {len(records)} audit log records: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        if self._file:
+            self._file.close()
+
+    def _write_batch(self, records):
+        data = ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in records).encode('utf-8')
+        self._open()
+        if self._should_rotate(len(data)):
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync == 'batch':
+            os.fsync(self._file.fileno())
+        self._count('written', len(records))
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'ab')
+            self._opened_at = time.time()
+
+    def _should_rotate(self, incoming_bytes):
+        size = self._file.tell()
+        if size == 0:
+            return False
+        if self.max_bytes and size + incoming_bytes > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rotated):
+            rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix:04d}"
+            suffix += 1
+        os.replace(self.path, rotated)
+        backups = sorted(glob.glob(self.backups_glob), key=lambda name: (os.path.getmtime(name), name))
+        for old in backups[:max(0, len(backups) - self.backup_count)]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass  # Another process pruned it first.
+        self._count('rotations')
+        self._open()
+
+
+def process_log_path():
+    """This process's audit file: AUDIT_LOG_PATH with the pid before the extension."""
+    root, ext = os.path.splitext(AUDIT_LOG_PATH)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def rotated_logs_glob():
+    """Matches the rotated audit files of every process."""
+    root, ext = os.path.splitext(AUDIT_LOG_PATH)
+    return f"{glob.escape(root)}.*{glob.escape(ext)}.*"
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_log():
+    """The process-wide writer, started on first use (and again in a forked child, whose file is its own)."""
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = AuditLogWriter(path=process_log_path(), backups_glob=rotated_logs_glob())
+            _writer_pid = os.getpid()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def audit(event, **fields):
+    """Records an audit event, e.g. audit('analysis', job_id=1, filename='cv.pdf', ...)."""
+    if not AUDIT_LOG_ENABLED:
+        return
+    get_audit_log().write({'ts': time.time(), 'event': event, **fields})
+
+
+def shutdown_audit_log():
+    """Writes out everything queued and stops the writer thread."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer:
+        atexit.unregister(writer.close)
+        writer.close()
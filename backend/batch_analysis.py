@@ -0,0 +1,435 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from backend.ai_service import ANALYSIS_MODEL, build_analysis_messages, get_client
+from backend.analysis_cache import make_cache_key, get_cached_analyses, store_analyses
+from backend.dedupe import partition_duplicates
+from backend.ingestion import resume_content
+from backend.prerank import split_by_prefilter
+from backend.progress import start_progress, record_progress, complete_if_done
+from backend.providers import fake_completion_text
+from backend.prompt_budget import TokenSavingsReport, TRUNCATION_MARKER, compress_resume_text
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+# Batch input/output JSONL files are kept here until the run has been ingested.
+BATCH_DIR = os.environ.get('BATCH_DIR', os.path.join(basedir, 'batches'))
+BATCH_ADAPTER = os.environ.get('BATCH_ADAPTER', 'openai')
+BATCH_POLL_INTERVAL_SECONDS = float(os.environ.get('BATCH_POLL_INTERVAL_SECONDS', 60))
+# Results are written to the database in chunks of this many resumes.
+BATCH_INGEST_CHUNK_SIZE = int(os.environ.get('BATCH_INGEST_CHUNK_SIZE', 100))
+# A run whose ingestion hasn't advanced for this long (its poller died) is taken over by another poller.
+BATCH_INGEST_STALE_SECONDS = float(os.environ.get('BATCH_INGEST_STALE_SECONDS', 600))
+
+FINISHED_RUN_STATUSES = ('ingested', 'failed')
+
+
+# --- Batch adapters ---
+
+class OpenAIBatchAdapter:
+    """Submits JSONL files to the OpenAI Batch API (24h completion window, discounted pricing)."""
+    name = 'openai'
+
+    _STATUS_MAP = {
+        'validating': 'in_progress',
+        'in_progress': 'in_progress',
+        'finalizing': 'in_progress',
+        'completed': 'completed',
+        'failed': 'failed',
+        'expired': 'failed',
+        'cancelling': 'failed',
+        'cancelled': 'failed',
+    }
+
+    def submit(self, input_path):
+        client = get_client()
+        with open(input_path, 'rb') as f:
+            batch_file = client.files.create(file=f, purpose='batch')
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+        return batch.id
+
+    def get_status(self, batch_id):
+        batch = get_client().batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            'status': self._STATUS_MAP.get(batch.status, 'in_progress'),
+            'total': counts.total if counts else 0,
+            'completed': counts.completed if counts else 0,
+            'failed': counts.failed if counts else 0,
+        }
+
+    def download_results(self, batch_id, output_path):
+        """Streams the output and error files to output_path. Returns False if there is nothing to download."""
+        client = get_client()
+        batch = client.batches.retrieve(batch_id)
+        file_ids = [fid for fid in (batch.output_file_id, batch.error_file_id) if fid]
+        if not file_ids:
+            return False
+        with open(output_path, 'wb') as out:
+            for file_id in file_ids:
+                with client.files.with_streaming_response.content(file_id) as response:
+                    for chunk in response.iter_bytes():
+                        out.write(chunk)
+        return True
+
+
+class LocalBatchAdapter:
+    """
+    File-based stand-in for a provider batch interface, used for tests and offline runs.
+    Submitting a batch answers every request with `responder` and writes the results in
+    the same JSONL format the OpenAI Batch API produces.
+    """
+    name = 'local'
+
+    def __init__(self, responder=None, directory=None):
+        self.responder = responder or stub_analysis_response
+        self.directory = directory or os.path.join(BATCH_DIR, 'local')
+
+    def _output_path(self, batch_id):
+        return os.path.join(self.directory, f"{batch_id}_output.jsonl")
+
+    def submit(self, input_path):
+        os.makedirs(self.directory, exist_ok=True)
+        batch_id = f"local_{uuid.uuid4().hex}"
+        with open(input_path, 'r', encoding='utf-8') as src, \
+                open(self._output_path(batch_id), 'w', encoding='utf-8') as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    content = self.responder(request['body'])
+                    result = {
+                        'id': f"batch_req_{uuid.uuid4().hex}",
+                        'custom_id': request['custom_id'],
+                        'response': {
+                            'status_code': 200,
+                            'body': {'choices': [{'message': {'role': 'assistant', 'content': content}}]},
+                        },
+                        'error': None,
+                    }
+                except Exception as e:
+                    result = {
+                        'id': f"batch_req_{uuid.uuid4().hex}",
+                        'custom_id': request['custom_id'],
+                        'response': None,
+                        'error': {'code': 'local_error', 'message': str(e)},
+                    }
+                out.write(json.dumps(result) + '\n')
+        return batch_id
+
+    def get_status(self, batch_id):
+        total = 0
+        if os.path.exists(self._output_path(batch_id)):
+            with open(self._output_path(batch_id), 'r', encoding='utf-8') as f:
+                total = sum(1 for line in f if line.strip())
+            return {'status': 'completed', 'total': total, 'completed': total, 'failed': 0}
+        return {'status': 'failed', 'total': 0, 'completed': 0, 'failed': 0}
+
+    def download_results(self, batch_id, output_path):
+        if not os.path.exists(self._output_path(batch_id)):
+            return False
+        shutil.copyfile(self._output_path(batch_id), output_path)
+        return True
+
+
+def stub_analysis_response(body):
+    """Deterministic analysis derived from the request text, so local runs are reproducible."""
+    return fake_completion_text(body['messages'])
+
+
+BATCH_ADAPTERS = {
+    OpenAIBatchAdapter.name: OpenAIBatchAdapter,
+    LocalBatchAdapter.name: LocalBatchAdapter,
+}
+
+
+def get_batch_adapter(name=None):
+    name = name or BATCH_ADAPTER
+    if name not in BATCH_ADAPTERS:
+        raise ValueError(f"Unknown batch adapter: {name}")
+    return BATCH_ADAPTERS[name]()
+
+
+# --- Submission ---
+
+def build_batch_request(custom_id, job_description, resume_text):
+    """One line of a chat-completions batch file."""
+    return {
+        'custom_id': custom_id,
+        'method': 'POST',
+        'url': '/v1/chat/completions',
+        'body': {
+            'model': ANALYSIS_MODEL,
+            'messages': build_analysis_messages(job_description, resume_text),
+            'response_format': {'type': 'json_object'},
+        },
+    }
+
+
+def _custom_id(resume_id):
+    return f"resume-{resume_id}"
+
+
+def _resume_id(custom_id):
+    return int(custom_id.rsplit('-', 1)[1])
+
+
+def submit_bulk_analysis(job_id, resumes_data, job_description, use_cache=True, adapter=None, prefilter=None):
+    """
+    Queues a job's resumes for offline analysis. Every resume gets a placeholder Resume row
+    (analysis_pending until results are ingested) whose id is the request's custom_id.
+    Cached analyses, and local scores for resumes the optional prefilter drops, are saved straight away. Returns the BatchRun, or None if nothing needed submitting.
+    Must be called inside an app context.
+    """
+    from backend.app import db, Resume, BatchRun, emit_progress_update
+    from backend.tasks import finalize_analysis, resolve_candidate_name
+
+    adapter = adapter or get_batch_adapter()
+
+    # Skip files this job already has, and repeats (exact or near) within the upload.
+    unique_resumes, duplicates = partition_duplicates(job_id, resumes_data)
+    for rd, reason in duplicates:
+        emit_progress_update(job_id, f"Skipped {rd['filename']}: {reason}", 'warning')
+
+    cached_analyses = {}
+    if use_cache:
+        cached_analyses = get_cached_analyses(
+            make_cache_key(job_description, rd['content_hash']) for rd in unique_resumes
+        )
+
+    # Resumes the pre-filter drops are archived with their local score instead of being submitted.
+    uncached_resumes = [rd for rd in unique_resumes if make_cache_key(job_description, rd['content_hash']) not in cached_analyses]
+    _, archived_resumes = split_by_prefilter(uncached_resumes, job_description, prefilter)
+    local_analyses = {rd['content_hash']: rd['analysis_json'] for rd in archived_resumes}
+
+    placeholders = []
+    for rd in unique_resumes:
+        resume = Resume(filename=rd['filename'], content=resume_content(rd), content_hash=rd['content_hash'],
+                        simhash=rd['simhash'], job_id=job_id)
+        cached_analysis = cached_analyses.get(make_cache_key(job_description, rd['content_hash']))
+        if cached_analysis is None:
+            cached_analysis = local_analyses.get(rd['content_hash'])
+        if cached_analysis is not None:
+            analysis_data = finalize_analysis(rd['filename'], cached_analysis, job_id=job_id)
+            resume.candidate_name = resolve_candidate_name(analysis_data, rd['filename'])
+            resume.analysis = json.dumps(analysis_data, ensure_ascii=False)
+        else:
+            resume.analysis_pending = True
+            placeholders.append(resume)
+        db.session.add(resume)
+    db.session.commit()
+    start_progress(job_id, len(unique_resumes))
+    record_progress(job_id, analyzed=len(unique_resumes) - len(placeholders))
+
+    if cached_analyses:
+        emit_progress_update(job_id, f"{len(cached_analyses)} resumes served from the analysis cache.", 'info')
+    if archived_resumes:
+        emit_progress_update(job_id, f"Pre-filter archived {len(archived_resumes)} low-relevance resumes.", 'info')
+    if not placeholders:
+        complete_if_done(job_id)
+        emit_progress_update(job_id, "Nothing left to submit for bulk analysis.", 'complete')
+        return None
+
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    input_path = os.path.join(BATCH_DIR, f"job_{job_id}_{int(time.time())}_{uuid.uuid4().hex[:8]}.jsonl")
+    token_savings = TokenSavingsReport()
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for resume in placeholders:
+            analysis_text, original_tokens, compressed_tokens = compress_resume_text(resume.content)
+            token_savings.add(original_tokens, compressed_tokens, truncated=TRUNCATION_MARKER in analysis_text)
+            f.write(json.dumps(build_batch_request(_custom_id(resume.id), job_description, analysis_text), ensure_ascii=False) + '\n')
+    emit_progress_update(job_id, token_savings.summary(), 'info')
+
+    run = BatchRun(job_id=job_id, adapter=adapter.name, input_file_path=input_path, total_requests=len(placeholders))
+    try:
+        run.provider_batch_id = adapter.submit(input_path)
+        run.status = 'submitted'
+    except Exception as e:
+        # Remove the placeholders so the same files can be uploaded again.
+        for resume in placeholders:
+            db.session.delete(resume)
+        run.status = 'failed'
+        run.error = str(e)
+        emit_progress_update(job_id, f"Bulk submission failed: {e}", 'error')
+    db.session.add(run)
+    db.session.commit()
+    if run.status == 'failed':
+        record_progress(job_id, failed=len(placeholders))
+        complete_if_done(job_id)
+
+    if run.status == 'submitted':
+        emit_progress_update(job_id, f"Submitted {len(placeholders)} resumes for bulk analysis (batch {run.provider_batch_id}).", 'start')
+    return run
+
+
+# --- Polling and ingestion ---
+
+def poll_batch_run(run_id, adapter=None):
+    """Checks a run once and ingests its results when the provider is done. Returns the run status."""
+    from backend.app import db, BatchRun, emit_progress_update
+
+    run = db.session.get(BatchRun, run_id)
+    if run is None or run.status in FINISHED_RUN_STATUSES:
+        return run.status if run else None
+
+    adapter = adapter or get_batch_adapter(run.adapter)
+    try:
+        status = adapter.get_status(run.provider_batch_id)
+    except Exception as e:
+        emit_progress_update(run.job_id, f"Could not check bulk analysis status: {e}", 'warning')
+        return run.status
+
+    if status['status'] == 'in_progress':
+        if run.status != 'in_progress':
+            run.status = 'in_progress'
+            db.session.commit()
+        emit_progress_update(run.job_id, f"Bulk analysis in progress: {status['completed']}/{status['total'] or run.total_requests} done.", 'processing')
+        return run.status
+
+    # Only one poller ingests a run (pollers run in the web and worker processes); one that
+    # stopped part way through is taken over once its ingestion has stalled.
+    stalled_before = datetime.utcnow() - timedelta(seconds=BATCH_INGEST_STALE_SECONDS)
+    claimed = BatchRun.query.filter(
+        BatchRun.id == run.id,
+        db.or_(BatchRun.status.in_(('submitted', 'in_progress')),
+               db.and_(BatchRun.status == 'ingesting', BatchRun.updated_at < stalled_before))
+    ).update({'status': 'ingesting', 'updated_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return 'ingesting'
+    db.session.refresh(run)
+
+    ingest_batch_results(run, adapter)
+    if status['status'] == 'failed':
+        run.status = 'failed'
+        run.error = run.error or 'Batch did not complete'
+        db.session.commit()
+    return run.status
+
+
+def ingest_batch_results(run, adapter):
+    """
+    Streams a run's results into the placeholder Resume rows in chunks, reporting
+    progress after each chunk. Placeholders without a usable result are removed.
+    """
+    from backend.app import db, Resume, emit_progress_update
+
+    output_path = run.input_file_path.replace('.jsonl', '_output.jsonl')
+    has_output = adapter.download_results(run.provider_batch_id, output_path)
+
+    job_description = run.job.description
+    processed = 0
+    if has_output:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            chunk = []
+            for line in f:
+                if not line.strip():
+                    continue
+                chunk.append(json.loads(line))
+                if len(chunk) >= BATCH_INGEST_CHUNK_SIZE:
+                    processed += _ingest_chunk(run, chunk, job_description)
+                    emit_progress_update(run.job_id, f"Ingested {processed}/{run.total_requests} bulk results.", 'processing')
+                    chunk = []
+            if chunk:
+                processed += _ingest_chunk(run, chunk, job_description)
+                emit_progress_update(run.job_id, f"Ingested {processed}/{run.total_requests} bulk results.", 'processing')
+
+    # Anything from this run still without an analysis got no result from the provider.
+    with open(run.input_file_path, 'r', encoding='utf-8') as f:
+        run_resume_ids = [_resume_id(json.loads(line)['custom_id']) for line in f if line.strip()]
+    missing = 0
+    for start in range(0, len(run_resume_ids), BATCH_INGEST_CHUNK_SIZE):
+        chunk_ids = run_resume_ids[start:start + BATCH_INGEST_CHUNK_SIZE]
+        for resume in Resume.query.filter(Resume.id.in_(chunk_ids), Resume.analysis_pending.is_(True)).all():
+            db.session.delete(resume)
+            missing += 1
+    run.failed_count += missing
+    run.status = 'ingested'
+    db.session.commit()
+    record_progress(run.job_id, failed=missing)
+    complete_if_done(run.job_id)
+
+    emit_progress_update(
+        run.job_id,
+        f"Bulk analysis finished. {run.ingested_count}/{run.total_requests} resumes saved, {run.failed_count} failed.",
+        'complete'
+    )
+
+
+def _ingest_chunk(run, results, job_description):
+    from backend.app import db, Resume
+    from backend.tasks import finalize_analysis, resolve_candidate_name, _is_cacheable
+
+    resumes_by_id = {
+        r.id: r for r in Resume.query.filter(Resume.id.in_([_resume_id(res['custom_id']) for res in results])).all()
+    }
+    cache_entries = []
+    ingested = 0
+    for result in results:
+        resume = resumes_by_id.get(_resume_id(result['custom_id']))
+        if resume is None or not resume.analysis_pending:
+            continue
+        response = result.get('response') or {}
+        if result.get('error') or response.get('status_code') != 200:
+            continue
+        analysis_json = response['body']['choices'][0]['message']['content']
+        try:
+            analysis_data = finalize_analysis(resume.filename, analysis_json, job_id=run.job_id)
+        except ValueError:
+            continue
+        if analysis_data.get('error'):
+            continue
+        resume.analysis = json.dumps(analysis_data, ensure_ascii=False)
+        resume.candidate_name = resolve_candidate_name(analysis_data, resume.filename)
+        resume.analysis_pending = False
+        run.ingested_count += 1
+        ingested += 1
+        if _is_cacheable(analysis_json):
+            cache_entries.append({
+                'job_description': job_description,
+                'content_hash': resume.content_hash,
+                'analysis_json': analysis_json,
+            })
+    db.session.commit()
+    record_progress(run.job_id, analyzed=ingested)
+    store_analyses(cache_entries)
+    return len(results)
+
+
+def wait_for_batch_run(run_id, poll_interval=None, sleep=time.sleep):
+    """Polls a run until it is ingested or failed. Meant to run as a background task."""
+    from backend.app import app
+
+    poll_interval = BATCH_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+    while True:
+        with app.app_context():
+            status = poll_batch_run(run_id)
+        if status is None or status in FINISHED_RUN_STATUSES:
+            return status
+        sleep(poll_interval)
+
+
+def delete_batch_runs(job_id):
+    """Deletes the job's bulk runs, for when the job itself is deleted; the caller commits. Polling stops once a run is gone."""
+    from backend.app import BatchRun
+
+    return BatchRun.query.filter(BatchRun.job_id == job_id).delete(synchronize_session=False)
+
+
+def unfinished_batch_run_ids():
+    from backend.app import db, BatchRun
+
+    return [run_id for (run_id,) in db.session.query(BatchRun.id).filter(BatchRun.status.notin_(FINISHED_RUN_STATUSES)).order_by(BatchRun.id)]
+
+
+def poll_unfinished_batch_runs():
+    """Polls every run that has not finished yet, e.g. after a restart. Returns {run_id: status}."""
+    return {run_id: poll_batch_run(run_id) for run_id in unfinished_batch_run_ids()}
@@ -0,0 +1,86 @@
+# Scaffolding shared by the analysis and extraction caches: in-process hit/miss counters,
+# chunked key lookups with access tracking, and least-recently-used eviction.
+import threading
+from datetime import datetime
+
+# SQLite limits the number of bound parameters per statement, so large IN
+# queries are split into chunks of this size.
+LOOKUP_CHUNK_SIZE = 500
+
+
+class CacheStats:
+    """In-process counters, reported alongside the persisted per-entry hit counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def bump(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def snapshot(self):
+        """Returns the counters and the hit rate since the last reset."""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def reset(self):
+        with self._lock:
+            for counter in self._counters:
+                self._counters[counter] = 0
+
+
+def chunked(keys):
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        yield keys[start:start + LOOKUP_CHUNK_SIZE]
+
+
+def touch_entries(db, entries, label):
+    """Counts a hit on each entry and marks it as just used, so eviction keeps it longest."""
+    if not entries:
+        return
+    now = datetime.utcnow()
+    for entry in entries:
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_accessed_at = now
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to update {label} cache access times: {e}")
+
+
+def lifetime_hits(db, model):
+    return db.session.query(db.func.coalesce(db.func.sum(model.hit_count), 0)).scalar()
+
+
+def evict_least_recently_used(db, model, max_entries, size_column=None, max_bytes=None):
+    """
+    Deletes the least recently used rows of model until at most max_entries remain and, when a
+    size_column is given, their sizes add up to at most max_bytes. Commits, so deletions the
+    caller made beforehand are committed too. Returns the number of deleted rows; the caller
+    rolls back on errors.
+    """
+    size = size_column if size_column is not None else db.literal(0)
+    max_bytes = float('inf') if max_bytes is None else max_bytes
+    count, total_bytes = db.session.query(db.func.count(model.id), db.func.coalesce(db.func.sum(size), 0)).one()
+
+    doomed = []
+    if count > max_entries or total_bytes > max_bytes:
+        oldest_first = db.session.query(model.id, size).order_by(
+            model.last_accessed_at.asc(), model.id.asc()
+        ).yield_per(LOOKUP_CHUNK_SIZE)
+        for entry_id, entry_bytes in oldest_first:
+            if count <= max_entries and total_bytes <= max_bytes:
+                break
+            doomed.append(entry_id)
+            count -= 1
+            total_bytes -= entry_bytes or 0
+
+    for chunk in chunked(doomed):
+        model.query.filter(model.id.in_(chunk)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(doomed)
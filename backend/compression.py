@@ -0,0 +1,80 @@
+import os
+import zlib
+
+from sqlalchemy import Text, select, type_coerce, update
+from sqlalchemy.types import TypeDecorator
+
+# Compressed values start with this marker; anything else is a plain text row written before
+# compression was introduced (or a value too short to be worth compressing).
+COMPRESSION_MARKER = b'\x00z1'
+COMPRESSION_LEVEL = int(os.environ.get('TEXT_COMPRESSION_LEVEL', 6))
+# Shorter values are stored as plain text.
+COMPRESSION_MIN_BYTES = 256
+
+
+def compress_text(value):
+    """Returns value as marker-prefixed zlib bytes, or unchanged if it is too short to gain anything."""
+    if value is None:
+        return None
+    encoded = value.encode('utf-8')
+    if len(encoded) < COMPRESSION_MIN_BYTES:
+        return value
+    return COMPRESSION_MARKER + zlib.compress(encoded, COMPRESSION_LEVEL)
+
+
+def decompress_text(value):
+    """Reads a stored value in any format: compressed bytes, plain bytes or an old text row."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value.startswith(COMPRESSION_MARKER):
+        return zlib.decompress(value[len(COMPRESSION_MARKER):]).decode('utf-8')
+    return value.decode('utf-8')
+
+
+def is_compressed(value):
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:len(COMPRESSION_MARKER)]) == COMPRESSION_MARKER
+
+
+class CompressedText(TypeDecorator):
+    """
+    A Text column stored zlib-compressed. The column keeps its TEXT declaration; SQLite stores the
+    compressed bytes as a BLOB in it, so existing rows need no schema change and keep reading.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+def compress_existing_rows(session, table, column_names, batch_size=500):
+    """
+    Rewrites plain-text values in the given CompressedText columns in compressed form, batch_size
+    rows at a time. Returns the number of rows rewritten.
+    """
+    columns = [table.c[name] for name in column_names]
+    # Read as plain Text, so the stored form is seen rather than the decompressed value.
+    raw_columns = [type_coerce(column, Text) for column in columns]
+    rewritten = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(table.c.id, *raw_columns).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            values = {
+                column.name: value for column, value in zip(columns, row[1:])
+                if isinstance(value, str) and len(value.encode('utf-8')) >= COMPRESSION_MIN_BYTES
+            }
+            if values:
+                session.execute(update(table).where(table.c.id == row[0]).values(**values))
+                rewritten += 1
+        session.commit()
+        last_id = rows[-1][0]
+    return rewritten
@@ -0,0 +1,151 @@
+# Duplicate detection that runs before any resume is queued for analysis: exact duplicates by
+# content hash and filename (one IN query per slice), and near-duplicates (the same CV re-exported
+# with trivial differences) through a SimHash fingerprint index.
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from backend.ingestion import resume_content
+
+NEAR_DUPLICATE_DETECTION = os.environ.get('NEAR_DUPLICATE_DETECTION', 'true').lower() != 'false'
+# Fingerprints that differ in at most this many of their 64 bits count as the same resume.
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.environ.get('NEAR_DUPLICATE_MAX_DISTANCE', 3))
+# Keeps IN queries well below SQLite's bound-parameter limit.
+_IN_QUERY_CHUNK = 500
+_SHINGLE_WORDS = 3
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _shingle_hashes(text):
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < _SHINGLE_WORDS:
+        shingles = [' '.join(words)] if words else []
+    else:
+        shingles = [' '.join(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)]
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') for s in shingles],
+        dtype=np.uint64,
+    )
+
+
+def simhash(text):
+    """
+    64-bit SimHash of a text's word 3-grams, returned as a signed integer so it fits an SQLite
+    INTEGER column. Similar texts get fingerprints that differ in only a few bits.
+    """
+    hashes = _shingle_hashes(text)
+    if hashes.size == 0:
+        return 0
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = (2 * bits.astype(np.int64) - 1).sum(axis=0)
+    fingerprint = int(np.packbits(votes > 0, bitorder='little').view('<u8')[0])
+    return fingerprint - (1 << 64) if fingerprint >= (1 << 63) else fingerprint
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over SimHash fingerprints. The 64 bits are split into max_distance + 1 bands, so any
+    two fingerprints within max_distance bits share at least one band exactly; only resumes sharing
+    a band are compared.
+    """
+
+    def __init__(self, max_distance=None):
+        self.max_distance = NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        band_count = self.max_distance + 1
+        self._band_bits = max(1, 64 // band_count)
+        self._band_count = -(-64 // self._band_bits)
+        self._bands = [{} for _ in range(self._band_count)]
+
+    def _band_keys(self, fingerprint):
+        unsigned = fingerprint & 0xFFFFFFFFFFFFFFFF
+        mask = (1 << self._band_bits) - 1
+        return [(unsigned >> (i * self._band_bits)) & mask for i in range(self._band_count)]
+
+    def add(self, fingerprint, label):
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append((fingerprint, label))
+
+    def find(self, fingerprint):
+        """Returns the label of a stored near-duplicate, or None."""
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            for candidate, label in band.get(key, ()):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return label
+        return None
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def partition_duplicates(job_id, resumes_data, near_duplicates=None):
+    """
+    Splits an upload into the resumes worth analyzing and the duplicates to skip, checking both
+    the job's stored resumes and the rest of the upload. Returned resume dicts gain 'content_hash'
+    and 'simhash'. Returns (unique, duplicates) where duplicates is a list of (resume_data, reason).
+    Must be called inside an app context.
+    """
+    from backend.app import db, Resume
+
+    near_duplicates = NEAR_DUPLICATE_DETECTION if near_duplicates is None else near_duplicates
+    hashed = []
+    for rd in resumes_data:
+        content = None
+        content_hash = rd.get('content_hash')
+        if not content_hash:
+            content = resume_content(rd)
+            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        fingerprint = rd.get('simhash')
+        if fingerprint is None and near_duplicates:
+            fingerprint = simhash(content if content is not None else resume_content(rd))
+        hashed.append(dict(rd, content_hash=content_hash, simhash=fingerprint))
+
+    # Exact matches against stored resumes: one IN query per slice instead of one query per file.
+    stored_by_hash = {}
+    stored_filenames = set()
+    for chunk in _chunks(hashed, _IN_QUERY_CHUNK):
+        rows = db.session.query(Resume.filename, Resume.content_hash).filter(
+            Resume.job_id == job_id,
+            db.or_(Resume.content_hash.in_([rd['content_hash'] for rd in chunk]),
+                   Resume.filename.in_([rd['filename'] for rd in chunk])),
+        ).all()
+        for filename, content_hash in rows:
+            stored_by_hash[content_hash] = filename
+            stored_filenames.add(filename)
+
+    index = None
+    if near_duplicates:
+        index = NearDuplicateIndex()
+        stored = db.session.query(Resume.filename, Resume.simhash).filter(
+            Resume.job_id == job_id, Resume.simhash.isnot(None)
+        )
+        for filename, fingerprint in stored:
+            index.add(fingerprint, filename)
+
+    unique, duplicates = [], []
+    seen_hashes = {}
+    seen_filenames = set()
+    for rd in hashed:
+        if rd['content_hash'] in stored_by_hash or rd['content_hash'] in seen_hashes:
+            duplicates.append((rd, 'Duplicate content'))
+            continue
+        if rd['filename'] in stored_filenames or rd['filename'] in seen_filenames:
+            duplicates.append((rd, 'Duplicate filename'))
+            continue
+        if index is not None:
+            original = index.find(rd['simhash'])
+            if original is not None:
+                duplicates.append((rd, f'Near-duplicate of {original}'))
+                continue
+            index.add(rd['simhash'], rd['filename'])
+        seen_hashes[rd['content_hash']] = rd['filename']
+        seen_filenames.add(rd['filename'])
+        unique.append(rd)
+    return unique, duplicates
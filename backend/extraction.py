@@ -0,0 +1,210 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import docx  # python-docx
+import fitz  # PyMuPDF
+from flask import has_app_context
+
+from backend.extraction_cache import EXTRACTION_CACHE_ENABLED, get_cached_extractions, store_extractions
+
+# PDF/DOCX parsing is CPU-bound, so it runs in a pool of worker processes instead of request threads.
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', os.cpu_count() or 2))
+# A file that takes longer than this to parse is reported as unreadable.
+EXTRACTION_TIMEOUT_SECONDS = float(os.environ.get('EXTRACTION_TIMEOUT_SECONDS', 30))
+EXTRACTION_MAX_FILE_BYTES = int(os.environ.get('EXTRACTION_MAX_FILE_BYTES', 10 * 1024 * 1024))
+# Only the first pages of very long PDFs are read; no resume needs more.
+EXTRACTION_MAX_PAGES = int(os.environ.get('EXTRACTION_MAX_PAGES', 50))
+
+
+class ExtractionError(Exception):
+    """A file that can't be turned into text: too large, corrupt, or too slow to parse."""
+
+
+def _extract_pdf(data, max_pages):
+    with fitz.open(stream=data, filetype='pdf') as pdf_doc:
+        pages_read = min(pdf_doc.page_count, max_pages)
+        text = ''.join(pdf_doc[i].get_text() for i in range(pages_read))
+        return text, {'format': 'pdf', 'page_count': pdf_doc.page_count, 'pages_read': pages_read}
+
+
+def _extract_docx(data):
+    paragraphs = [para.text for para in docx.Document(io.BytesIO(data)).paragraphs]
+    text = '\n'.join(paragraphs) + '\n' if paragraphs else ''
+    return text, {'format': 'docx', 'paragraphs': len(paragraphs)}
+
+
+def extract_file(filename, data, max_pages=None):
+    """
+    Extracts one PDF, DOCX or plain-text file. Returns (text, metadata), where metadata records
+    the format and, for PDFs, the page count and pages read. Runs in the worker processes.
+    """
+    max_pages = EXTRACTION_MAX_PAGES if max_pages is None else max_pages
+    lowered = filename.lower()
+    if lowered.endswith('.pdf'):
+        return _extract_pdf(data, max_pages)
+    if lowered.endswith('.docx'):
+        return _extract_docx(data)
+    return data.decode('utf-8'), {'format': 'text'}
+
+
+def extract_text(filename, data, max_pages=None):
+    """Extracts the text of one PDF, DOCX or plain-text file."""
+    return extract_file(filename, data, max_pages)[0]
+
+
+def _needs_worker(filename):
+    return filename.lower().endswith(('.pdf', '.docx'))
+
+
+# --- Worker pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' keeps the workers free of the parent's threads, sockets and database connections.
+            _pool = ProcessPoolExecutor(max_workers=max(1, EXTRACTION_WORKERS),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    """Kills a pool whose workers are stuck or dead; the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # The executor can't cancel a running task, so stuck workers are terminated directly.
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _run_in_pool(fn, jobs, timeout):
+    """
+    Runs fn(*args) for each args tuple in the worker pool. Returns a list of (result, error)
+    pairs in the same order. At most EXTRACTION_WORKERS jobs are submitted at a time, so each
+    job's `timeout` counts from when it starts rather than from when the whole window was queued.
+    """
+    outcomes = [None] * len(jobs)
+    waiting = deque(range(len(jobs)))
+    running = {}  # future -> (job index, deadline)
+    pool = _get_pool()
+    while waiting or running:
+        while waiting and len(running) < max(1, EXTRACTION_WORKERS):
+            index = waiting.popleft()
+            try:
+                future = pool.submit(fn, *jobs[index])
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                pool = _get_pool()
+                future = pool.submit(fn, *jobs[index])
+            running[future] = (index, time.monotonic() + timeout)
+
+        next_deadline = min(deadline for _, deadline in running.values())
+        done, _ = wait(running, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        broken = False
+        for future in done:
+            index, _ = running.pop(future)
+            try:
+                outcomes[index] = (future.result(), None)
+            except BrokenProcessPool as e:
+                broken = True
+                outcomes[index] = (None, ExtractionError(f"Extraction worker crashed: {e}"))
+            except Exception as e:
+                outcomes[index] = (None, e)
+
+        now = time.monotonic()
+        expired = [future for future, (_, deadline) in running.items() if deadline <= now]
+        for future in expired:
+            index, _ = running.pop(future)
+            outcomes[index] = (None, ExtractionError(f"Timed out after {timeout:g}s"))
+        if expired or broken:
+            # Killing the stuck workers takes the healthy ones down too; their files start again on a fresh pool.
+            waiting.extendleft(sorted((index for index, _ in running.values()), reverse=True))
+            running.clear()
+            _discard_pool(pool)
+            pool = _get_pool()
+    return outcomes
+
+
+def extract_documents(files, timeout=None, max_file_bytes=None, max_pages=None, use_cache=None):
+    """
+    Extracts text from many uploaded files in parallel. files is a list of (filename, bytes).
+    Returns one dict per file, in order: {'filename', 'content', 'metadata', 'error', 'from_cache'},
+    where content is None and error a message if the file couldn't be read. Plain text is decoded
+    in-process; PDF and DOCX files are served from the extraction cache when their exact bytes
+    were seen before (inside an app context), and parsed in the worker pool otherwise.
+    """
+    timeout = EXTRACTION_TIMEOUT_SECONDS if timeout is None else timeout
+    max_file_bytes = EXTRACTION_MAX_FILE_BYTES if max_file_bytes is None else max_file_bytes
+    max_pages = EXTRACTION_MAX_PAGES if max_pages is None else max_pages
+    if use_cache is None:
+        use_cache = EXTRACTION_CACHE_ENABLED and has_app_context()
+
+    results = [
+        {'filename': filename, 'content': None, 'metadata': None, 'error': None, 'from_cache': False}
+        for filename, _ in files
+    ]
+    pooled = []
+    for index, (filename, data) in enumerate(files):
+        if len(data) > max_file_bytes:
+            results[index]['error'] = f"File is larger than {max_file_bytes // (1024 * 1024)} MB"
+        elif _needs_worker(filename):
+            pooled.append(index)
+        else:
+            try:
+                results[index]['content'], results[index]['metadata'] = extract_file(filename, data, max_pages)
+            except Exception as e:
+                results[index]['error'] = str(e)
+
+    file_hashes = {}
+    if pooled and use_cache:
+        file_hashes = {index: hashlib.sha256(files[index][1]).hexdigest() for index in pooled}
+        cached = get_cached_extractions(file_hashes.values(), max_pages)
+        for index in pooled:
+            hit = cached.get(file_hashes[index])
+            if hit is not None:
+                results[index].update(content=hit['text'], metadata=hit['metadata'], from_cache=True)
+        pooled = [index for index in pooled if not results[index]['from_cache']]
+
+    if pooled:
+        outcomes = _run_in_pool(extract_file, [(files[i][0], files[i][1], max_pages) for i in pooled], timeout)
+        fresh = []
+        for index, (extracted, error) in zip(pooled, outcomes):
+            if error is not None:
+                results[index]['error'] = str(error)
+                continue
+            results[index]['content'], results[index]['metadata'] = extracted
+            if use_cache:
+                fresh.append({'file_hash': file_hashes[index], 'text': extracted[0], 'metadata': extracted[1]})
+        if fresh:
+            store_extractions(fresh)
+    return results
+
+
+def extract_document(filename, data):
+    """Extracts one file's text through the shared engine. Raises ExtractionError if it can't be read."""
+    result = extract_documents([(filename, data)])[0]
+    if result['error']:
+        raise ExtractionError(result['error'])
+    return result['content']
@@ -0,0 +1,127 @@
+import json
+import os
+
+from backend.cache_util import CacheStats, chunked, evict_least_recently_used, lifetime_hits, touch_entries
+
+# Entries hold the text exactly as extracted, not normalize_resume_text's output: a hit has to return
+# what a fresh parse would, since resume content and its dedupe hash are derived from it.
+# Bump when extraction output changes, so stale texts are parsed again.
+EXTRACTOR_VERSION = '1'
+EXTRACTION_CACHE_ENABLED = os.environ.get('EXTRACTION_CACHE_ENABLED', 'true').lower() != 'false'
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', 50000))
+# Upper bound on the total stored text, in bytes.
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+_stats = CacheStats()
+
+
+def _is_usable(entry, max_pages):
+    if entry.extractor_version != EXTRACTOR_VERSION:
+        return False
+    # A PDF cached under a different page cap holds a different amount of text.
+    return not entry.page_count or entry.pages_read == min(entry.page_count, max_pages)
+
+
+def get_cached_extractions(file_hashes, max_pages):
+    """
+    Looks up many raw-file hashes at once. Returns a dict of file_hash -> {'text', 'metadata'}
+    for every usable entry. Must be called inside an app context.
+    """
+    from backend.app import db, ExtractionCacheEntry
+
+    file_hashes = list(set(file_hashes))
+    if not file_hashes:
+        return {}
+
+    hits = []
+    for chunk in chunked(file_hashes):
+        entries = ExtractionCacheEntry.query.filter(ExtractionCacheEntry.file_hash.in_(chunk)).all()
+        hits.extend(entry for entry in entries if _is_usable(entry, max_pages))
+    found = {
+        entry.file_hash: {'text': entry.text, 'metadata': json.loads(entry.extraction_metadata or '{}')}
+        for entry in hits
+    }
+    touch_entries(db, hits, 'extraction')
+
+    _stats.bump('hits', len(found))
+    _stats.bump('misses', len(file_hashes) - len(found))
+    return found
+
+
+def store_extractions(entries):
+    """
+    Stores fresh extractions. Each entry is a dict with 'file_hash', 'text' and 'metadata'
+    (page_count, pages_read, format). Existing hashes are replaced. Must be called inside an app context.
+    """
+    from backend.app import db, ExtractionCacheEntry
+
+    new_entries = {entry['file_hash']: entry for entry in entries}
+    if not new_entries:
+        return 0
+
+    try:
+        for chunk in chunked(list(new_entries)):
+            ExtractionCacheEntry.query.filter(ExtractionCacheEntry.file_hash.in_(chunk)).delete(synchronize_session=False)
+        db.session.add_all([
+            ExtractionCacheEntry(
+                file_hash=file_hash,
+                text=entry['text'],
+                text_bytes=len(entry['text'].encode('utf-8')),
+                page_count=entry['metadata'].get('page_count'),
+                pages_read=entry['metadata'].get('pages_read'),
+                extractor_version=EXTRACTOR_VERSION,
+                extraction_metadata=json.dumps(entry['metadata']),
+            )
+            for file_hash, entry in new_entries.items()
+        ])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to store extractions in cache: {e}")
+        return 0
+
+    _stats.bump('stores', len(new_entries))
+    evict_extractions()
+    return len(new_entries)
+
+
+def evict_extractions():
+    """
+    Deletes the least recently used entries until the cache is within both its entry
+    and byte limits. Returns the number of deleted rows.
+    """
+    from backend.app import db, ExtractionCacheEntry
+
+    try:
+        deleted = evict_least_recently_used(
+            db, ExtractionCacheEntry, EXTRACTION_CACHE_MAX_ENTRIES,
+            size_column=ExtractionCacheEntry.text_bytes, max_bytes=EXTRACTION_CACHE_MAX_BYTES
+        )
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to evict extraction cache entries: {e}")
+        return 0
+
+    _stats.bump('evictions', deleted)
+    return deleted
+
+
+def get_extraction_cache_stats():
+    """Returns process-level hit/miss counters together with persisted cache totals."""
+    from backend.app import db, ExtractionCacheEntry
+
+    stats = _stats.snapshot()
+    stats['entries'], stats['text_bytes'] = db.session.query(
+        db.func.count(ExtractionCacheEntry.id),
+        db.func.coalesce(db.func.sum(ExtractionCacheEntry.text_bytes), 0),
+    ).one()
+    stats['lifetime_hits'] = lifetime_hits(db, ExtractionCacheEntry)
+    stats['max_entries'] = EXTRACTION_CACHE_MAX_ENTRIES
+    stats['max_bytes'] = EXTRACTION_CACHE_MAX_BYTES
+    stats['extractor_version'] = EXTRACTOR_VERSION
+    return stats
+
+
+def reset_extraction_cache_stats():
+    """Resets the in-process counters."""
+    _stats.reset()
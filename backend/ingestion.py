@@ -0,0 +1,181 @@
+# Streaming ingestion for large uploads. Uploaded files are spooled to disk, extracted a window
+# at a time, and the analysis pipeline gets references to text files instead of the text itself,
+# so memory stays flat however many resumes are uploaded.
+import hashlib
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+
+from werkzeug.utils import secure_filename
+
+from backend.extraction import EXTRACTION_MAX_FILE_BYTES, extract_documents
+
+INGEST_SPOOL_DIR = os.environ.get('INGEST_SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool'))
+# Upper bound on raw upload bytes read into memory at once while extracting.
+INGEST_MAX_INFLIGHT_BYTES = int(os.environ.get('INGEST_MAX_INFLIGHT_BYTES', 32 * 1024 * 1024))
+# Archive uploads are analyzed this many resumes at a time while the archive is still being read.
+INGEST_ARCHIVE_CHUNK = int(os.environ.get('INGEST_ARCHIVE_CHUNK', 250))
+# Guards against archives with absurd member counts.
+INGEST_MAX_ARCHIVE_MEMBERS = int(os.environ.get('INGEST_MAX_ARCHIVE_MEMBERS', 10000))
+
+RESUME_EXTENSIONS = ('.pdf', '.docx', '.txt')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def resume_content(resume_data):
+    """A resume's full text, read from its spool file when the dict only carries a reference."""
+    content = resume_data.get('content')
+    if content is None:
+        with open(resume_data['content_path'], encoding='utf-8') as f:
+            content = f.read()
+    return content
+
+
+def create_spool(job_id):
+    """Creates a private spool directory for one upload."""
+    spool_dir = os.path.join(INGEST_SPOOL_DIR, f"job-{job_id}-{uuid.uuid4().hex}")
+    os.makedirs(spool_dir)
+    return spool_dir
+
+
+def discard_spool(spool_dir):
+    shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def spool_uploads(files, spool_dir):
+    """
+    Streams each uploaded FileStorage to the spool directory without reading it into memory.
+    Returns [{'filename', 'path', 'size'}] in upload order.
+    """
+    spooled = []
+    for index, upload in enumerate(files):
+        path = os.path.join(spool_dir, f"{index:05d}-{secure_filename(upload.filename) or 'upload'}")
+        upload.save(path)
+        spooled.append({'filename': upload.filename, 'path': path, 'size': os.path.getsize(path)})
+    return spooled
+
+
+def is_archive(filename):
+    return (filename or '').lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _copy_limited(source, path, max_bytes):
+    """Copies a stream to path in chunks. Returns the size, or None (and no file) if it exceeds max_bytes."""
+    size = 0
+    with open(path, 'wb') as out:
+        while True:
+            chunk = source.read(_COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            out.write(chunk)
+    if size > max_bytes:
+        os.remove(path)
+        return None
+    return size
+
+
+def _archive_members(filename, path):
+    """Yields (member_name, readable_stream) for each regular file, reading the archive sequentially."""
+    if filename.lower().endswith('.zip') or zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, member
+    else:
+        # 'r|*' reads the tar as a forward-only stream with any compression; nothing is unpacked up front.
+        with open(path, 'rb') as stream, tarfile.open(fileobj=stream, mode='r|*') as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, archive.extractfile(info)
+
+
+def spool_archive(archive, spool_dir, on_skip=None, max_file_bytes=None):
+    """
+    Streams the supported resumes out of a spooled ZIP or TAR archive (an entry from spool_uploads)
+    into the spool directory, one member at a time. A generator: each spooled entry is yielded as soon as it is written, so
+    extraction and analysis can start before the archive has been read to the end.
+    on_skip(name, reason) reports members that can't be used.
+    """
+    max_file_bytes = EXTRACTION_MAX_FILE_BYTES if max_file_bytes is None else max_file_bytes
+    archive_id = uuid.uuid4().hex[:8]
+    try:
+        for index, (name, member) in enumerate(_archive_members(archive['filename'], archive['path'])):
+            if index >= INGEST_MAX_ARCHIVE_MEMBERS:
+                if on_skip:
+                    on_skip(archive['filename'], f"More than {INGEST_MAX_ARCHIVE_MEMBERS} files; the rest were ignored")
+                return
+            filename = os.path.basename(name)
+            # Folders, OS metadata (__MACOSX, .DS_Store) and unsupported formats are ignored.
+            if not filename or filename.startswith('.') or '__MACOSX' in name or not filename.lower().endswith(RESUME_EXTENSIONS):
+                continue
+            path = os.path.join(spool_dir, f"{archive_id}-{index:05d}-{secure_filename(filename) or 'upload'}")
+            size = _copy_limited(member, path, max_file_bytes)
+            if size is None:
+                if on_skip:
+                    on_skip(filename, f"File is larger than {max_file_bytes // (1024 * 1024)} MB")
+                continue
+            yield {'filename': filename, 'path': path, 'size': size}
+    except (zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+        if on_skip:
+            on_skip(archive['filename'], f"Unreadable archive: {e}")
+
+
+def _windows(spooled, max_bytes):
+    """Groups spooled files so each group's raw size stays within max_bytes (a larger file goes alone)."""
+    window, window_bytes = [], 0
+    for item in spooled:
+        if window and window_bytes + item['size'] > max_bytes:
+            yield window
+            window, window_bytes = [], 0
+        window.append(item)
+        window_bytes += item['size']
+    if window:
+        yield window
+
+
+def extract_spooled(spooled, on_error=None, on_empty=None, max_inflight_bytes=None):
+    """
+    Extracts spooled uploads window by window and writes each text next to its upload.
+    Returns resume references {'filename', 'content_path', 'content_hash'} for the readable files;
+    on_error(filename, message) and on_empty(filename) report the rest.
+    """
+    return list(iter_extracted(spooled, on_error, on_empty, max_inflight_bytes))
+
+
+def iter_extracted(spooled, on_error=None, on_empty=None, max_inflight_bytes=None):
+    """Like extract_spooled, but yields each reference as soon as its window is extracted."""
+    max_inflight_bytes = INGEST_MAX_INFLIGHT_BYTES if max_inflight_bytes is None else max_inflight_bytes
+    for window in _windows(spooled, max_inflight_bytes):
+        uploads = []
+        for item in window:
+            with open(item['path'], 'rb') as f:
+                uploads.append((item['filename'], f.read()))
+        extracted_window = extract_documents(uploads)
+        del uploads
+
+        for item, extracted in zip(window, extracted_window):
+            os.remove(item['path'])
+            if extracted['error']:
+                if on_error:
+                    on_error(item['filename'], extracted['error'])
+                continue
+            if not extracted['content'].strip():
+                if on_empty:
+                    on_empty(item['filename'])
+                continue
+            encoded = extracted['content'].encode('utf-8')
+            content_path = item['path'] + '.txt'
+            with open(content_path, 'wb') as f:
+                f.write(encoded)
+            yield {
+                'filename': item['filename'],
+                'content_path': content_path,
+                'content_hash': hashlib.sha256(encoded).hexdigest(),
+            }
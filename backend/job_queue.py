@@ -0,0 +1,199 @@
+# Durable local job queue. In 'queue' execution mode uploads are recorded in a SQLite file and
+# processed by worker processes started with `python -m backend.worker`; no broker service is needed.
+# Progress events from the workers travel back to the web process through the same file.
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from backend.sqlite_util import ImmediateTransaction
+
+# 'queue' hands uploads to the workers (the default); 'inline' processes them inside the request,
+# which blocks it until the analysis finishes and is only meant for development without workers.
+JOB_EXECUTION = os.environ.get('JOB_EXECUTION', 'queue').lower()
+basedir = os.path.abspath(os.path.dirname(__file__))
+JOB_QUEUE_DB_PATH = os.environ.get('JOB_QUEUE_DB_PATH', os.path.join(basedir, 'job_queue.db'))
+# A running task whose worker hasn't sent a heartbeat for this long is handed to another worker.
+JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS = float(os.environ.get('JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS', 300))
+JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get('JOB_QUEUE_MAX_ATTEMPTS', 3))
+JOB_QUEUE_POLL_SECONDS = float(os.environ.get('JOB_QUEUE_POLL_SECONDS', 1.0))
+
+_relay_events = False
+_initialized_paths = set()
+# The queued task the current worker thread is running (see running_task).
+_current = threading.local()
+
+
+def _transaction():
+    db_path = JOB_QUEUE_DB_PATH
+    if db_path not in _initialized_paths:
+        with ImmediateTransaction(db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS queued_task ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, task TEXT NOT NULL, payload TEXT NOT NULL, "
+                "job_id INTEGER, status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, error TEXT, enqueued_at REAL NOT NULL, started_at REAL, heartbeat_at REAL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_queued_task_status ON queued_task (status, id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS relay_event ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        _initialized_paths.add(db_path)
+    return ImmediateTransaction(db_path)
+
+
+def queue_enabled():
+    return JOB_EXECUTION == 'queue'
+
+
+def enqueue(task, payload, job_id=None):
+    """Records a task for the workers. payload must be JSON-serializable. Returns the task id."""
+    with _transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO queued_task (task, payload, job_id, enqueued_at) VALUES (?, ?, ?, ?)",
+            (task, json.dumps(payload), job_id, time.time())
+        )
+        return cursor.lastrowid
+
+
+def claim(worker):
+    """
+    Takes the oldest queued task for this worker, first returning stalled tasks to the queue.
+    Returns {'id', 'task', 'payload', 'job_id', 'attempts'} or None when the queue is empty.
+    """
+    now = time.time()
+    with _transaction() as conn:
+        stale_before = now - JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS
+        conn.execute(
+            "UPDATE queued_task SET status = 'failed', finished_at = ?, error = 'Worker stopped responding' "
+            "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+            (now, stale_before, JOB_QUEUE_MAX_ATTEMPTS)
+        )
+        conn.execute(
+            "UPDATE queued_task SET status = 'queued', worker = NULL "
+            "WHERE status = 'running' AND heartbeat_at < ?",
+            (stale_before,)
+        )
+        row = conn.execute(
+            "SELECT id, task, payload, job_id, attempts FROM queued_task WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE queued_task SET status = 'running', worker = ?, attempts = attempts + 1, "
+            "started_at = ?, heartbeat_at = ? WHERE id = ?",
+            (worker, now, now, row[0])
+        )
+    return {'id': row[0], 'task': row[1], 'payload': json.loads(row[2]), 'job_id': row[3], 'attempts': row[4] + 1}
+
+
+def heartbeat(task_id):
+    with _transaction() as conn:
+        conn.execute("UPDATE queued_task SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (time.time(), task_id))
+
+
+def complete(task_id):
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE queued_task SET status = 'done', finished_at = ?, error = NULL WHERE id = ?",
+            (time.time(), task_id)
+        )
+
+
+def fail(task_id, error):
+    """Marks a task failed. Tasks are not retried automatically after an exception, only after a crash."""
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE queued_task SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+            (time.time(), str(error)[:2000], task_id)
+        )
+
+
+@contextmanager
+def running_task(task_id):
+    """Marks task_id as the task this thread is running, so record_task_run can find it."""
+    _current.task_id = task_id
+    try:
+        yield
+    finally:
+        _current.task_id = None
+
+
+def record_task_run(run_id):
+    """
+    Adds an analysis run started by the running task to the task's payload as 'run_ids', so that
+    if the task is handed to another worker the retry can close out the runs it leaves behind.
+    Does nothing outside a queued task.
+    """
+    task_id = getattr(_current, 'task_id', None)
+    if task_id is None:
+        return
+    with _transaction() as conn:
+        row = conn.execute("SELECT payload FROM queued_task WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return
+        payload = json.loads(row[0])
+        payload['run_ids'] = payload.get('run_ids', []) + [run_id]
+        conn.execute("UPDATE queued_task SET payload = ? WHERE id = ?", (json.dumps(payload), task_id))
+
+
+def cancel_tasks(job_id):
+    """Cancels a job's tasks that no worker has claimed yet. Returns their payloads."""
+    with _transaction() as conn:
+        rows = conn.execute(
+            "SELECT id, payload FROM queued_task WHERE job_id = ? AND status = 'queued'", (job_id,)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE queued_task SET status = 'cancelled', finished_at = ? WHERE id = ?",
+            [(time.time(), task_id) for task_id, _ in rows]
+        )
+    return [json.loads(payload) for _, payload in rows]
+
+
+def get_task(task_id):
+    with _transaction() as conn:
+        row = conn.execute(
+            "SELECT id, task, job_id, status, attempts, worker, error, enqueued_at, started_at, finished_at "
+            "FROM queued_task WHERE id = ?", (task_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    keys = ('id', 'task', 'job_id', 'status', 'attempts', 'worker', 'error', 'enqueued_at', 'started_at', 'finished_at')
+    return dict(zip(keys, row))
+
+
+def queue_stats():
+    """Task counts by status."""
+    with _transaction() as conn:
+        rows = conn.execute("SELECT status, COUNT(*) FROM queued_task GROUP BY status").fetchall()
+    stats = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+    stats.update(dict(rows))
+    return stats
+
+
+# --- Progress relay from worker processes ---
+
+def relay_events_to_web():
+    """Called by worker processes: progress events go to the queue file instead of Socket.IO."""
+    global _relay_events
+    _relay_events = True
+
+
+def relaying_events():
+    return _relay_events
+
+
+def publish_event(payload):
+    with _transaction() as conn:
+        conn.execute("INSERT INTO relay_event (payload, created_at) VALUES (?, ?)", (json.dumps(payload), time.time()))
+
+
+def drain_events(limit=500):
+    """Removes and returns the oldest relayed events, in order."""
+    with _transaction() as conn:
+        rows = conn.execute("SELECT id, payload FROM relay_event ORDER BY id LIMIT ?", (limit,)).fetchall()
+        if rows:
+            conn.execute("DELETE FROM relay_event WHERE id <= ?", (rows[-1][0],))
+    return [json.loads(payload) for _, payload in rows]
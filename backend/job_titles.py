@@ -0,0 +1,97 @@
+import hashlib
+import threading
+
+from backend.ai_service import JOB_TITLE_NOT_FOUND, extract_job_title_with_ai
+
+# Characters of the description shown where a job has no title yet.
+DESCRIPTION_PREVIEW_LENGTH = 100
+
+# description hash -> extracted title, shared by every job created in this process.
+_title_memo = {}
+_title_memo_lock = threading.Lock()
+
+
+def hash_description(description):
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def truncate_description(description, length=DESCRIPTION_PREVIEW_LENGTH):
+    return description[:length] + '...' if len(description) > length else description
+
+
+def job_display_title(job):
+    """The extracted title, or a truncated description while the title is pending."""
+    return job.title or truncate_description(job.description)
+
+
+def lookup_job_title(description, description_hash=None):
+    """
+    Returns the title for a job description, calling the model only for descriptions not seen
+    before: titles are memoized in-process and reused from other jobs with the same description.
+    Returns None if no title could be extracted, so the job is retried by the next backfill.
+    Must be called inside an app context.
+    """
+    from backend.app import db, Job
+
+    description_hash = description_hash or hash_description(description)
+    with _title_memo_lock:
+        title = _title_memo.get(description_hash)
+    if title is None:
+        title = db.session.query(Job.title).filter(
+            Job.description_hash == description_hash, Job.title.isnot(None)
+        ).limit(1).scalar()
+    if title is None:
+        try:
+            title = extract_job_title_with_ai(description)
+        except Exception as e:
+            print(f"Job title lookup failed: {e}")
+            return None
+        if not title or title == JOB_TITLE_NOT_FOUND:
+            return None
+    with _title_memo_lock:
+        _title_memo[description_hash] = title
+    return title
+
+
+def populate_job_title(job_id):
+    """Background task run after a job is created: stores the job's title."""
+    from backend.app import app, db, Job
+
+    with app.app_context():
+        try:
+            job = db.session.get(Job, job_id)
+            if job is None or job.title:
+                return
+            job.description_hash = job.description_hash or hash_description(job.description)
+            job.title = lookup_job_title(job.description, job.description_hash)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to populate title for job {job_id}: {e}")
+
+
+def backfill_job_titles(batch_size=100):
+    """
+    Fills in titles (and description hashes) for every job without one. Jobs sharing a
+    description cost a single lookup. Commits every batch_size jobs. Returns the number of titled jobs.
+    Must be called inside an app context.
+    """
+    from backend.app import db, Job
+
+    titled = 0
+    pending = 0
+    last_id = 0
+    while True:
+        jobs = Job.query.filter(Job.title.is_(None), Job.id > last_id).order_by(Job.id).limit(batch_size).all()
+        if not jobs:
+            break
+        for job in jobs:
+            last_id = job.id
+            job.description_hash = job.description_hash or hash_description(job.description)
+            job.title = lookup_job_title(job.description, job.description_hash)
+            if job.title:
+                titled += 1
+            pending += 1
+        db.session.commit()
+        print(f"Backfilled {titled} of {pending} untitled jobs so far")
+    return titled
@@ -0,0 +1,74 @@
+import json
+
+
+class TopLevelFieldParser:
+    """
+    Incremental parser for a streamed JSON object. Text is fed in arbitrary chunks and
+    every top-level field is returned as soon as its value is complete, long before the
+    closing brace of the object arrives. Nested values are returned whole.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._value_start = None
+        self._key = None
+        self._key_start = None
+
+    def feed(self, chunk):
+        """Consumes a chunk of text and returns a list of (key, value) pairs completed by it."""
+        completed = []
+        for char in chunk:
+            self._buffer.append(char)
+            index = self._position
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start is not None:
+                        self._key = self._decode(self._key_start, index + 1)
+                        self._key_start = None
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None and self._value_start is None:
+                    self._key_start = index
+                continue
+
+            if self._depth == 1 and self._key is not None:
+                if char == ':' and self._value_start is None:
+                    self._value_start = index + 1
+                    continue
+                if char in ',}':
+                    field = self._finish_field(index)
+                    if field is not None:
+                        completed.append(field)
+
+            if char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+        return completed
+
+    def _finish_field(self, end):
+        key, start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        if start is None:
+            return None
+        try:
+            return key, self._decode(start, end)
+        except ValueError:
+            return None
+
+    def _decode(self, start, end):
+        return json.loads(''.join(self._buffer[start:end]))
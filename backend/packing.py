@@ -0,0 +1,60 @@
+import os
+
+from backend.ingestion import resume_content
+from backend.prompt_budget import TRUNCATION_MARKER, compress_resume_text, estimate_tokens
+
+# Packing sends several short resumes in one analysis request, so the schema and job
+# description are paid for once per pack instead of once per resume.
+ANALYSIS_PACKING = os.environ.get('ANALYSIS_PACKING', 'false').lower() == 'true'
+# Estimated resume tokens allowed in one pack, and the most resumes one pack may hold
+# (each resume adds a full analysis to the response).
+PACK_TOKEN_BUDGET = int(os.environ.get('PACK_TOKEN_BUDGET', 6000))
+PACK_MAX_RESUMES = int(os.environ.get('PACK_MAX_RESUMES', 5))
+# Resumes longer than this are always analyzed on their own.
+PACK_MAX_RESUME_TOKENS = int(os.environ.get('PACK_MAX_RESUME_TOKENS', 1500))
+
+
+def resume_prompt_text(resume_data, token_savings=None):
+    """
+    The resume text sent for analysis: its content normalized and fit to the token budget. It is
+    built when the request is, so a run never holds every resume's prompt text at once. The
+    compression is added to token_savings (a TokenSavingsReport) once per resume.
+    """
+    text, original_tokens, compressed_tokens = compress_resume_text(resume_content(resume_data))
+    if token_savings is not None:
+        token_savings.add(original_tokens, compressed_tokens, truncated=TRUNCATION_MARKER in text, key=id(resume_data))
+    return text
+
+
+def plan_packs(resumes_data, token_budget=None, max_resumes=None, max_resume_tokens=None):
+    """
+    Groups resumes into packs by estimated token length (first-fit decreasing). Long resumes
+    get a pack of their own, and a pack never holds two resumes with the same filename,
+    since results are matched back by filename. Returns a list of lists of resume dicts.
+    """
+    token_budget = PACK_TOKEN_BUDGET if token_budget is None else token_budget
+    max_resumes = PACK_MAX_RESUMES if max_resumes is None else max_resumes
+    max_resume_tokens = PACK_MAX_RESUME_TOKENS if max_resume_tokens is None else max_resume_tokens
+
+    packs = []
+    sized = []
+    for rd in resumes_data:
+        tokens = estimate_tokens(resume_prompt_text(rd))
+        if tokens > max_resume_tokens or max_resumes <= 1:
+            packs.append([rd])
+        else:
+            sized.append((tokens, rd))
+
+    open_packs = []  # [used_tokens, filenames, resumes]
+    for tokens, rd in sorted(sized, key=lambda item: item[0], reverse=True):
+        for pack in open_packs:
+            used, filenames, members = pack
+            if used + tokens <= token_budget and len(members) < max_resumes and rd['filename'] not in filenames:
+                pack[0] += tokens
+                filenames.add(rd['filename'])
+                members.append(rd)
+                break
+        else:
+            open_packs.append([tokens, {rd['filename']}, [rd]])
+
+    return packs + [members for _, _, members in open_packs]
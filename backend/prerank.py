@@ -0,0 +1,143 @@
+import json
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from backend.ingestion import resume_content
+
+# Standard Okapi BM25 parameters.
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+PREFILTER_MODES = ('top_k', 'threshold')
+ARCHIVE_BUCKET = '🗄️ Swipe-Left Archive'
+# Pre-filtered resumes get a fit score inside the archive range (<65).
+_MAX_ARCHIVE_FIT_SCORE = 64
+
+_WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could did do does
+for from had has have having he her here him his how i if in into is it its itself just may me more
+most my no nor not of off on once only or other our ours out over own same she should so some such
+than that the their them then there these they this those through to too under until up very was
+we were what when where which while who whom why will with would you your yours
+able experience work working role team teams year years strong excellent skills ability join looking
+""".split())
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords. Keeps tech tokens such as 'c++', 'c#' and 'node.js'."""
+    return [t for t in _WORD_PATTERN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def bm25_scores(query_text, documents):
+    """
+    Scores every document against the query with BM25, vectorized over a
+    documents x query-terms frequency matrix. Returns a float array, one score per document.
+    """
+    query_counts = Counter(tokenize(query_text))
+    if not documents or not query_counts:
+        return np.zeros(len(documents))
+
+    terms = list(query_counts)
+    term_index = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)), dtype=np.float64)
+    doc_lengths = np.zeros(len(documents), dtype=np.float64)
+    for row, document in enumerate(documents):
+        tokens = tokenize(document)
+        doc_lengths[row] = len(tokens)
+        for token in tokens:
+            col = term_index.get(token)
+            if col is not None:
+                tf[row, col] += 1
+
+    n_docs = len(documents)
+    doc_freq = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+    avg_length = doc_lengths.mean() or 1.0
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)
+    saturated = tf * (BM25_K1 + 1) / (tf + length_norm[:, None])
+    # Terms the job description repeats weigh more, with diminishing returns.
+    query_weights = np.log1p(np.array([query_counts[t] for t in terms], dtype=np.float64))
+    return saturated @ (idf * query_weights)
+
+
+def relative_scores(scores):
+    """Rescales raw BM25 scores to 0-100 relative to the best document in the batch."""
+    scores = np.asarray(scores, dtype=np.float64)
+    best = scores.max() if scores.size else 0.0
+    if best <= 0:
+        return np.zeros_like(scores)
+    return np.round(100.0 * scores / best, 1)
+
+
+def parse_prefilter(mode, top_k=None, threshold=None):
+    """
+    Validates pre-filter settings from a request. Returns None when no pre-filter is wanted,
+    otherwise a dict for split_by_prefilter. Raises ValueError for invalid settings.
+    """
+    if not mode:
+        return None
+    if mode not in PREFILTER_MODES:
+        raise ValueError(f"prefilter_mode must be one of {', '.join(PREFILTER_MODES)}")
+    if mode == 'top_k':
+        top_k = int(top_k) if top_k not in (None, '') else 0
+        if top_k < 1:
+            raise ValueError("prefilter_top_k must be a positive integer")
+        return {'mode': mode, 'top_k': top_k}
+    threshold = float(threshold) if threshold not in (None, '') else -1
+    if not 0 <= threshold <= 100:
+        raise ValueError("prefilter_threshold must be between 0 and 100")
+    return {'mode': mode, 'threshold': threshold}
+
+
+def split_by_prefilter(resumes_data, job_description, prefilter):
+    """
+    Ranks resumes against the job description locally and splits them into the ones worth
+    an LLM analysis and the ones that go straight to the archive. Archived resume dicts get
+    an 'analysis_json' built from their local score and a 'prefiltered' flag.
+    Returns (selected, archived).
+    """
+    if not prefilter or not resumes_data:
+        return list(resumes_data), []
+
+    texts = [resume_content(rd) for rd in resumes_data]
+    scores = relative_scores(bm25_scores(job_description, texts))
+    order = np.argsort(-scores, kind='stable')
+    ranks = np.empty(len(order), dtype=int)
+    ranks[order] = np.arange(1, len(order) + 1)
+
+    if prefilter['mode'] == 'top_k':
+        keep = ranks <= prefilter['top_k']
+    else:
+        keep = scores >= prefilter['threshold']
+
+    selected, archived = [], []
+    for i, rd in enumerate(resumes_data):
+        if keep[i]:
+            selected.append(rd)
+        else:
+            archived.append(dict(
+                rd,
+                analysis_json=_archive_analysis(float(scores[i]), int(ranks[i]), len(resumes_data)),
+                prefiltered=True,
+            ))
+    return selected, archived
+
+
+def _archive_analysis(score, rank, total):
+    return json.dumps({
+        'candidate_name': 'Not provided',
+        'fit_score': min(_MAX_ARCHIVE_FIT_SCORE, int(math.floor(score * _MAX_ARCHIVE_FIT_SCORE / 100))),
+        'bucket': ARCHIVE_BUCKET,
+        'reasoning': f"Not sent for AI analysis: ranked {rank} of {total} by keyword relevance to the job description.",
+        'summary_points': [],
+        'skill_matrix': {'matches': [], 'gaps': []},
+        'timeline': [],
+        'logistics': {},
+        'prefiltered': True,
+        'prefilter_score': score,
+        'prefilter_rank': rank,
+    }, ensure_ascii=False)
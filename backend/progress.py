@@ -0,0 +1,138 @@
+# Per-job progress counters, kept in a small SQLite file shared by the web process and queue workers
+# (BEGIN IMMEDIATE transactions, see sqlite_util.py), so progress survives restarts and is cheap to poll.
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from backend.sqlite_util import ImmediateTransaction
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+PROGRESS_DB_PATH = os.environ.get('PROGRESS_DB_PATH', os.path.join(basedir, 'progress.db'))
+
+_COLUMNS = ('job_id', 'status', 'total', 'analyzed', 'failed', 'skipped', 'started_at', 'updated_at', 'finished_at')
+_initialized_paths = set()
+
+
+def _ensure_schema(db_path):
+    if db_path not in _initialized_paths:
+        with ImmediateTransaction(db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_progress ("
+                "job_id INTEGER PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0, "
+                "analyzed INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, skipped INTEGER NOT NULL DEFAULT 0, "
+                "started_at REAL NOT NULL, updated_at REAL NOT NULL, finished_at REAL)"
+            )
+        _initialized_paths.add(db_path)
+
+
+def _transaction():
+    _ensure_schema(PROGRESS_DB_PATH)
+    return ImmediateTransaction(PROGRESS_DB_PATH)
+
+
+def start_progress(job_id, total):
+    """
+    Adds resumes to a job's total. A job that is already running keeps its counters (another
+    upload or archive chunk joins it); a finished one starts counting afresh.
+    """
+    now = time.time()
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO job_progress (job_id, status, total, started_at, updated_at) VALUES (?, 'running', ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET "
+            "total = CASE WHEN status = 'running' THEN total + excluded.total ELSE excluded.total END, "
+            "analyzed = CASE WHEN status = 'running' THEN analyzed ELSE 0 END, "
+            "failed = CASE WHEN status = 'running' THEN failed ELSE 0 END, "
+            "skipped = CASE WHEN status = 'running' THEN skipped ELSE 0 END, "
+            "started_at = CASE WHEN status = 'running' THEN started_at ELSE excluded.started_at END, "
+            "status = 'running', updated_at = excluded.updated_at, finished_at = NULL",
+            (job_id, total, now, now)
+        )
+
+
+def resume_progress(job_id, unfinished, retried_failed=0):
+    """
+    Reopens a job's counters for a resumed run (see analysis_runs.resume_run). Its unfinished
+    resumes are already part of the job's total, so only counters that were lost start again
+    from them; failures being retried stop counting as failed.
+    """
+    now = time.time()
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO job_progress (job_id, status, total, started_at, updated_at) VALUES (?, 'running', ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET failed = MAX(0, failed - ?), "
+            "status = 'running', updated_at = excluded.updated_at, finished_at = NULL",
+            (job_id, unfinished, now, now, retried_failed)
+        )
+
+
+def record_progress(job_id, analyzed=0, failed=0, skipped=0):
+    """Atomically adds to a job's counters."""
+    if not (analyzed or failed or skipped):
+        return
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE job_progress SET analyzed = analyzed + ?, failed = failed + ?, skipped = skipped + ?, updated_at = ? "
+            "WHERE job_id = ?",
+            (analyzed, failed, skipped, time.time(), job_id)
+        )
+
+
+def withdraw_progress(job_id, count):
+    """Takes resumes that will no longer be processed (or will be counted again elsewhere) off a job's total."""
+    if not count:
+        return
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE job_progress SET total = MAX(0, total - ?), updated_at = ? WHERE job_id = ?",
+            (count, time.time(), job_id)
+        )
+
+
+def complete_if_done(job_id):
+    """
+    Marks the job complete once every counted resume was analyzed, failed or skipped.
+    Returns True only for the one caller that completed it, whichever process that is.
+    """
+    now = time.time()
+    with _transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE job_progress SET status = 'complete', finished_at = ?, updated_at = ? "
+            "WHERE job_id = ? AND status = 'running' AND analyzed + failed + skipped >= total",
+            (now, now, job_id)
+        )
+        return cursor.rowcount == 1
+
+
+def _isoformat(timestamp):
+    return datetime.utcfromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def get_progress(job_id):
+    """Returns a job's counters with throughput and ETA, or None if it has never been processed."""
+    # A plain read: in WAL mode it neither takes nor waits for the write lock.
+    _ensure_schema(PROGRESS_DB_PATH)
+    conn = sqlite3.connect(PROGRESS_DB_PATH, timeout=30)
+    try:
+        row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM job_progress WHERE job_id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    progress = dict(zip(_COLUMNS, row))
+    completed = progress['analyzed'] + progress['failed'] + progress['skipped']
+    remaining = max(0, progress['total'] - completed)
+    elapsed = (progress['finished_at'] or time.time()) - progress['started_at']
+    throughput = completed / elapsed * 60 if elapsed > 0 else 0.0
+    progress.update({
+        'completed': completed,
+        'remaining': remaining,
+        'percent': round(100.0 * completed / progress['total'], 1) if progress['total'] else 0.0,
+        'throughput_per_minute': round(throughput, 2),
+        'eta_seconds': round(remaining / throughput * 60, 1) if remaining and throughput else (0.0 if not remaining else None),
+        'started_at': _isoformat(progress['started_at']),
+        'updated_at': _isoformat(progress['updated_at']),
+        'finished_at': _isoformat(progress['finished_at']),
+    })
+    return progress
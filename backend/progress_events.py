@@ -0,0 +1,130 @@
+# Per-job Socket.IO rooms for progress events. Clients subscribe to the jobs they watch, so an
+# event only reaches the browsers interested in that job. 'verbose' subscribers receive every event
+# as it happens; 'summary' subscribers receive frames coalesced per job at a bounded rate.
+# Recent events are kept per job with sequence numbers, so a reconnecting client is sent only what it missed.
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+
+PROGRESS_MODES = ('summary', 'verbose')
+# Mode used when a client subscribes without choosing one.
+PROGRESS_DEFAULT_MODE = os.environ.get('PROGRESS_DEFAULT_MODE', 'summary').lower()
+# Summary frames sent per job per second at most (0 = send every event as its own frame).
+PROGRESS_FRAMES_PER_SECOND = float(os.environ.get('PROGRESS_FRAMES_PER_SECOND', 2))
+# Most recent events carried in a summary frame; older ones in the same frame are only counted.
+PROGRESS_FRAME_MAX_EVENTS = int(os.environ.get('PROGRESS_FRAME_MAX_EVENTS', 20))
+# Recent events kept per job for replay, and jobs kept (least recently updated ones are forgotten first).
+PROGRESS_REPLAY_EVENTS = int(os.environ.get('PROGRESS_REPLAY_EVENTS', 500))
+PROGRESS_REPLAY_JOBS = int(os.environ.get('PROGRESS_REPLAY_JOBS', 200))
+# Clients act on these (e.g. navigate away on 'complete'), so they are sent without waiting.
+_IMMEDIATE_TYPES = {'start', 'complete'}
+
+
+def job_room(job_id, mode=None):
+    return f"job:{job_id}:{mode or PROGRESS_DEFAULT_MODE}"
+
+
+class ProgressCoalescer:
+    """
+    Numbers each progress event per job and keeps it for replay, sends it to the job's verbose room
+    and folds it into the job's next summary frame.
+    emit(event, payload, room) does the sending, e.g. socketio.emit(event, payload, to=room).
+    """
+
+    def __init__(self, emit, frames_per_second=None, max_events=None, replay_events=None, replay_jobs=None):
+        self.emit = emit
+        frames_per_second = PROGRESS_FRAMES_PER_SECOND if frames_per_second is None else frames_per_second
+        self.interval = 1.0 / frames_per_second if frames_per_second > 0 else 0
+        self.max_events = max_events or PROGRESS_FRAME_MAX_EVENTS
+        self._pending = {}  # job_id -> {'events', 'counts', 'total'}
+        self._last_frame = {}  # job_id -> monotonic time of its last summary frame
+        self._timers = {}
+        self.replay_events = replay_events or PROGRESS_REPLAY_EVENTS
+        self.replay_jobs = replay_jobs or PROGRESS_REPLAY_JOBS
+        # Sequence numbers restart with the process; clients holding another stream_id start over.
+        self.stream_id = uuid.uuid4().hex
+        self._history = OrderedDict()  # job_id -> {'seq': last sequence number, 'events': deque}
+        # Held while emitting, so frames for a job never overtake each other.
+        self._lock = threading.Lock()
+
+    def publish(self, payload):
+        job_id = payload['job_id']
+        with self._lock:
+            payload = self._record(job_id, payload)
+            self.emit('progress_update', payload, job_room(job_id, 'verbose'))
+            frame = self._pending.get(job_id)
+            if frame is None:
+                frame = self._pending[job_id] = {'events': deque(maxlen=self.max_events), 'counts': Counter(), 'total': 0}
+            frame['events'].append(payload)
+            frame['counts'][payload.get('type', 'info')] += 1
+            frame['total'] += 1
+
+            wait = self._last_frame.get(job_id, float('-inf')) + self.interval - time.monotonic()
+            if payload.get('type') in _IMMEDIATE_TYPES or wait <= 0:
+                self._send_frame(job_id)
+            elif job_id not in self._timers:
+                timer = threading.Timer(wait, self.flush, args=(job_id,))
+                timer.daemon = True
+                self._timers[job_id] = timer
+                timer.start()
+            if payload.get('type') == 'complete':
+                self._last_frame.pop(job_id, None)
+
+    def _record(self, job_id, payload):
+        history = self._history.get(job_id)
+        if history is None:
+            history = self._history[job_id] = {'seq': 0, 'events': deque(maxlen=self.replay_events)}
+            while len(self._history) > self.replay_jobs:
+                self._history.popitem(last=False)
+        self._history.move_to_end(job_id)
+        history['seq'] += 1
+        payload = dict(payload, seq=history['seq'])
+        history['events'].append(payload)
+        return payload
+
+    def replay(self, job_id, last_seq=0, stream_id=None):
+        """
+        Returns the job's events after last_seq. 'reset' means the client's sequence numbers are
+        from another stream (e.g. before a restart) and it should discard what it has; 'gap' means
+        some missed events are no longer buffered and the client should reload the job instead.
+        """
+        with self._lock:
+            history = self._history.get(job_id) or {'seq': 0, 'events': ()}
+            latest_seq = history['seq']
+            reset = (stream_id is not None and stream_id != self.stream_id) or last_seq > latest_seq
+            if reset:
+                last_seq = 0
+            events = [event for event in history['events'] if event['seq'] > last_seq]
+            first_missing = last_seq + 1
+            return {
+                'stream_id': self.stream_id,
+                'latest_seq': latest_seq,
+                'events': events,
+                'reset': reset,
+                'gap': first_missing <= latest_seq and (not events or events[0]['seq'] > first_missing),
+            }
+
+    def flush(self, job_id=None):
+        """Sends pending summary frames now, for one job or all of them."""
+        with self._lock:
+            for pending_job_id in ([job_id] if job_id is not None else list(self._pending)):
+                self._send_frame(pending_job_id)
+
+    def _send_frame(self, job_id):
+        timer = self._timers.pop(job_id, None)
+        if timer is not None:
+            timer.cancel()
+        frame = self._pending.pop(job_id, None)
+        if frame is None:
+            return
+        self._last_frame[job_id] = time.monotonic()
+        events = list(frame['events'])
+        self.emit('progress_batch', {
+            'job_id': job_id,
+            'events': events,
+            'counts': dict(frame['counts']),
+            'omitted': frame['total'] - len(events),
+            'timestamp': time.time(),
+        }, job_room(job_id, 'summary'))
@@ -0,0 +1,157 @@
+import os
+import re
+import unicodedata
+
+# Maximum estimated tokens of resume text sent with each analysis request.
+RESUME_TOKEN_BUDGET = int(os.environ.get('RESUME_TOKEN_BUDGET', 6000))
+# Share of the budget kept from the start of an over-long resume; the rest comes from the end,
+# where education and skills sections usually are.
+_HEAD_SHARE = 0.8
+TRUNCATION_MARKER = '[... resume truncated ...]'
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s{2,}", re.UNICODE)
+_INLINE_SPACE = re.compile(r'[ \t\f\v\u00a0\u2000-\u200b\u3000]+')
+_PAGE_NUMBER_LINE = re.compile(
+    r'^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d+\s*(?:of|/)\s*\d+|[-–—]?\s*\d{1,3}\s*[-–—]?)$',
+    re.IGNORECASE
+)
+# Lines this short are usually section headings and are allowed to repeat.
+_MIN_DEDUPE_WORDS = 4
+
+
+def estimate_tokens(text):
+    """
+    Fast local token estimate: one token per word, punctuation mark or whitespace run,
+    plus one for every further 8 characters of long words, which BPE tokenizers split.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        tokens += 1 + (len(match.group()) - 1) // 8
+    return tokens
+
+
+def normalize_resume_text(text):
+    """
+    Cleans raw PDF/DOCX text: normalizes unicode and whitespace, drops page-number
+    lines and repeated page headers/footers, and collapses runs of blank lines.
+    """
+    text = unicodedata.normalize('NFKC', text).replace('\r\n', '\n').replace('\r', '\n')
+
+    lines = []
+    seen = set()
+    blank_run = 0
+    for raw_line in text.split('\n'):
+        line = _INLINE_SPACE.sub(' ', raw_line).strip()
+        if not line:
+            blank_run += 1
+            if blank_run == 1 and lines:
+                lines.append('')
+            continue
+        blank_run = 0
+        if _PAGE_NUMBER_LINE.match(line):
+            continue
+        if len(line.split()) >= _MIN_DEDUPE_WORDS:
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+
+    return '\n'.join(lines).strip()
+
+
+def fit_to_budget(text, max_tokens):
+    """Trims text to at most max_tokens (estimated), cutting at line boundaries and keeping the head and the tail."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.split('\n')
+    head_budget = int(max_tokens * _HEAD_SHARE)
+    tail_budget = max_tokens - head_budget - estimate_tokens(TRUNCATION_MARKER)
+
+    head, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > head_budget:
+            # Keep the part of the line that still fits, so a resume without line breaks isn't dropped entirely.
+            partial = _take_words(line, head_budget - used)
+            if partial:
+                head.append(partial)
+            break
+        head.append(line)
+        used += cost
+
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        cost = estimate_tokens(line) + 1
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+
+    return '\n'.join(head + [TRUNCATION_MARKER] + tail)
+
+
+def _take_words(line, max_tokens):
+    words, used = [], 0
+    for word in line.split(' '):
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return ' '.join(words)
+
+
+def compress_resume_text(text, max_tokens=None):
+    """
+    Normalizes resume text and enforces the per-resume token budget.
+    Returns (compressed_text, original_tokens, compressed_tokens).
+    """
+    max_tokens = RESUME_TOKEN_BUDGET if max_tokens is None else max_tokens
+    compressed = fit_to_budget(normalize_resume_text(text), max_tokens)
+    return compressed, estimate_tokens(text), estimate_tokens(compressed)
+
+
+class TokenSavingsReport:
+    """Accumulates compression results for one job."""
+
+    def __init__(self):
+        self.resumes = 0
+        self.truncated = 0
+        self.original_tokens = 0
+        self.compressed_tokens = 0
+        self._counted = set()
+
+    def add(self, original_tokens, compressed_tokens, truncated=False, key=None):
+        """Counts one compressed resume. A resume added again under the same key (e.g. a retried request) is counted once."""
+        if key is not None:
+            if key in self._counted:
+                return
+            self._counted.add(key)
+        self.resumes += 1
+        self.original_tokens += original_tokens
+        self.compressed_tokens += compressed_tokens
+        if truncated:
+            self.truncated += 1
+
+    @property
+    def tokens_saved(self):
+        return self.original_tokens - self.compressed_tokens
+
+    def summary(self):
+        percent = (100.0 * self.tokens_saved / self.original_tokens) if self.original_tokens else 0.0
+        return (f"Prompt compression saved ~{self.tokens_saved} of {self.original_tokens} resume tokens "
+                f"({percent:.0f}%) across {self.resumes} resumes; {self.truncated} truncated to the budget.")
+
+    def to_dict(self):
+        return {
+            'resumes': self.resumes,
+            'truncated': self.truncated,
+            'original_tokens': self.original_tokens,
+            'compressed_tokens': self.compressed_tokens,
+            'tokens_saved': self.tokens_saved,
+        }
@@ -0,0 +1,391 @@
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import anthropic
+from openai import OpenAI, AsyncOpenAI
+
+from backend.prompt_budget import estimate_tokens
+from backend.rate_limiter import get_rate_limiter
+
+# Provider used when a job doesn't pick one: 'openai', 'anthropic', 'stub' or 'fake'.
+ANALYSIS_PROVIDER = os.environ.get('ANALYSIS_PROVIDER', 'openai')
+# Resumes the primary provider keeps failing on (timeouts, throttling, outages) are retried here.
+ANALYSIS_FALLBACK_PROVIDER = os.environ.get('ANALYSIS_FALLBACK_PROVIDER', '')
+
+ANTHROPIC_ANALYSIS_MODEL = os.environ.get('ANTHROPIC_ANALYSIS_MODEL', 'claude-3-5-sonnet-latest')
+ANTHROPIC_TITLE_MODEL = os.environ.get('ANTHROPIC_TITLE_MODEL', 'claude-3-5-haiku-latest')
+# Anthropic requires an explicit output limit on every request.
+ANTHROPIC_MAX_OUTPUT_TOKENS = int(os.environ.get('ANTHROPIC_MAX_OUTPUT_TOKENS', 4096))
+
+# Local stand-in server speaking the OpenAI chat completions protocol (see stub_server.py).
+STUB_PROVIDER_URL = os.environ.get('STUB_PROVIDER_URL', 'http://127.0.0.1:8765/v1')
+
+# Behaviour of the in-process fake provider, for load tests and offline benchmarks.
+FAKE_PROVIDER_LATENCY_SECONDS = float(os.environ.get('FAKE_PROVIDER_LATENCY_SECONDS', 0))
+FAKE_PROVIDER_LATENCY_JITTER_SECONDS = float(os.environ.get('FAKE_PROVIDER_LATENCY_JITTER_SECONDS', 0))
+FAKE_PROVIDER_ERROR_RATE = float(os.environ.get('FAKE_PROVIDER_ERROR_RATE', 0))
+FAKE_PROVIDER_THROTTLE_RATE = float(os.environ.get('FAKE_PROVIDER_THROTTLE_RATE', 0))
+FAKE_PROVIDER_SEED = int(os.environ.get('FAKE_PROVIDER_SEED', 0))
+
+# Local providers cost nothing, so their default limits are effectively unlimited.
+_LOCAL_RPM_LIMIT = 1000000
+_LOCAL_TPM_LIMIT = 1000000000
+
+
+class ProviderError(Exception):
+    """An error response from a provider without SDK error types of its own (the fake provider)."""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def _completion(content, total_tokens=None, headers=None):
+    """
+    The provider-neutral result of a chat request: its text and, when known, the tokens it used
+    and the x-ratelimit-* headers the rate limiter resizes its buckets from.
+    """
+    return SimpleNamespace(content=content, usage=SimpleNamespace(total_tokens=total_tokens), headers=headers or {})
+
+
+class AnalysisProvider(abc.ABC):
+    """
+    A chat model backend. Sync calls are used for one-off requests (job titles, single analyses);
+    async calls take a client from create_async_client(), which callers create once per event loop.
+    With on_delta, complete_async streams the response and passes each text fragment to it.
+    """
+    name = None
+    analysis_model = None
+    title_model = None
+    requests_per_minute = None
+    tokens_per_minute = None
+
+    def rate_limiter(self, model):
+        return get_rate_limiter(model, self.requests_per_minute, self.tokens_per_minute)
+
+    @abc.abstractmethod
+    def complete(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def create_async_client(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def complete_async(self, client, messages, model, json_output=False, on_delta=None):
+        raise NotImplementedError
+
+
+class OpenAIProvider(AnalysisProvider):
+    name = 'openai'
+
+    @property
+    def analysis_model(self):
+        from backend.ai_service import ANALYSIS_MODEL
+        return ANALYSIS_MODEL
+
+    @property
+    def title_model(self):
+        from backend.ai_service import TITLE_MODEL
+        return TITLE_MODEL
+
+    def _sync_client(self):
+        from backend.ai_service import get_client
+        return get_client()
+
+    def create_async_client(self):
+        return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
+
+    def _request_kwargs(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+        kwargs = {'model': model, 'messages': messages}
+        if json_output:
+            kwargs['response_format'] = {"type": "json_object"}
+        if temperature is not None:
+            kwargs['temperature'] = temperature
+        if max_tokens is not None:
+            kwargs['max_tokens'] = max_tokens
+        return kwargs
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+        # Raw responses expose the rate-limit headers alongside the parsed completion.
+        raw = self._sync_client().chat.completions.with_raw_response.create(
+            **self._request_kwargs(messages, model, max_tokens, temperature, json_output)
+        )
+        response = raw.parse()
+        return _completion(response.choices[0].message.content, getattr(response.usage, 'total_tokens', None), raw.headers)
+
+    async def complete_async(self, client, messages, model, json_output=False, on_delta=None):
+        kwargs = self._request_kwargs(messages, model, json_output=json_output)
+        if on_delta is None:
+            raw = await client.chat.completions.with_raw_response.create(**kwargs)
+            response = raw.parse()
+            return _completion(response.choices[0].message.content, getattr(response.usage, 'total_tokens', None), raw.headers)
+
+        raw = await client.chat.completions.with_raw_response.create(**kwargs, stream=True, stream_options={"include_usage": True})
+        stream = raw.parse()
+        parts = []
+        total_tokens = None
+        async for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                total_tokens = chunk.usage.total_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return _completion(''.join(parts), total_tokens, raw.headers)
+
+
+class StubHTTPProvider(OpenAIProvider):
+    """The OpenAI protocol against the local stand-in server, so load tests exercise real HTTP without cost."""
+    name = 'stub'
+    analysis_model = 'stub-analysis'
+    title_model = 'stub-title'
+    requests_per_minute = _LOCAL_RPM_LIMIT
+    tokens_per_minute = _LOCAL_TPM_LIMIT
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url or STUB_PROVIDER_URL
+        self._client = None
+
+    def _sync_client(self):
+        if self._client is None:
+            self._client = OpenAI(api_key='stub', base_url=self.base_url, max_retries=0)
+        return self._client
+
+    def create_async_client(self):
+        return AsyncOpenAI(api_key='stub', base_url=self.base_url, max_retries=0)
+
+
+class AnthropicProvider(AnalysisProvider):
+    name = 'anthropic'
+    analysis_model = ANTHROPIC_ANALYSIS_MODEL
+    title_model = ANTHROPIC_TITLE_MODEL
+
+    def __init__(self):
+        self._client = None
+
+    def _sync_client(self):
+        if self._client is None:
+            self._client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"), max_retries=0)
+        return self._client
+
+    def create_async_client(self):
+        return anthropic.AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"), max_retries=0)
+
+    def _request_kwargs(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+        # Anthropic takes the system prompt separately. There is no JSON mode, so JSON answers
+        # are started with a prefilled "{" which is added back to the response text.
+        system = '\n\n'.join(m['content'] for m in messages if m['role'] == 'system')
+        chat = [{'role': m['role'], 'content': m['content']} for m in messages if m['role'] != 'system']
+        if json_output:
+            chat.append({'role': 'assistant', 'content': '{'})
+        kwargs = {'model': model, 'messages': chat, 'max_tokens': max_tokens or ANTHROPIC_MAX_OUTPUT_TOKENS}
+        if system:
+            kwargs['system'] = system
+        if temperature is not None:
+            kwargs['temperature'] = temperature
+        return kwargs
+
+    @staticmethod
+    def _total_tokens(usage):
+        return usage.input_tokens + usage.output_tokens if usage else None
+
+    @staticmethod
+    def _rate_limit_headers(headers):
+        """Translates anthropic-ratelimit-* headers into the x-ratelimit-* form the rate limiter reads."""
+        translated = {}
+        for kind in ('requests', 'tokens'):
+            for field in ('limit', 'remaining'):
+                value = headers.get(f'anthropic-ratelimit-{kind}-{field}')
+                if value is not None:
+                    translated[f'x-ratelimit-{field}-{kind}'] = value
+            # Anthropic gives the reset as an RFC 3339 time rather than a duration.
+            reset = headers.get(f'anthropic-ratelimit-{kind}-reset')
+            if reset:
+                try:
+                    reset_at = datetime.fromisoformat(reset.replace('Z', '+00:00'))
+                except ValueError:
+                    continue
+                translated[f'x-ratelimit-reset-{kind}'] = str(max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds()))
+        return translated
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+        raw = self._sync_client().messages.with_raw_response.create(
+            **self._request_kwargs(messages, model, max_tokens, temperature, json_output)
+        )
+        response = raw.parse()
+        text = ''.join(block.text for block in response.content if block.type == 'text')
+        return _completion(('{' if json_output else '') + text, self._total_tokens(response.usage),
+                           self._rate_limit_headers(raw.headers))
+
+    async def complete_async(self, client, messages, model, json_output=False, on_delta=None):
+        kwargs = self._request_kwargs(messages, model, json_output=json_output)
+        prefix = '{' if json_output else ''
+        if on_delta is None:
+            raw = await client.messages.with_raw_response.create(**kwargs)
+            response = raw.parse()
+            text = ''.join(block.text for block in response.content if block.type == 'text')
+            return _completion(prefix + text, self._total_tokens(response.usage), self._rate_limit_headers(raw.headers))
+
+        parts = [prefix]
+        if prefix:
+            on_delta(prefix)
+        async with client.messages.stream(**kwargs) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                on_delta(text)
+            final = await stream.get_final_message()
+        return _completion(''.join(parts), self._total_tokens(final.usage), self._rate_limit_headers(stream.response.headers))
+
+
+class FakeProvider(AnalysisProvider):
+    """
+    Deterministic in-process provider with configurable latency, error and throttle rates.
+    Answers depend only on the request text; failures and jitter follow a seeded random
+    sequence, so a benchmark run can be repeated exactly.
+    """
+    name = 'fake'
+    analysis_model = 'fake-analysis'
+    title_model = 'fake-title'
+    requests_per_minute = _LOCAL_RPM_LIMIT
+    tokens_per_minute = _LOCAL_TPM_LIMIT
+
+    def __init__(self, latency=None, jitter=None, error_rate=None, throttle_rate=None, seed=None):
+        self.latency = FAKE_PROVIDER_LATENCY_SECONDS if latency is None else latency
+        self.jitter = FAKE_PROVIDER_LATENCY_JITTER_SECONDS if jitter is None else jitter
+        self.error_rate = FAKE_PROVIDER_ERROR_RATE if error_rate is None else error_rate
+        self.throttle_rate = FAKE_PROVIDER_THROTTLE_RATE if throttle_rate is None else throttle_rate
+        self._random = random.Random(FAKE_PROVIDER_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+        self.request_count = 0
+
+    def _plan_request(self):
+        """Draws this request's delay and failure, if any."""
+        with self._lock:
+            self.request_count += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return delay, ProviderError("Fake provider rate limit", 429, retry_after=0)
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, ProviderError("Fake provider error", 503)
+        return delay, None
+
+    def _respond(self, messages, json_output):
+        content = fake_completion_text(messages, json_output)
+        prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in messages)
+        return _completion(content, prompt_tokens + estimate_tokens(content))
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+        delay, error = self._plan_request()
+        time.sleep(delay)
+        if error:
+            raise error
+        return self._respond(messages, json_output)
+
+    def create_async_client(self):
+        return _NullAsyncClient()
+
+    async def complete_async(self, client, messages, model, json_output=False, on_delta=None):
+        delay, error = self._plan_request()
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        completion = self._respond(messages, json_output)
+        if on_delta is not None:
+            for start in range(0, len(completion.content), 16):
+                on_delta(completion.content[start:start + 16])
+        return completion
+
+
+class _NullAsyncClient:
+    async def close(self):
+        pass
+
+
+# --- Deterministic responses ---
+
+_RESUME_SECTION = re.compile(r'\*\*Resume(?: \((?P<filename>[^)\n]*)\))?:\*\*\n(?P<text>.*?)\n---\n', re.DOTALL)
+_JOB_DESCRIPTION_SECTION = re.compile(r'\*\*Job Description:\*\*\n(?P<text>.*?)\n---\n', re.DOTALL)
+
+
+def _fake_analysis(job_description, resume_text):
+    digest = int(hashlib.sha256(f"{job_description}\n{resume_text}".encode('utf-8')).hexdigest(), 16)
+    first_line = next((line.strip() for line in resume_text.split('\n') if line.strip()), '')
+    looks_like_name = 1 < len(first_line.split()) <= 4 and first_line.replace(' ', '').isalpha()
+    return {
+        'candidate_name': first_line if looks_like_name else 'Name Not Found',
+        'fit_score': digest % 101,
+        'reasoning': 'Generated by the deterministic fake provider.',
+        'summary_points': [],
+        'skill_matrix': {'matches': [], 'gaps': []},
+        'timeline': [],
+        'logistics': {},
+    }
+
+
+def fake_completion_text(messages, json_output=True):
+    """
+    Deterministic answer to an analysis, packed analysis or job title request. Each resume's
+    score depends only on the job description and that resume, however it was sent.
+    """
+    prompt = messages[-1]['content']
+    jd_match = _JOB_DESCRIPTION_SECTION.search(prompt)
+    job_description = jd_match.group('text') if jd_match else prompt
+    if not json_output:
+        first_line = next((line.strip() for line in job_description.split('\n') if line.strip()), '')
+        return first_line[:80] or 'Job Title Not Found'
+
+    resumes = list(_RESUME_SECTION.finditer(prompt))
+    if any(match.group('filename') for match in resumes):
+        return json.dumps({'analyses': [
+            dict(_fake_analysis(job_description, match.group('text')), filename=match.group('filename'))
+            for match in resumes
+        ]})
+    resume_text = resumes[0].group('text') if resumes else prompt
+    return json.dumps(_fake_analysis(job_description, resume_text))
+
+
+# --- Registry ---
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    AnthropicProvider.name: AnthropicProvider,
+    StubHTTPProvider.name: StubHTTPProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_provider(name=None):
+    """Returns the shared provider instance for a name, or the configured default. Raises ValueError for unknown names."""
+    name = name or ANALYSIS_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown analysis provider: {name}. Choose from {', '.join(PROVIDERS)}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = PROVIDERS[name]()
+        return _instances[name]
+
+
+def get_fallback_provider_name(primary=None):
+    """The configured fallback provider, unless it is the same as the primary."""
+    primary = primary or ANALYSIS_PROVIDER
+    if ANALYSIS_FALLBACK_PROVIDER and ANALYSIS_FALLBACK_PROVIDER != primary:
+        return ANALYSIS_FALLBACK_PROVIDER
+    return None
@@ -0,0 +1,335 @@
+import asyncio
+import os
+from collections.abc import Mapping
+import random
+import re
+import threading
+import time
+
+import anthropic
+import openai
+
+from backend.prompt_budget import estimate_tokens
+from backend.sqlite_util import ImmediateTransaction
+
+# Default provider limits. They can be set per model, e.g. OPENAI_GPT_4O_TPM_LIMIT,
+# and are corrected at runtime from the x-ratelimit-* headers the provider returns.
+OPENAI_RPM_LIMIT = int(os.environ.get('OPENAI_RPM_LIMIT', 500))
+OPENAI_TPM_LIMIT = int(os.environ.get('OPENAI_TPM_LIMIT', 30000))
+OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 6))
+OPENAI_BACKOFF_BASE_SECONDS = float(os.environ.get('OPENAI_BACKOFF_BASE_SECONDS', 1))
+OPENAI_BACKOFF_MAX_SECONDS = float(os.environ.get('OPENAI_BACKOFF_MAX_SECONDS', 60))
+
+# All worker threads and processes on a host share their buckets through this SQLite file.
+basedir = os.path.abspath(os.path.dirname(__file__))
+RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH', os.path.join(basedir, 'rate_limits.db'))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+# Timeouts and connection failures from either SDK, or from the local stand-in providers.
+RETRYABLE_ERROR_TYPES = (
+    openai.APITimeoutError, openai.APIConnectionError,
+    anthropic.APITimeoutError, anthropic.APIConnectionError,
+    TimeoutError, ConnectionError,
+)
+
+
+class TokenBucketRateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets for one model.
+    Bucket state lives in a SQLite table and every update runs in an IMMEDIATE
+    transaction, so concurrent threads and processes draw from the same budget.
+    """
+
+    def __init__(self, name, requests_per_minute, tokens_per_minute, db_path=None):
+        self.name = name
+        self.db_path = db_path or RATE_LIMIT_DB_PATH
+        self._defaults = {
+            'requests': float(requests_per_minute),
+            'tokens': float(tokens_per_minute),
+        }
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_bucket ("
+                "name TEXT PRIMARY KEY, capacity REAL NOT NULL, available REAL NOT NULL, "
+                "updated_at REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0)"
+            )
+            now = time.time()
+            # The configured limits replace whatever an earlier run saved; headers correct them afterwards.
+            for kind, capacity in self._defaults.items():
+                conn.execute(
+                    "INSERT INTO rate_limit_bucket (name, capacity, available, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET capacity = excluded.capacity, "
+                    "available = MIN(available, excluded.capacity)",
+                    (self._bucket_name(kind), capacity, capacity, now)
+                )
+
+    def _bucket_name(self, kind):
+        return f"{self.name}:{kind}"
+
+    def _transaction(self):
+        return ImmediateTransaction(self.db_path)
+
+    def _load(self, conn, kind, now):
+        capacity, available, updated_at, blocked_until = conn.execute(
+            "SELECT capacity, available, updated_at, blocked_until FROM rate_limit_bucket WHERE name = ?",
+            (self._bucket_name(kind),)
+        ).fetchone()
+        # Buckets refill continuously at capacity-per-minute.
+        available = min(capacity, available + (now - updated_at) * capacity / 60.0)
+        return {'capacity': capacity, 'available': available, 'blocked_until': blocked_until}
+
+    def _save(self, conn, kind, bucket, now):
+        conn.execute(
+            "UPDATE rate_limit_bucket SET capacity = ?, available = ?, updated_at = ?, blocked_until = ? WHERE name = ?",
+            (bucket['capacity'], bucket['available'], now, bucket['blocked_until'], self._bucket_name(kind))
+        )
+
+    def try_acquire(self, tokens=0):
+        """
+        Takes one request and `tokens` tokens if both are available. Returns 0 on success,
+        otherwise the number of seconds to wait before trying again.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            requests = self._load(conn, 'requests', now)
+            token_bucket = self._load(conn, 'tokens', now)
+            # A single request larger than the whole bucket would wait forever.
+            tokens = min(tokens, token_bucket['capacity'])
+
+            blocked_until = max(requests['blocked_until'], token_bucket['blocked_until'])
+            if blocked_until > now:
+                wait = blocked_until - now
+            else:
+                wait = max(
+                    _refill_wait(requests, 1),
+                    _refill_wait(token_bucket, tokens),
+                )
+            if wait <= 0:
+                requests['available'] -= 1
+                token_bucket['available'] -= tokens
+            self._save(conn, 'requests', requests, now)
+            self._save(conn, 'tokens', token_bucket, now)
+        return max(wait, 0)
+
+    def acquire(self, tokens=0):
+        """Blocks until one request and `tokens` tokens have been taken."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, OPENAI_BACKOFF_MAX_SECONDS))
+
+    async def acquire_async(self, tokens=0):
+        """Async counterpart of acquire; the event loop keeps running while waiting."""
+        while True:
+            # The SQLite transaction can wait on other processes' locks, so it runs off the event loop.
+            wait = await asyncio.to_thread(self.try_acquire, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, OPENAI_BACKOFF_MAX_SECONDS))
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Refunds or charges the difference between the estimated and the actual token usage."""
+        now = time.time()
+        with self._transaction() as conn:
+            token_bucket = self._load(conn, 'tokens', now)
+            token_bucket['available'] = min(
+                token_bucket['capacity'],
+                token_bucket['available'] + estimated_tokens - actual_tokens
+            )
+            self._save(conn, 'tokens', token_bucket, now)
+
+    def refund(self, tokens):
+        """Returns the tokens taken for a call that failed, so failures don't drain the budget."""
+        self.reconcile(tokens, 0)
+
+    def pause(self, seconds):
+        """Stops every caller from sending requests for the given number of seconds."""
+        now = time.time()
+        with self._transaction() as conn:
+            for kind in ('requests', 'tokens'):
+                bucket = self._load(conn, kind, now)
+                bucket['blocked_until'] = max(bucket['blocked_until'], now + seconds)
+                self._save(conn, kind, bucket, now)
+
+    def update_from_headers(self, headers):
+        """Resizes the buckets from the provider's x-ratelimit-* response headers."""
+        if not isinstance(headers, Mapping) or not any(key.lower().startswith('x-ratelimit-') for key in headers):
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            for kind in ('requests', 'tokens'):
+                bucket = self._load(conn, kind, now)
+                limit = _header_number(headers.get(f'x-ratelimit-limit-{kind}'))
+                remaining = _header_number(headers.get(f'x-ratelimit-remaining-{kind}'))
+                reset = parse_reset_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+                if limit:
+                    bucket['capacity'] = limit
+                if remaining is not None:
+                    bucket['available'] = min(bucket['available'], remaining, bucket['capacity'])
+                    if remaining <= 0 and reset:
+                        bucket['blocked_until'] = max(bucket['blocked_until'], now + reset)
+                else:
+                    bucket['available'] = min(bucket['available'], bucket['capacity'])
+                self._save(conn, kind, bucket, now)
+
+    def snapshot(self):
+        now = time.time()
+        with self._transaction() as conn:
+            return {kind: self._load(conn, kind, now) for kind in ('requests', 'tokens')}
+
+
+def _refill_wait(bucket, amount):
+    deficit = amount - bucket['available']
+    if deficit <= 0:
+        return 0
+    return deficit / (bucket['capacity'] / 60.0)
+
+
+def _header_number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+
+
+def parse_reset_duration(value):
+    """Parses reset headers such as '1s', '6m0s' or '250ms' into seconds."""
+    if not value:
+        return None
+    number = _header_number(value)
+    if number is not None:
+        return number
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+# --- Limiter registry ---
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _model_setting(model, kind, default):
+    env_name = 'OPENAI_' + re.sub(r'[^A-Z0-9]+', '_', model.upper()) + f'_{kind}_LIMIT'
+    return int(os.environ.get(env_name, default))
+
+
+def get_rate_limiter(model, requests_per_minute=None, tokens_per_minute=None):
+    """
+    Returns the shared limiter for a model, creating it on first use. Providers can pass their
+    own default limits; the per-model environment settings still take precedence.
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = TokenBucketRateLimiter(
+                model,
+                requests_per_minute=_model_setting(model, 'RPM', requests_per_minute or OPENAI_RPM_LIMIT),
+                tokens_per_minute=_model_setting(model, 'TPM', tokens_per_minute or OPENAI_TPM_LIMIT),
+            )
+        return _limiters[model]
+
+
+def estimate_request_tokens(messages, max_output_tokens=0):
+    """Cheap token estimate for a chat request, including per-message overhead and the expected output."""
+    prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in messages)
+    return prompt_tokens + 4 * len(messages) + max_output_tokens
+
+
+# --- Retry policy ---
+
+def _status_code(error):
+    status_code = getattr(error, 'status_code', None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_retryable_error(error):
+    """Throttling, timeouts, connection failures and server errors are worth retrying; bad requests are not."""
+    if isinstance(error, RETRYABLE_ERROR_TYPES):
+        return True
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return False
+
+
+def is_throttle_error(error):
+    """True for a provider's 429 response, whichever SDK raised it."""
+    return _status_code(error) == 429
+
+
+def _error_headers(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'headers', None) or {}
+
+
+def backoff_delay(attempt, error=None):
+    """Delay before retry number `attempt`: the provider's retry-after if given, else capped exponential backoff with full jitter."""
+    retry_after = _header_number(_error_headers(error).get('retry-after')) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, OPENAI_BACKOFF_MAX_SECONDS)
+    ceiling = min(OPENAI_BACKOFF_MAX_SECONDS, OPENAI_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def record_failure(limiter, error, attempt):
+    """Feeds a failed call back into the limiter and returns how long to wait before retrying."""
+    delay = backoff_delay(attempt, error)
+    if is_throttle_error(error):
+        limiter.update_from_headers(_error_headers(error))
+        # Everyone sharing the limiter backs off, not just the caller that saw the 429.
+        limiter.pause(delay)
+    return delay
+
+
+def _record_usage(limiter, response, estimated_tokens):
+    """Charges the tokens a successful call actually used and resizes the buckets from its rate-limit headers."""
+    total_tokens = getattr(getattr(response, 'usage', None), 'total_tokens', None)
+    if isinstance(total_tokens, int):
+        limiter.reconcile(estimated_tokens, total_tokens)
+    limiter.update_from_headers(getattr(response, 'headers', None))
+
+
+def call_with_retry(request_fn, model, estimated_tokens, max_retries=None, limiter=None):
+    """
+    Calls request_fn() under the model's shared rate limit, retrying retryable errors
+    with backoff. Non-retryable errors and the last retryable one are raised.
+    """
+    limiter = limiter or get_rate_limiter(model)
+    max_retries = OPENAI_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        limiter.acquire(estimated_tokens)
+        try:
+            response = request_fn()
+        except Exception as e:
+            limiter.refund(estimated_tokens)
+            if not is_retryable_error(e) or attempt >= max_retries:
+                raise
+            attempt += 1
+            time.sleep(record_failure(limiter, e, attempt))
+            continue
+        _record_usage(limiter, response, estimated_tokens)
+        return response
+
+
+async def call_once_async(request_fn, model, estimated_tokens, limiter=None):
+    """
+    Awaits request_fn() once under the model's shared rate limit. Retrying is left
+    to the caller, which can combine it with its own concurrency control.
+    """
+    limiter = limiter or get_rate_limiter(model)
+    await limiter.acquire_async(estimated_tokens)
+    try:
+        response = await request_fn()
+    except Exception:
+        await asyncio.to_thread(limiter.refund, estimated_tokens)
+        raise
+    await asyncio.to_thread(_record_usage, limiter, response, estimated_tokens)
+    return response
@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Provider requests in flight at once across every job analyzed by this process.
+SCHEDULER_CAPACITY = int(os.environ.get('SCHEDULER_CAPACITY', 100))
+# Requests one user's jobs may have in flight at once (0 = no cap).
+SCHEDULER_USER_MAX_CONCURRENCY = int(os.environ.get('SCHEDULER_USER_MAX_CONCURRENCY', 0))
+# Relative shares: an interactive job gets this many requests dispatched per bulk request.
+SCHEDULER_WEIGHTS = {
+    'interactive': float(os.environ.get('SCHEDULER_INTERACTIVE_WEIGHT', 8)),
+    'bulk': float(os.environ.get('SCHEDULER_BULK_WEIGHT', 1)),
+}
+# Uploads with at least this many resumes run at bulk priority unless the caller says otherwise.
+SCHEDULER_BULK_THRESHOLD = int(os.environ.get('SCHEDULER_BULK_THRESHOLD', 100))
+
+
+def default_priority(resume_count):
+    return 'bulk' if resume_count >= SCHEDULER_BULK_THRESHOLD else 'interactive'
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class JobShare:
+    """A job's claim on the scheduler. Each provider request runs inside `async with share:`."""
+
+    def __init__(self, scheduler, job_id, priority, user_id):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.priority = priority
+        self.weight = SCHEDULER_WEIGHTS[priority]
+        self.user_id = user_id
+        self.registrations = 0
+        self.last_finish = 0.0
+        self.queued = 0
+        self.in_flight = 0
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release(self)
+
+    def snapshot(self):
+        return {
+            'job_id': self.job_id,
+            'priority': self.priority,
+            'weight': self.weight,
+            'user_id': self.user_id,
+            'queue_depth': self.queued,
+            'in_flight': self.in_flight,
+            'dispatched': self.dispatched,
+            'avg_wait_seconds': round(self.total_wait / self.dispatched, 3) if self.dispatched else 0.0,
+            'max_wait_seconds': round(self.max_wait, 3),
+        }
+
+
+class _Waiter:
+    def __init__(self, share, loop):
+        self.share = share
+        self.loop = loop
+        self.future = loop.create_future()
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+
+
+class FairShareScheduler:
+    """
+    Weighted fair queuing of provider requests across concurrent jobs. Every waiting request is
+    tagged with a virtual finish time that advances by 1/weight per request of its job, and
+    free slots go to the smallest tag. A 5-resume interactive upload is therefore served within a
+    few requests even while a large bulk import keeps every slot it isn't using.
+    Jobs run on their own event loops in different threads, so the state is guarded by a lock
+    and grants are handed to each loop thread-safely.
+    """
+
+    def __init__(self, capacity=None, user_max_concurrency=None):
+        self.capacity = SCHEDULER_CAPACITY if capacity is None else capacity
+        self.user_max_concurrency = SCHEDULER_USER_MAX_CONCURRENCY if user_max_concurrency is None else user_max_concurrency
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._waiting = []
+        self._user_in_flight = defaultdict(int)
+        self._jobs = {}
+
+    def register(self, job_id, priority='interactive', user_id=None):
+        """Returns the job's share, creating it on first use. Pair every call with unregister()."""
+        if priority not in SCHEDULER_WEIGHTS:
+            raise ValueError(f"Unknown priority '{priority}'. Choose from: {', '.join(SCHEDULER_WEIGHTS)}")
+        with self._lock:
+            share = self._jobs.get(job_id)
+            if share is None:
+                share = self._jobs[job_id] = JobShare(self, job_id, priority, user_id)
+            share.registrations += 1
+            return share
+
+    def unregister(self, share):
+        with self._lock:
+            share.registrations -= 1
+            if share.registrations <= 0 and self._jobs.get(share.job_id) is share:
+                del self._jobs[share.job_id]
+
+    async def acquire(self, share):
+        waiter = _Waiter(share, asyncio.get_running_loop())
+        with self._lock:
+            share.last_finish = max(self._virtual_time, share.last_finish) + 1.0 / share.weight
+            heapq.heappush(self._waiting, (share.last_finish, next(self._sequence), waiter))
+            share.queued += 1
+            self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._release(share)
+                else:
+                    waiter.cancelled = True
+                    share.queued -= 1
+            raise
+
+    def release(self, share):
+        with self._lock:
+            self._release(share)
+
+    def _release(self, share):
+        self.in_flight -= 1
+        share.in_flight -= 1
+        if share.user_id is not None:
+            self._user_in_flight[share.user_id] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        # Called with the lock held. Requests of users at their cap wait without blocking others.
+        held_back = []
+        while self._waiting and self.in_flight < self.capacity:
+            entry = heapq.heappop(self._waiting)
+            finish, _, waiter = entry
+            if waiter.cancelled:
+                continue
+            share = waiter.share
+            if (self.user_max_concurrency and share.user_id is not None
+                    and self._user_in_flight[share.user_id] >= self.user_max_concurrency):
+                held_back.append(entry)
+                continue
+            waiter.granted = True
+            self._virtual_time = max(self._virtual_time, finish)
+            self.in_flight += 1
+            if share.user_id is not None:
+                self._user_in_flight[share.user_id] += 1
+            share.queued -= 1
+            share.in_flight += 1
+            share.dispatched += 1
+            wait = time.monotonic() - waiter.enqueued_at
+            share.total_wait += wait
+            share.max_wait = max(share.max_wait, wait)
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+        for entry in held_back:
+            heapq.heappush(self._waiting, entry)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'user_max_concurrency': self.user_max_concurrency,
+                'in_flight': self.in_flight,
+                'jobs': [share.snapshot() for share in self._jobs.values()],
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler shared by every job."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairShareScheduler()
+        return _scheduler
@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+
+
+def upgrade_schema():
+    """
+    Adds columns that were introduced after a table was first created. db.create_all() only
+    creates missing tables, so existing databases need new nullable columns added in place.
+    Returns the list of "table.column" names that were added. Must be called inside an app context.
+    """
+    from backend.app import db
+
+    added = []
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in existing_columns]
+            for column in missing:
+                if not column.nullable and column.server_default is None:
+                    print(f"Cannot add required column {table.name}.{column.name} automatically")
+                    continue
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                if any(column in missing for column in index.columns):
+                    index.create(conn, checkfirst=True)
+    return added
@@ -0,0 +1,21 @@
+# Helpers for the small SQLite files that processes on one host share (rate limits, job queue, progress).
+import sqlite3
+
+
+class ImmediateTransaction:
+    """Opens a short-lived connection and holds the SQLite write lock for the duration of the block."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def __enter__(self):
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
@@ -1,15 +1,15 @@
 #!/usr/bin/env python
 """
-Script to start the Celery worker for TalentVibe
+Script to start the TalentVibe background workers (see worker.py).
+Kept under its old name for existing deployment scripts; equivalent to `python -m backend.worker`.
 """
 import os
 import sys
 
-# Add the backend directory to the Python path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Add the project root to the Python path so the backend package can be imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from celery_config import celery_app
+from backend.worker import main
 
 if __name__ == '__main__':
-    # Start the Celery worker
-    celery_app.worker_main(['worker', '--loglevel=info', '--concurrency=2']) 
\ No newline at end of file
+    main()
@@ -0,0 +1,136 @@
+# Local stand-in for the OpenAI chat completions endpoint, backed by the deterministic fake
+# provider. Point the 'stub' provider at it to load-test the pipeline over real HTTP:
+#
+#     python -m backend.stub_server --port 8765 --latency 0.8 --jitter 0.4 --error-rate 0.02
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.providers import FakeProvider, ProviderError
+
+_STREAM_CHUNK_CHARS = 16
+
+
+class StubCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set by make_stub_server.
+    provider = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        json_output = (body.get('response_format') or {}).get('type') == 'json_object'
+
+        try:
+            completion = self.provider.complete(body.get('messages', []), body.get('model'), json_output=json_output)
+        except ProviderError as e:
+            self._send_json(e.status_code, {'error': {'message': str(e), 'type': 'server_error'}},
+                            headers=e.response.headers)
+            return
+
+        if body.get('stream'):
+            self._send_stream(body, completion)
+        else:
+            self._send_json(200, {
+                'id': f"chatcmpl-{uuid.uuid4().hex}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': completion.content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': _usage(completion),
+            })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, body, completion):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def event(choices, usage=None):
+            payload = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': created,
+                       'model': body.get('model'), 'choices': choices}
+            if usage is not None:
+                payload['usage'] = usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+        content = completion.content
+        for start in range(0, len(content), _STREAM_CHUNK_CHARS):
+            event([{'index': 0, 'delta': {'content': content[start:start + _STREAM_CHUNK_CHARS]}, 'finish_reason': None}])
+        event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+        if (body.get('stream_options') or {}).get('include_usage'):
+            event([], usage=_usage(completion))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def _usage(completion):
+    total = completion.usage.total_tokens or 0
+    return {'prompt_tokens': total, 'completion_tokens': 0, 'total_tokens': total}
+
+
+def make_stub_server(host='127.0.0.1', port=8765, provider=None):
+    """Creates (but doesn't start) a threaded stub server. Port 0 picks a free port."""
+    handler = type('BoundStubCompletionsHandler', (StubCompletionsHandler,), {'provider': provider or FakeProvider()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_stub_server_in_thread(host='127.0.0.1', port=0, provider=None):
+    """Starts a stub server on a daemon thread. Returns the server; call shutdown() to stop it."""
+    server = make_stub_server(host, port, provider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=None, help="Mean seconds per request")
+    parser.add_argument('--jitter', type=float, default=None, help="Latency varies by up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=None, help="Share of requests answered with a 503")
+    parser.add_argument('--throttle-rate', type=float, default=None, help="Share of requests answered with a 429")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    provider = FakeProvider(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            throttle_rate=args.throttle_rate, seed=args.seed)
+    server = make_stub_server(args.host, args.port, provider)
+    print(f"Stub completions server listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,145 +1,320 @@
 import json
 import hashlib
+import os
 import time
-import concurrent.futures
-from celery import Celery
 from flask_socketio import emit
-from backend.ai_service import analyze_resume_with_ai
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.ai_service import ANALYSIS_STREAMING
+from backend.async_analyzer import analyze_resumes_concurrently
+from backend.analysis_cache import make_cache_key, get_cached_analyses, store_analyses
+from backend.analysis_runs import start_run, mark_items, finish_run, run_controls
+from backend.audit_log import audit
+from backend.ingestion import resume_content
+from backend.job_queue import record_task_run
+from backend.prompt_budget import TokenSavingsReport
+from backend.prerank import split_by_prefilter
+from backend.progress import start_progress, record_progress
+from backend.scheduler import default_priority, get_scheduler
+from backend.providers import get_provider
 
-# This setup is for local development. It runs tasks synchronously in-memory
-# without needing an external message broker like Redis.
-celery_app = Celery('tasks', broker='memory://', backend='rpc://')
-celery_app.conf.update(task_always_eager=True)
+# Analyzed resumes are committed in micro-batches as they finish: once this many are waiting,
+# or when this many seconds have passed since the last commit.
+RESULT_COMMIT_BATCH_SIZE = int(os.environ.get('RESULT_COMMIT_BATCH_SIZE', 20))
+RESULT_COMMIT_INTERVAL_SECONDS = float(os.environ.get('RESULT_COMMIT_INTERVAL_SECONDS', 2.0))
 
-def analyze_resume_in_worker(resume_data, job_description):
+def assign_bucket(fit_score):
+    """Maps a fit score to its bucket. Buckets are assigned strictly in Python, never by the model."""
+    if fit_score is None:
+        return 'Unknown'
+    if fit_score > 90:
+        return '🚀 Green-Room Rocket'
+    elif 80 <= fit_score <= 89:
+        return '⚡ Book-the-Call'
+    elif 65 <= fit_score <= 79:
+        return '🛠️ Bench Prospect'
+    return '🗄️ Swipe-Left Archive'
+
+def finalize_analysis(filename, analysis_json, job_id=None):
+    """Parses a raw AI analysis, records it in the audit log, and overwrites the bucket from the fit score."""
+    analysis_data = json.loads(analysis_json)
+
+    fit_score = analysis_data.get('fit_score')
+    bucket = assign_bucket(fit_score)
+    # The raw model output is logged before the bucket is overwritten.
+    audit('analysis', job_id=job_id, filename=filename, fit_score=fit_score, bucket=bucket, analysis=dict(analysis_data))
+    if fit_score is not None:
+        analysis_data['bucket'] = bucket
+
+    return analysis_data
+
+def resolve_candidate_name(analysis_data, filename):
+    """Uses the name the AI found, falling back to one derived from the filename."""
+    candidate_name = analysis_data.get("candidate_name", "Not provided")
+    if not candidate_name or candidate_name.strip().lower() == 'not provided':
+        candidate_name = filename.split('.')[0].replace('_', ' ').replace('-', ' ')
+    return candidate_name
+
+def _is_cacheable(analysis_json):
+    """Only well-formed, error-free analyses are worth caching."""
+    try:
+        analysis_data = json.loads(analysis_json)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(analysis_data, dict) and not analysis_data.get('error') and analysis_data.get('bucket') != 'Error'
+
+class _ResultWriter:
     """
-    This is the only function that runs in a parallel worker thread.
-    It is completely decoupled from the Flask app and database.
-    Its only job is to call the AI service and return data.
+    Saves analyzed resumes for a job in small transactions as they complete, so they show up in
+    /api/jobs/<id> while the rest of the job is still running. Rows that already exist for the job
+    (same filename or content) are ignored; if a batch fails, its rows are retried one at a time so
+    a bad row only costs itself. Resumes that belong to an AnalysisRun are checkpointed as they
+    are saved or fail. Must be used inside an app context.
     """
-    filename = resume_data.get('filename')
-    content = resume_data.get('content')
-    
-    # Perform the CPU/network-bound analysis
-    analysis_json = analyze_resume_with_ai(content, job_description)
-    
-    # Return a dictionary with all data needed by the main thread
-    return {
-        'filename': filename,
-        'content': content,
-        'analysis_json': analysis_json,
-    }
-
-@celery_app.task
-def process_job_resumes(job_id, resumes_data, job_description):
+
+    def __init__(self, job_id, job_description, analysis_model, use_cache,
+                 batch_size=None, interval=None):
+        self.job_id = job_id
+        self.job_description = job_description
+        self.analysis_model = analysis_model
+        self.use_cache = use_cache
+        self.batch_size = batch_size or RESULT_COMMIT_BATCH_SIZE
+        self.interval = RESULT_COMMIT_INTERVAL_SECONDS if interval is None else interval
+        self.saved = 0
+        self.skipped_files = []
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def add(self, res_data):
+        self._pending.append(res_data)
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        from backend.app import emit_progress_update
+
+        batch, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if not batch:
+            return
+
+        if self.use_cache:
+            # Cache fresh analyses before saving resumes, so a failed commit below
+            # doesn't mean paying for the same analyses again on re-upload.
+            store_analyses([
+                {
+                    'job_description': self.job_description,
+                    'content_hash': res_data['content_hash'],
+                    'analysis_json': res_data['analysis_json'],
+                    # A fallback provider's analysis is cached under its own model, not the run's.
+                    'model': res_data.get('analysis_model') or self.analysis_model,
+                }
+                for res_data in batch
+                if not res_data.get('from_cache') and not res_data.get('prefiltered') and _is_cacheable(res_data['analysis_json'])
+            ])
+
+        rows = []
+        run_item_ids = {}
+        for res_data in batch:
+            analysis_data = finalize_analysis(res_data['filename'], res_data['analysis_json'], job_id=self.job_id)
+            if analysis_data.get('error'):
+                emit_progress_update(self.job_id, f"Skipping save for {res_data['filename']} due to AI error: {analysis_data.get('error_details')}", 'warning')
+                self.skipped_files.append({'status': 'error', 'filename': res_data['filename'], 'reason': analysis_data.get('error_details')})
+                mark_items([res_data.get('run_item_id')], 'failed', error=str(analysis_data.get('error_details')))
+                record_progress(self.job_id, failed=1)
+                continue
+            run_item_ids[res_data['filename']] = res_data.get('run_item_id')
+            rows.append({
+                'filename': res_data['filename'],
+                'candidate_name': resolve_candidate_name(analysis_data, res_data['filename']),
+                'content': resume_content(res_data),
+                'content_hash': res_data['content_hash'],
+                'simhash': res_data.get('simhash'),
+                'analysis': json.dumps(analysis_data, ensure_ascii=False),
+                'job_id': self.job_id,
+            })
+        if not rows:
+            return
+
+        failed_filenames = set()
+        duplicate_count = 0
+        try:
+            saved_filenames = self._insert(rows)
+        except Exception as e:
+            print(f"[job {self.job_id}] Saving a batch of {len(rows)} resumes failed, retrying one by one: {e}")
+            saved_filenames = set()
+            for row in rows:
+                try:
+                    saved_filenames |= self._insert([row])
+                except Exception as row_error:
+                    failed_filenames.add(row['filename'])
+                    mark_items([run_item_ids.get(row['filename'])], 'failed', error=f'Database commit failed: {row_error}')
+                    emit_progress_update(self.job_id, f"Database commit failed for {row['filename']}: {row_error}", 'error')
+                    self.skipped_files.append({'status': 'error', 'filename': row['filename'], 'reason': f'Database commit failed: {row_error}'})
+
+        for row in rows:
+            if row['filename'] not in saved_filenames and row['filename'] not in failed_filenames:
+                duplicate_count += 1
+                emit_progress_update(self.job_id, f"Skipped {row['filename']}: already saved for this job", 'warning')
+                self.skipped_files.append({'status': 'duplicate', 'filename': row['filename'], 'reason': 'Already saved for this job'})
+        # Resumes that were already saved for the job count as done for the run as well.
+        mark_items([item_id for filename, item_id in run_item_ids.items() if filename not in failed_filenames], 'done')
+        record_progress(self.job_id, analyzed=len(saved_filenames), failed=len(failed_filenames), skipped=duplicate_count)
+        if saved_filenames:
+            self.saved += len(saved_filenames)
+            emit_progress_update(self.job_id, f"Saved {len(saved_filenames)} resumes ({self.saved} so far).", 'success')
+
+    def _insert(self, rows):
+        """Inserts rows in one transaction, ignoring those that clash with an existing resume. Returns the saved filenames."""
+        from backend.app import db, Resume
+
+        table = Resume.__table__
+        statement = sqlite_insert(table).on_conflict_do_nothing().returning(table.c.filename)
+        try:
+            saved_filenames = set(db.session.execute(statement, rows).scalars())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return saved_filenames
+
+
+def process_job_resumes(job_id, resumes_data, job_description, use_cache=True, prefilter=None, provider=None, final=True,
+                        run_id=None, priority=None, max_concurrency=None):
     """
-    Processes multiple resumes for a job in parallel using a thread pool,
-    then commits all successful results to the database in a single transaction on the main thread.
+    Processes multiple resumes for a job concurrently on the async analysis engine, committing
+    results to the database in micro-batches on the main thread as they complete (see _ResultWriter).
+    Resumes already analyzed against the same job description are served from the
+    analysis cache unless use_cache is False. With a prefilter (see prerank.parse_prefilter),
+    only the best-ranked uncached resumes are sent to the model; the rest are archived with their local score.
+    provider picks the analysis provider for this job (default ANALYSIS_PROVIDER).
+    Each resume dict carries either its 'content' or a spooled 'content_path' reference (see ingestion).
+    final=False marks one chunk of a larger upload: its summary is reported as progress, not completion.
+    Progress is checkpointed in an AnalysisRun so an interrupted job can be resumed (see analysis_runs.py);
+    run_id continues an existing run with resume dicts carrying their 'run_item_id'. Returns the run id.
+    priority ('interactive' or 'bulk') sets the job's share of the fair-share scheduler; by default
+    large uploads run at bulk priority. max_concurrency caps the job's in-flight requests; both it and
+    cancellation (see analysis_runs.request_cancel) are picked up while the analysis runs.
     """
     # These imports MUST be inside the function to avoid circular dependencies
     # and to ensure they are accessed only by the main thread.
-    from backend.app import app, db, Resume, emit_progress_update, check_job_completion
+    from backend.app import app, db, Job, emit_progress_update, check_job_completion
 
     with app.app_context():
         total_resumes = len(resumes_data)
+        # Chunks of one upload (and concurrent uploads to the job) add to the same counters.
+        # A resumed run's resumes are already counted (see analysis_runs.resume_run).
+        if run_id is None:
+            start_progress(job_id, total_resumes)
         emit_progress_update(job_id, f"Starting parallel processing of {total_resumes} resumes...", 'start')
 
-        future_to_resume = {}
         analyzed_results = []
         skipped_files = []
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            # Submit analysis tasks to the thread pool
-            future_to_resume = {
-                executor.submit(analyze_resume_in_worker, rd, job_description): rd 
+        # Hash every resume up front so cached analyses can be resolved in one lookup.
+        # Spooled resume references arrive already hashed.
+        resumes_data = [
+            dict(rd, content_hash=rd.get('content_hash') or hashlib.sha256(resume_content(rd).encode('utf-8')).hexdigest())
+            for rd in resumes_data
+        ]
+
+        if run_id is None and resumes_data:
+            run, resumes_data = start_run(job_id, resumes_data, use_cache=use_cache, prefilter=prefilter, provider=provider,
+                                          max_concurrency=max_concurrency)
+            run_id = run.id
+            record_task_run(run_id)
+
+        # Analyses are cached per model, so switching providers never reuses another model's results.
+        analysis_model = get_provider(provider).analysis_model
+        writer = _ResultWriter(job_id, job_description, analysis_model, use_cache)
+        pending_resumes = resumes_data
+        if use_cache:
+            cache_keys = {
+                rd['content_hash']: make_cache_key(job_description, rd['content_hash'], model=analysis_model)
                 for rd in resumes_data
             }
-            
-            for future in concurrent.futures.as_completed(future_to_resume):
-                try:
-                    # Get the result from the worker thread
-                    result_data = future.result()
-                    analyzed_results.append(result_data)
-                    emit_progress_update(job_id, f"Completed analysis for {result_data['filename']}", 'success')
-                except Exception as exc:
-                    original_resume_data = future_to_resume[future]
-                    error_filename = original_resume_data.get('filename', 'unknown file')
-                    emit_progress_update(job_id, f"Error processing {error_filename}: {exc}", 'error')
-                    skipped_files.append({'status': 'error', 'filename': error_filename, 'reason': str(exc)})
-
-        # --- DATABASE OPERATIONS ON MAIN THREAD ONLY ---
-        if analyzed_results:
-            emit_progress_update(job_id, f"Collating {len(analyzed_results)} successful analyses for database commit...", 'info')
-            
-            new_resumes_to_add = []
-            for res_data in analyzed_results:
-                analysis_data = json.loads(res_data['analysis_json'])
-
-                # Log raw AI output for debugging
-                with open('ai_analysis_debug.log', 'a', encoding='utf-8') as logf:
-                    logf.write(f"{res_data['filename']}\n{json.dumps(analysis_data, ensure_ascii=False)}\n\n")
-
-                # Assign bucket strictly in Python
-                fit_score = analysis_data.get('fit_score')
-                if fit_score is not None:
-                    if fit_score > 90:
-                        bucket = '🚀 Green-Room Rocket'
-                    elif 80 <= fit_score <= 89:
-                        bucket = '⚡ Book-the-Call'
-                    elif 65 <= fit_score <= 79:
-                        bucket = '🛠️ Bench Prospect'
-                    else:
-                        bucket = '🗄️ Swipe-Left Archive'
-                    analysis_data['bucket'] = bucket
-                else:
-                    bucket = 'Unknown'
-
-                # Log fit_score and assigned bucket
-                with open('ai_analysis_debug.log', 'a', encoding='utf-8') as logf:
-                    logf.write(f"BUCKET_ASSIGN: {res_data['filename']} | fit_score: {fit_score} | bucket: {bucket}\n")
-
-                if analysis_data.get('error'):
-                    emit_progress_update(job_id, f"Skipping save for {res_data['filename']} due to AI error: {analysis_data.get('error_details')}", 'warning')
-                    skipped_files.append({'status': 'error', 'filename': res_data['filename'], 'reason': analysis_data.get('error_details')})
+            cached_analyses = get_cached_analyses(cache_keys.values())
+            pending_resumes = []
+            for rd in resumes_data:
+                cached_analysis = cached_analyses.get(cache_keys[rd['content_hash']])
+                if cached_analysis is None:
+                    pending_resumes.append(rd)
                     continue
+                analyzed_results.append(dict(rd, analysis_json=cached_analysis, from_cache=True))
+                emit_progress_update(job_id, f"Reused cached analysis for {rd['filename']}", 'success')
+            if cached_analyses:
+                emit_progress_update(job_id, f"{len(analyzed_results)} of {total_resumes} resumes served from the analysis cache.", 'info')
 
-                candidate_name = analysis_data.get("candidate_name", "Not provided")
-                if not candidate_name or candidate_name.strip().lower() == 'not provided':
-                    candidate_name = res_data['filename'].split('.')[0].replace('_', ' ').replace('-', ' ')
-
-                new_resume = Resume(
-                    filename=res_data['filename'],
-                    candidate_name=candidate_name,
-                    content=res_data['content'],
-                    content_hash=hashlib.sha256(res_data['content'].encode('utf-8')).hexdigest(),
-                    analysis=json.dumps(analysis_data, ensure_ascii=False),
-                    job_id=job_id
-                )
-                new_resumes_to_add.append(new_resume)
-            
-            if new_resumes_to_add:
-                try:
-                    db.session.add_all(new_resumes_to_add)
-                    db.session.commit()
-                    emit_progress_update(job_id, f"Successfully saved {len(new_resumes_to_add)} new resumes to the database.", 'success')
-                except Exception as e:
-                    db.session.rollback()
-                    emit_progress_update(job_id, f"Database commit failed: {e}", 'error')
-                    # Add all resumes that failed to commit to the skipped list
-                    for r in new_resumes_to_add:
-                        skipped_files.append({'status': 'error', 'filename': r.filename, 'reason': f'Database commit failed: {e}'})
-
-
-        final_success_count = len(analyzed_results) - len(skipped_files)
+        if prefilter and pending_resumes:
+            pending_resumes, archived_resumes = split_by_prefilter(pending_resumes, job_description, prefilter)
+            analyzed_results.extend(archived_resumes)
+            if archived_resumes:
+                emit_progress_update(job_id, f"Pre-filter archived {len(archived_resumes)} low-relevance resumes; sending {len(pending_resumes)} for AI analysis.", 'info')
+
+        # Cached and pre-filtered results are saved before any analysis starts.
+        for res_data in analyzed_results:
+            writer.add(res_data)
+        writer.flush()
+
+        mark_items([rd.get('run_item_id') for rd in pending_resumes], 'analyzing')
+
+        def on_result(result_data):
+            emit_progress_update(job_id, f"Completed analysis for {result_data['filename']}", 'success')
+            writer.add(result_data)
+
+        def on_error(original_resume_data, exc):
+            error_filename = original_resume_data.get('filename', 'unknown file')
+            emit_progress_update(job_id, f"Error processing {error_filename}: {exc}", 'error')
+            mark_items([original_resume_data.get('run_item_id')], 'failed', error=str(exc))
+            record_progress(job_id, failed=1)
+
+        def on_partial(resume_data, key, value):
+            # Early triage: the name and score are reported as soon as the stream closes them.
+            filename = resume_data['filename']
+            if key == 'candidate_name':
+                emit_progress_update(job_id, f"{filename}: candidate {value}", 'partial',
+                                     data={'filename': filename, 'candidate_name': value})
+            elif key == 'fit_score' and isinstance(value, (int, float)):
+                bucket = assign_bucket(value)
+                emit_progress_update(job_id, f"{filename}: fit score {value} ({bucket})", 'partial',
+                                     data={'filename': filename, 'fit_score': value, 'bucket': bucket})
+
+        # The engine runs hundreds of requests on one event loop; callbacks fire on this thread.
+        # Requests are interleaved with other jobs' by the fair-share scheduler.
+        job = db.session.get(Job, job_id)
+        scheduler = get_scheduler()
+        share = scheduler.register(job_id, priority=priority or default_priority(total_resumes),
+                                   user_id=job.user_id if job else None)
+        # Resume text is normalized and trimmed as each request is sent; the original content is what gets stored.
+        token_savings = TokenSavingsReport()
+        try:
+            fresh_results, failed_files = analyze_resumes_concurrently(
+                pending_resumes, job_description, on_result=on_result, on_error=on_error,
+                on_partial=on_partial if ANALYSIS_STREAMING else None, provider=provider, share=share,
+                check_controls=(lambda: run_controls(run_id)) if run_id is not None else None,
+                token_savings=token_savings
+            )
+        finally:
+            scheduler.unregister(share)
+        if token_savings.resumes:
+            emit_progress_update(job_id, token_savings.summary(), 'info')
+        analyzed_results.extend(fresh_results)
+        skipped_files.extend(failed_files)
+        cancelled_count = sum(1 for f in failed_files if f['status'] == 'cancelled')
+        if cancelled_count:
+            record_progress(job_id, skipped=cancelled_count)
+            emit_progress_update(job_id, f"Job cancelled: {cancelled_count} resumes were not analyzed; finished analyses are kept.", 'warning')
+
+        writer.flush()
+        skipped_files.extend(writer.skipped_files)
+
+        final_success_count = writer.saved
+        summary_type = 'complete' if final else 'info'
         if skipped_files:
-            emit_progress_update(job_id, f"Finished processing. {final_success_count}/{total_resumes} resumes saved. Skipped: {', '.join(skipped_files)}", 'complete')
+            emit_progress_update(job_id, f"Finished processing. {final_success_count}/{total_resumes} resumes saved. Skipped: {', '.join(f['filename'] for f in skipped_files)}", summary_type)
         else:
-            emit_progress_update(job_id, f"Finished processing. {final_success_count}/{total_resumes} resumes saved.", 'complete')
-        check_job_completion(job_id)
-
-# Celery tasks no longer needed for direct parallel execution logic
-# You can keep the celery_app instance if it's used elsewhere or for future features,
-# but the functions below are now standard Python functions called directly.
-# We are keeping the @celery_app.task decorator on process_job_resumes
-# because it's called with .delay() (or just called directly in eager mode)
-# from app.py and removing it would require changing the call signature there. 
\ No newline at end of file
+            emit_progress_update(job_id, f"Finished processing. {final_success_count}/{total_resumes} resumes saved.", summary_type)
+        if run_id is not None:
+            finish_run(run_id)
+        if final:
+            check_job_completion(job_id)
+        return run_id
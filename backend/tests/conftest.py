@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+# backend.app binds its database when it is imported, so the test database and the on-disk
+# working directories are pointed at a throwaway directory before anything imports it.
+_test_dir = tempfile.mkdtemp(prefix='talentvibe-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_test_dir, 'resumes.db')
+os.environ['INGEST_SPOOL_DIR'] = os.path.join(_test_dir, 'spool')
+os.environ['BATCH_DIR'] = os.path.join(_test_dir, 'batches')
+
+import pytest
+from backend import audit_log, job_queue, progress, rate_limiter
+from backend.app import app as flask_app, db
+
+@pytest.fixture
+def app():
+    """The Flask app with empty tables, inside an app context."""
+    flask_app.config.update({"TESTING": True})
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(autouse=True)
+def isolated_rate_limits(tmp_path, monkeypatch):
+    """Keeps every test's rate-limit buckets in a throwaway SQLite file."""
+    monkeypatch.setattr(rate_limiter, 'RATE_LIMIT_DB_PATH', str(tmp_path / 'rate_limits.db'))
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+
+@pytest.fixture(autouse=True)
+def isolated_job_queue(tmp_path, monkeypatch):
+    """Keeps queued tasks and relayed events out of the real queue file and runs uploads inline."""
+    monkeypatch.setattr(job_queue, 'JOB_QUEUE_DB_PATH', str(tmp_path / 'job_queue.db'))
+    monkeypatch.setattr(job_queue, '_relay_events', False)
+    # Tests that exercise the queue switch it on themselves.
+    monkeypatch.setattr(job_queue, 'JOB_EXECUTION', 'inline')
+
+@pytest.fixture(autouse=True)
+def isolated_audit_log(tmp_path, monkeypatch):
+    """Writes each test's audit records to its own file."""
+    monkeypatch.setattr(audit_log, 'AUDIT_LOG_PATH', str(tmp_path / 'audit' / 'ai_analysis_audit.jsonl'))
+    yield
+    audit_log.shutdown_audit_log()
+
+@pytest.fixture(autouse=True)
+def isolated_progress(tmp_path, monkeypatch):
+    """Keeps job progress counters out of the real progress file."""
+    monkeypatch.setattr(progress, 'PROGRESS_DB_PATH', str(tmp_path / 'progress.db'))
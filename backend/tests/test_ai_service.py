@@ -22,7 +22,7 @@ def test_analyze_resume_with_ai(mock_get_client):
     mock_response.choices[0].message.content = mock_response_content
     
     mock_client = MagicMock()
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client.chat.completions.with_raw_response.create.return_value.parse.return_value = mock_response
     
     mock_get_client.return_value = mock_client
 
@@ -39,8 +39,8 @@ def test_analyze_resume_with_ai(mock_get_client):
     assert result_json["overall_rating"] == 9
     
     # Verify that the OpenAI client was called with the correct model and messages
-    mock_client.chat.completions.create.assert_called_once()
-    call_args, call_kwargs = mock_client.chat.completions.create.call_args
+    mock_client.chat.completions.with_raw_response.create.assert_called_once()
+    call_args, call_kwargs = mock_client.chat.completions.with_raw_response.create.call_args
     assert call_kwargs['model'] == 'gpt-4o'
     assert "Seeking a senior Python developer." in call_kwargs['messages'][1]['content']
     assert "I have 10 years of Python experience." in call_kwargs['messages'][1]['content'] 
\ No newline at end of file
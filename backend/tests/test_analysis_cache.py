@@ -0,0 +1,96 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock
+from backend.app import db
+from backend.app import User, Job, Resume, AnalysisCacheEntry
+from backend import analysis_cache
+from backend.analysis_cache import make_cache_key, get_cached_analyses, store_analyses, evict_stale_entries
+from backend.tasks import process_job_resumes
+
+@pytest.fixture
+def app(app):
+    analysis_cache.reset_cache_stats()
+    return app
+
+def _store(job_description, content_hash, analysis):
+    store_analyses([{
+        'job_description': job_description,
+        'content_hash': content_hash,
+        'analysis_json': json.dumps(analysis),
+    }])
+
+def test_cache_key_depends_on_every_component():
+    base = make_cache_key("JD", "abc")
+    assert base == make_cache_key("JD", "abc")
+    assert base != make_cache_key("Other JD", "abc")
+    assert base != make_cache_key("JD", "def")
+    assert base != make_cache_key("JD", "abc", model="gpt-4o-mini")
+    assert base != make_cache_key("JD", "abc", prompt_version="0")
+
+def test_store_and_lookup(app):
+    _store("JD", "hash-1", {"fit_score": 88})
+    key = make_cache_key("JD", "hash-1")
+
+    found = get_cached_analyses([key, make_cache_key("JD", "hash-2")])
+
+    assert json.loads(found[key]) == {"fit_score": 88}
+    assert len(found) == 1
+    stats = analysis_cache.get_cache_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+    assert AnalysisCacheEntry.query.one().hit_count == 1
+
+def test_expired_entries_are_misses_and_evicted(app):
+    _store("JD", "old", {"fit_score": 70})
+    entry = AnalysisCacheEntry.query.one()
+    entry.created_at = datetime.utcnow() - timedelta(days=analysis_cache.ANALYSIS_CACHE_MAX_AGE_DAYS + 1)
+    db.session.commit()
+
+    assert get_cached_analyses([make_cache_key("JD", "old")]) == {}
+    assert evict_stale_entries() == 1
+    assert AnalysisCacheEntry.query.count() == 0
+
+def test_size_eviction_drops_least_recently_used(app):
+    with patch.object(analysis_cache, 'ANALYSIS_CACHE_MAX_ENTRIES', 2):
+        _store("JD", "a", {"fit_score": 1})
+        _store("JD", "b", {"fit_score": 2})
+        a_entry = AnalysisCacheEntry.query.filter_by(content_hash="a").one()
+        a_entry.last_accessed_at = datetime.utcnow() + timedelta(minutes=1)
+        db.session.commit()
+        _store("JD", "c", {"fit_score": 3})
+
+    remaining = {e.content_hash for e in AnalysisCacheEntry.query.all()}
+    assert remaining == {"a", "c"}
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_process_job_resumes_reuses_cached_analysis(mock_analyze, mock_client, app):
+    user = User(username='cache_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description="Python developer", user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    mock_analyze.return_value = json.dumps({"candidate_name": "Ada", "fit_score": 92})
+    resumes_data = [{'filename': 'ada.txt', 'content': 'Ada resume'}]
+
+    process_job_resumes(job.id, resumes_data, job.description)
+    assert mock_analyze.call_count == 1
+    assert mock_analyze.call_args[0][:2] == ("Python developer", 'Ada resume')
+
+    # Re-uploading the same resume to a new job with the same description hits the cache.
+    second_job = Job(description="Python developer", user_id=user.id)
+    db.session.add(second_job)
+    db.session.commit()
+    process_job_resumes(second_job.id, resumes_data, second_job.description)
+    assert mock_analyze.call_count == 1
+    assert Resume.query.filter_by(job_id=second_job.id).one().candidate_name == 'Ada'
+
+    # Bypassing the cache forces a fresh analysis.
+    third_job = Job(description="Python developer", user_id=user.id)
+    db.session.add(third_job)
+    db.session.commit()
+    process_job_resumes(third_job.id, resumes_data, third_job.description, use_cache=False)
+    assert mock_analyze.call_count == 2
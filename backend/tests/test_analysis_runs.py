@@ -0,0 +1,131 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import text
+from backend.app import app as flask_app, db, User, Job, Resume, AnalysisRun, AnalysisRunItem, BatchRun
+from backend.analysis_runs import start_run, mark_items, item_counts, finish_run, run_controls, resume_interrupted_runs
+from backend.job_queue import enqueue
+from backend.tasks import process_job_resumes, analyze_resumes_concurrently
+
+@pytest.fixture
+def job(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description='Python developer', user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def resumes(*names):
+    return [{'filename': f'{name}.txt', 'content': f'Resume of {name}', 'content_hash': name} for name in names]
+
+def test_a_finished_job_leaves_a_complete_run(job):
+    run_id = process_job_resumes(job.id, resumes('ada', 'bob'), job.description, use_cache=False, provider='fake')
+
+    assert db.session.get(AnalysisRun, run_id).status == 'complete'
+    assert item_counts(run_id) == {'pending': 0, 'analyzing': 0, 'done': 2, 'failed': 0, 'cancelled': 0}
+    # Saved resumes no longer keep a second copy of their text on the run.
+    assert db.session.execute(text('SELECT COUNT(*) FROM analysis_run_item WHERE content IS NOT NULL')).scalar() == 0
+
+def test_interrupted_runs_continue_only_unfinished_items(job):
+    run, tracked = start_run(job.id, resumes('ada', 'bob', 'cy', 'dee'), use_cache=False, provider='fake')
+    ada, bob, cy, _ = [rd['run_item_id'] for rd in tracked]
+    # The process died while bob and cy were being analyzed; bob had already been saved.
+    mark_items([ada], 'done')
+    mark_items([bob, cy], 'analyzing')
+    db.session.add_all([
+        Resume(filename='ada.txt', content='Resume of ada', content_hash='ada', job_id=job.id),
+        Resume(filename='bob.txt', content='Resume of bob', content_hash='bob', job_id=job.id),
+    ])
+    db.session.commit()
+
+    with patch('backend.tasks.analyze_resumes_concurrently', wraps=analyze_resumes_concurrently) as mock_analyze:
+        assert resume_interrupted_runs() == {run.id: 2}
+
+    assert sorted(rd['filename'] for rd in mock_analyze.call_args.args[0]) == ['cy.txt', 'dee.txt']
+    assert db.session.get(AnalysisRun, run.id).status == 'complete'
+    assert item_counts(run.id)['done'] == 4
+    assert Resume.query.count() == 4
+    assert resume_interrupted_runs() == {}
+
+def test_saved_resumes_are_found_across_lookup_chunks(job):
+    run, tracked = start_run(job.id, resumes('ada', 'bob', 'cy', 'dee', 'eve'), use_cache=False, provider='fake')
+    mark_items([rd['run_item_id'] for rd in tracked], 'analyzing')
+    db.session.add_all([
+        Resume(filename=f'{name}.txt', content=f'Resume of {name}', content_hash=name, job_id=job.id)
+        for name in ('ada', 'cy', 'eve')
+    ])
+    db.session.commit()
+
+    with patch('backend.analysis_runs.ANALYSIS_RUN_INSERT_CHUNK', 2), \
+            patch('backend.tasks.analyze_resumes_concurrently', wraps=analyze_resumes_concurrently) as mock_analyze:
+        assert resume_interrupted_runs() == {run.id: 2}
+
+    assert sorted(rd['filename'] for rd in mock_analyze.call_args.args[0]) == ['bob.txt', 'dee.txt']
+    assert item_counts(run.id)['done'] == 5
+
+def test_retry_failed_reruns_only_the_failures(job):
+    run, tracked = start_run(job.id, resumes('ada', 'bob'), use_cache=False, provider='fake')
+    mark_items([tracked[0]['run_item_id']], 'done')
+    mark_items([tracked[1]['run_item_id']], 'failed', error='Rate limited')
+    db.session.get(AnalysisRun, run.id).status = 'complete'
+    db.session.commit()
+    client = flask_app.test_client()
+
+    status = client.get(f'/api/analysis-runs/{run.id}').get_json()
+    assert status['failed'] == [{'filename': 'bob.txt', 'error': 'Rate limited', 'attempts': 0}]
+
+    response = client.post(f'/api/analysis-runs/{run.id}/retry-failed')
+
+    assert response.status_code == 200
+    assert response.get_json()['retried'] == 1
+    assert response.get_json()['items']['done'] == 2
+    assert [r.filename for r in Resume.query.all()] == ['bob.txt']
+    assert AnalysisRunItem.query.filter_by(filename='bob.txt').one().attempts == 1
+
+def test_cancel_stops_running_runs_and_drops_queued_uploads(job, tmp_path):
+    run, tracked = start_run(job.id, resumes('ada', 'bob'), use_cache=False, provider='fake')
+    mark_items([tracked[0]['run_item_id']], 'done')
+    spool_dir = tmp_path / 'queued-upload'
+    spool_dir.mkdir()
+    enqueue('process_upload', {'spool_dir': str(spool_dir)}, job_id=job.id)
+    client = flask_app.test_client()
+
+    response = client.post(f'/api/jobs/{job.id}/cancel')
+
+    assert response.get_json()['cancelled_runs'] == 1
+    assert response.get_json()['cancelled_tasks'] == 1
+    assert not spool_dir.exists()
+    assert run_controls(run.id)['cancelled'] is True
+    # The running analysis winds down: finished work is kept, the rest is cancelled.
+    assert finish_run(run.id)['cancelled'] == 1
+    assert db.session.get(AnalysisRun, run.id).status == 'cancelled'
+    assert resume_interrupted_runs() == {}
+
+def test_deleting_a_job_removes_its_runs(job, tmp_path):
+    run_id = start_run(job.id, resumes('ada', 'bob'), use_cache=False, provider='fake')[0].id
+    db.session.add(BatchRun(job_id=job.id, adapter='local', input_file_path=str(tmp_path / 'batch.jsonl')))
+    db.session.commit()
+    spool_dir = tmp_path / 'queued-upload'
+    spool_dir.mkdir()
+    enqueue('process_upload', {'spool_dir': str(spool_dir)}, job_id=job.id)
+
+    assert flask_app.test_client().delete(f'/api/jobs/{job.id}').status_code == 200
+
+    assert AnalysisRun.query.count() == 0
+    assert AnalysisRunItem.query.count() == 0
+    assert BatchRun.query.count() == 0
+    assert not spool_dir.exists()
+    # An analysis still running for the job stops at its next poll.
+    assert run_controls(run_id)['cancelled'] is True
+    assert resume_interrupted_runs() == {}
+
+def test_max_concurrency_can_be_changed_while_running(job):
+    run, _ = start_run(job.id, resumes('ada'), use_cache=False, provider='fake', max_concurrency=5)
+    client = flask_app.test_client()
+
+    assert client.put(f'/api/jobs/{job.id}/concurrency', json={'max_concurrency': 0}).status_code == 400
+    response = client.put(f'/api/jobs/{job.id}/concurrency', json={'max_concurrency': 2})
+
+    assert response.get_json()['updated_runs'] == 1
+    assert run_controls(run.id) == {'cancelled': False, 'max_concurrency': 2}
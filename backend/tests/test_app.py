@@ -1,21 +1,9 @@
 import pytest
-from backend.app import app as flask_app, db
 from backend.app import Job, Resume
 import io
 from unittest.mock import patch
 import json
 
-@pytest.fixture
-def app():
-    flask_app.config.update({
-        "TESTING": True,
-        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
-    })
-    with flask_app.app_context():
-        db.create_all()
-        yield flask_app
-        db.drop_all()
-
 @pytest.fixture
 def client(app):
     return app.test_client()
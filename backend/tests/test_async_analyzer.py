@@ -0,0 +1,199 @@
+import asyncio
+import json
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import httpx
+import openai
+
+from backend.async_analyzer import AdaptiveConcurrencyLimiter, analyze_resumes_concurrently
+from backend.prompt_budget import TokenSavingsReport
+
+
+def _rate_limit_error():
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(429, request=request, headers={'retry-after': '0'})
+    return openai.RateLimitError('Rate limit reached', response=response, body=None)
+
+
+def test_limiter_grows_on_success_and_halves_on_throttle():
+    limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=10, target_latency=5)
+
+    limiter.record_success(0.1)
+    limiter.record_success(0.1)
+    assert limiter.limit == 6
+
+    limiter.record_throttle()
+    assert limiter.limit == 3
+
+    # After a throttle the limit only grows once per window of `limit` successes.
+    limiter.record_success(0.1)
+    limiter.record_success(0.1)
+    assert limiter.limit == 3
+    limiter.record_success(0.1)
+    assert limiter.limit == 4
+
+    limiter.record_success(60)
+    assert limiter.limit == 3
+
+
+def test_limiter_caps_in_flight_requests():
+    limiter = AdaptiveConcurrencyLimiter(initial=3, minimum=1, maximum=3, target_latency=5)
+
+    async def work():
+        async with limiter:
+            await asyncio.sleep(0.01)
+
+    async def run_all():
+        await asyncio.gather(*(work() for _ in range(20)))
+
+    asyncio.run(run_all())
+    assert limiter.peak_in_flight == 3
+    assert limiter.in_flight == 0
+
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_analyze_resumes_concurrently_reports_results_and_skips(mock_analyze, mock_client):
+    async def fake_analysis(job_description, resume_text, client):
+        if resume_text == 'broken':
+            raise ValueError('bad resume')
+        return json.dumps({'fit_score': 80, 'text': resume_text})
+    mock_analyze.side_effect = fake_analysis
+    on_result = MagicMock()
+    on_error = MagicMock()
+
+    resumes = [{'filename': f'r{i}.txt', 'content': f'resume {i}'} for i in range(50)]
+    resumes.append({'filename': 'broken.txt', 'content': 'broken'})
+    results, skipped = analyze_resumes_concurrently(resumes, 'JD', on_result=on_result, on_error=on_error)
+
+    assert len(results) == 50
+    assert {r['filename'] for r in results} == {f'r{i}.txt' for i in range(50)}
+    assert json.loads(results[0]['analysis_json'])['fit_score'] == 80
+    assert skipped == [{'status': 'error', 'filename': 'broken.txt', 'reason': 'bad resume'}]
+    assert on_result.call_count == 50
+    assert on_error.call_count == 1
+    mock_client.return_value.close.assert_awaited_once()
+
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_resume_text_is_compressed_per_request(mock_analyze, mock_client):
+    mock_analyze.side_effect = [_rate_limit_error(), json.dumps({'fit_score': 70}), json.dumps({'fit_score': 60})]
+    resumes = [
+        {'filename': 'a.txt', 'content': "Skills:    Python\n\n\n\nPage 3\n" * 3},
+        {'filename': 'b.txt', 'content': "Plain resume"},
+    ]
+    token_savings = TokenSavingsReport()
+
+    results, skipped = analyze_resumes_concurrently(
+        resumes, 'JD', limiter=AdaptiveConcurrencyLimiter(initial=1), token_savings=token_savings
+    )
+
+    sent = sorted(call.args[1] for call in mock_analyze.await_args_list)
+    assert sent == ["Plain resume"] + ["Skills: Python\n\nSkills: Python\n\nSkills: Python"] * 2
+    # The retried request is counted once, and the stored resumes keep their original content.
+    assert token_savings.resumes == 2
+    assert token_savings.tokens_saved > 0
+    assert all('analysis_text' not in rd for rd in resumes)
+    assert {r['filename'] for r in results} == {'a.txt', 'b.txt'} and skipped == []
+
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_throttled_requests_are_retried_with_lower_concurrency(mock_analyze, mock_client):
+    mock_analyze.side_effect = [_rate_limit_error(), json.dumps({'fit_score': 70})]
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=1, maximum=16, target_latency=5)
+
+    results, skipped = analyze_resumes_concurrently(
+        [{'filename': 'a.txt', 'content': 'resume'}], 'JD', limiter=limiter
+    )
+
+    assert skipped == []
+    assert len(results) == 1
+    assert limiter.throttle_count == 1
+    assert limiter.limit < 8
+
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_analyze_resumes_concurrently_streams_partial_fields(mock_analyze, mock_client):
+    async def fake_analysis(job_description, resume_text, client, on_field):
+        on_field('fit_score', 91)
+        return json.dumps({'fit_score': 91})
+    mock_analyze.side_effect = fake_analysis
+    on_partial = MagicMock()
+
+    resumes = [{'filename': 'a.txt', 'content': 'resume a'}]
+    results, _ = analyze_resumes_concurrently(resumes, 'JD', on_partial=on_partial)
+
+    assert len(results) == 1
+    on_partial.assert_called_once_with(resumes[0], 'fit_score', 91)
+
+
+@patch('backend.async_analyzer.ANALYSIS_CONTROL_POLL_SECONDS', 0.01)
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_cancellation_aborts_outstanding_requests(mock_analyze, mock_client):
+    async def fake_analysis(job_description, resume_text, client):
+        if resume_text != 'fast':
+            await asyncio.sleep(30)
+        return json.dumps({'fit_score': 80})
+    mock_analyze.side_effect = fake_analysis
+    controls = {'cancelled': False}
+    on_error = MagicMock()
+
+    resumes = [{'filename': 'fast.txt', 'content': 'fast'}] + [{'filename': f's{i}.txt', 'content': 'slow'} for i in range(3)]
+    results, skipped = analyze_resumes_concurrently(
+        resumes, 'JD', on_result=lambda result: controls.update(cancelled=True), on_error=on_error,
+        check_controls=lambda: controls
+    )
+
+    assert [r['filename'] for r in results] == ['fast.txt']
+    assert sorted(f['filename'] for f in skipped) == ['s0.txt', 's1.txt', 's2.txt']
+    assert {f['status'] for f in skipped} == {'cancelled'}
+    on_error.assert_not_called()
+
+
+@patch('backend.async_analyzer.ANALYSIS_CONTROL_POLL_SECONDS', 0.01)
+@patch('backend.async_analyzer.plan_packs', side_effect=lambda resumes: [resumes])
+@patch('backend.async_analyzer.analyze_resume_pack_async', new_callable=AsyncMock, side_effect=ValueError('malformed pack'))
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_cancellation_keeps_finished_members_of_a_pack(mock_analyze, mock_client, mock_pack, mock_plan):
+    controls = {'cancelled': False}
+    async def fake_analysis(job_description, resume_text, client):
+        if resume_text != 'fast':
+            await asyncio.sleep(30)
+        controls['cancelled'] = True
+        return json.dumps({'fit_score': 80})
+    mock_analyze.side_effect = fake_analysis
+    on_result = MagicMock()
+
+    resumes = [{'filename': 'fast.txt', 'content': 'fast'}] + [{'filename': f's{i}.txt', 'content': 'slow'} for i in range(2)]
+    results, skipped = analyze_resumes_concurrently(
+        resumes, 'JD', on_result=on_result, packing=True, check_controls=lambda: controls
+    )
+
+    assert [r['filename'] for r in results] == ['fast.txt']
+    assert on_result.call_count == 1
+    assert sorted((f['filename'], f['status']) for f in skipped) == [('s0.txt', 'cancelled'), ('s1.txt', 'cancelled')]
+
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_max_concurrency_caps_the_adaptive_limit(mock_analyze, mock_client):
+    async def fake_analysis(job_description, resume_text, client):
+        await asyncio.sleep(0.01)
+        return json.dumps({'fit_score': 80})
+    mock_analyze.side_effect = fake_analysis
+    limiter = AdaptiveConcurrencyLimiter(initial=10, minimum=4, maximum=20, target_latency=5)
+
+    resumes = [{'filename': f'r{i}.txt', 'content': f'resume {i}'} for i in range(12)]
+    results, _ = analyze_resumes_concurrently(
+        resumes, 'JD', limiter=limiter, check_controls=lambda: {'max_concurrency': 2}
+    )
+
+    assert len(results) == 12
+    assert limiter.peak_in_flight == 2
+    limiter.set_maximum(None)
+    assert (limiter.minimum, limiter.maximum) == (4, 20)
@@ -0,0 +1,72 @@
+import glob
+import json
+import os
+from backend import audit_log
+from backend.audit_log import AuditLogWriter, get_audit_log
+from backend.tasks import finalize_analysis
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_records_are_written_as_json_lines(tmp_path):
+    writer = AuditLogWriter(path=str(tmp_path / 'logs' / 'audit.jsonl'), fsync='never')
+    for i in range(5):
+        writer.write({'n': i, 'name': 'Zoë'})
+    writer.flush()
+    writer.close()
+
+    assert read_records(tmp_path / 'logs' / 'audit.jsonl') == [{'n': i, 'name': 'Zoë'} for i in range(5)]
+    assert writer.stats['written'] == 5
+
+def test_size_rotation_keeps_a_bounded_number_of_backups(tmp_path):
+    path = str(tmp_path / 'audit.jsonl')
+    writer = AuditLogWriter(path=path, max_bytes=40, backup_count=2, rotate_seconds=0)
+    for i in range(6):
+        writer.write({'n': i, 'padding': 'x' * 10})
+        writer.flush()
+    writer.close()
+
+    backups = glob.glob(path + '.*')
+    assert len(backups) == 2
+    assert writer.stats['rotations'] == 5
+    assert read_records(path) == [{'n': 5, 'padding': 'x' * 10}]
+
+def test_each_process_writes_and_rotates_its_own_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_log, 'AUDIT_LOG_PATH', str(tmp_path / 'audit.jsonl'))
+    # Another process's current file and its old backups.
+    other = tmp_path / 'audit.99999.jsonl'
+    other.write_text('{"n": "other"}\n')
+    for i in range(3):
+        (tmp_path / f'audit.99999.jsonl.2020010{i + 1}-000000').write_text('{}\n')
+        os.utime(tmp_path / f'audit.99999.jsonl.2020010{i + 1}-000000', (i, i))
+
+    writer = get_audit_log()
+    writer.max_bytes, writer.backup_count, writer.rotate_seconds = 40, 2, 0
+    for i in range(3):
+        writer.write({'n': i, 'padding': 'x' * 10})
+        writer.flush()
+
+    assert writer.path == str(tmp_path / f'audit.{os.getpid()}.jsonl')
+    assert read_records(writer.path) == [{'n': 2, 'padding': 'x' * 10}]
+    assert read_records(other) == [{'n': 'other'}]
+    # Backups are pruned across processes, oldest first.
+    assert sorted(os.path.basename(name) for name in glob.glob(str(tmp_path / 'audit.*.jsonl.*'))) == \
+        sorted(os.path.basename(name) for name in glob.glob(writer.path + '.*'))
+    assert len(glob.glob(writer.path + '.*')) == 2
+
+def test_sampling_skips_records(tmp_path):
+    writer = AuditLogWriter(path=str(tmp_path / 'audit.jsonl'), sample_rate=0)
+    assert writer.write({'n': 1}) is False
+    writer.close()
+    assert writer.stats == {'written': 0, 'dropped': 0, 'sampled_out': 1, 'rotations': 0, 'errors': 0}
+
+def test_finalize_analysis_audits_the_raw_result():
+    analysis = finalize_analysis('cv.txt', json.dumps({'fit_score': 85, 'bucket': 'Model guess'}), job_id=3)
+    get_audit_log().flush()
+
+    record, = read_records(audit_log.process_log_path())
+    assert analysis['bucket'] == '⚡ Book-the-Call'
+    assert record['event'] == 'analysis' and record['job_id'] == 3
+    assert record['bucket'] == '⚡ Book-the-Call'
+    assert record['analysis']['bucket'] == 'Model guess'
@@ -0,0 +1,131 @@
+import pytest
+import io
+import json
+from unittest.mock import patch
+from backend.app import db
+from backend.app import User, Job, Resume, BatchRun
+from backend import batch_analysis
+from backend.batch_analysis import LocalBatchAdapter, submit_bulk_analysis, poll_batch_run, wait_for_batch_run
+from backend.job_titles import populate_job_title
+from backend.progress import get_progress
+
+@pytest.fixture
+def app(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_analysis, 'BATCH_DIR', str(tmp_path))
+    monkeypatch.setattr(batch_analysis, 'BATCH_INGEST_CHUNK_SIZE', 2)
+    return app
+
+@pytest.fixture
+def job(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description="Data engineer", user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def _responder(body):
+    prompt = body['messages'][-1]['content']
+    if 'broken' in prompt:
+        raise RuntimeError('model refused')
+    score = 95 if 'Spark' in prompt else 40
+    return json.dumps({'candidate_name': 'Name Not Found', 'fit_score': score})
+
+def test_bulk_run_submits_then_ingests_in_chunks(app, job, tmp_path):
+    adapter = LocalBatchAdapter(responder=_responder, directory=str(tmp_path / 'local'))
+    resumes_data = [
+        {'filename': 'spark_dev.txt', 'content': 'Spark and Kafka'},
+        {'filename': 'chef.txt', 'content': 'Cooking'},
+        {'filename': 'other.txt', 'content': 'More Spark'},
+        {'filename': 'broken.txt', 'content': 'broken file'},
+    ]
+
+    with patch('backend.batch_analysis.get_cached_analyses', return_value={}):
+        run = submit_bulk_analysis(job.id, resumes_data, job.description, adapter=adapter)
+
+    assert run.status == 'submitted'
+    assert run.total_requests == 4
+    assert Resume.query.filter_by(job_id=job.id, analysis_pending=True).count() == 4
+    # Placeholders aren't candidates yet.
+    assert app.test_client().get(f'/api/jobs/{job.id}').get_json()['resumes'] == []
+    assert get_progress(job.id)['total'] == 4
+    with open(run.input_file_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0]['url'] == '/v1/chat/completions'
+    assert 'Data engineer' in lines[0]['body']['messages'][1]['content']
+
+    assert poll_batch_run(run.id, adapter=adapter) == 'ingested'
+
+    run = db.session.get(BatchRun, run.id)
+    assert run.ingested_count == 3
+    assert run.failed_count == 1
+    resumes = {r.filename: r for r in Resume.query.filter_by(job_id=job.id).all()}
+    assert set(resumes) == {'spark_dev.txt', 'chef.txt', 'other.txt'}
+    assert json.loads(resumes['spark_dev.txt'].analysis)['bucket'] == '🚀 Green-Room Rocket'
+    assert json.loads(resumes['chef.txt'].analysis)['bucket'] == '🗄️ Swipe-Left Archive'
+    assert resumes['chef.txt'].candidate_name == 'Name Not Found'
+    assert len(app.test_client().get(f'/api/jobs/{job.id}').get_json()['resumes']) == 3
+    progress = get_progress(job.id)
+    assert (progress['status'], progress['analyzed'], progress['failed']) == ('complete', 3, 1)
+
+def test_a_run_is_ingested_by_one_poller_at_a_time(job, tmp_path):
+    adapter = LocalBatchAdapter(responder=_responder, directory=str(tmp_path / 'local'))
+    run = submit_bulk_analysis(job.id, [{'filename': 'spark_dev.txt', 'content': 'Spark'}], job.description, adapter=adapter)
+    run.status = 'ingesting'
+    db.session.commit()
+
+    assert poll_batch_run(run.id, adapter=adapter) == 'ingesting'
+    assert db.session.get(BatchRun, run.id).ingested_count == 0
+
+    # A poller that died part way through is taken over once its ingestion has stalled.
+    with patch.object(batch_analysis, 'BATCH_INGEST_STALE_SECONDS', -1):
+        assert poll_batch_run(run.id, adapter=adapter) == 'ingested'
+    assert db.session.get(BatchRun, run.id).ingested_count == 1
+
+def test_bulk_run_skips_duplicates_and_cached_resumes(job, tmp_path):
+    adapter = LocalBatchAdapter(responder=_responder, directory=str(tmp_path / 'local'))
+    db.session.add(Resume(filename='existing.txt', content='Old', content_hash='x', job_id=job.id, analysis='{}'))
+    db.session.commit()
+    resumes_data = [
+        {'filename': 'existing.txt', 'content': 'Old but renamed'},
+        {'filename': 'a.txt', 'content': 'Same text'},
+        {'filename': 'b.txt', 'content': 'Same text'},
+    ]
+
+    run = submit_bulk_analysis(job.id, resumes_data, job.description, adapter=adapter)
+
+    assert run.total_requests == 1
+    poll_batch_run(run.id, adapter=adapter)
+
+    # The analysis is now cached, so an identical upload to a new job needs no batch at all.
+    second_job = Job(description=job.description, user_id=job.user_id)
+    db.session.add(second_job)
+    db.session.commit()
+    assert submit_bulk_analysis(second_job.id, [{'filename': 'a.txt', 'content': 'Same text'}],
+                                job.description, adapter=adapter) is None
+    assert Resume.query.filter_by(job_id=second_job.id).one().analysis is not None
+
+@patch('backend.app.socketio.start_background_task')
+def test_analyze_endpoint_bulk_mode(mock_background, app, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_analysis, 'BATCH_ADAPTER', 'local')
+    client = app.test_client()
+
+    response = client.post('/api/analyze', data={
+        'jobDescription': 'Bulk JD',
+        'mode': 'bulk',
+        'resumes': (io.BytesIO(b'Bulk resume'), 'bulk.txt'),
+    }, content_type='multipart/form-data')
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['status'] == 'submitted'
+    assert data['total_resumes'] == 1
+    # One task extracts the new job's title, the other polls the batch.
+    mock_background.assert_any_call(populate_job_title, data['job_id'])
+    mock_background.assert_any_call(wait_for_batch_run, data['batch_run_id'])
+    assert mock_background.call_count == 2
+
+    status = client.get(f"/api/batch-runs/{data['batch_run_id']}").get_json()
+    assert status['adapter'] == 'local'
+    assert status['status'] == 'submitted'
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import inspect, text
+from backend.app import db, User, Job, Resume
+from backend.compression import compress_text, decompress_text, is_compressed, compress_existing_rows
+
+LONG_TEXT = "Senior data engineer. Built streaming pipelines in Python. " * 40
+
+@pytest.fixture
+def job(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description='Data engineer', user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def test_round_trip_and_short_values():
+    stored = compress_text(LONG_TEXT)
+    assert is_compressed(stored) and len(stored) < len(LONG_TEXT) / 5
+    assert decompress_text(stored) == LONG_TEXT
+    assert compress_text('short') == 'short'
+    assert decompress_text('old plain row') == 'old plain row'
+
+def test_resume_columns_are_compressed_and_deferred(job):
+    db.session.add(Resume(filename='a.txt', content=LONG_TEXT, content_hash='a', analysis='{"fit_score": 80}', job_id=job.id))
+    db.session.commit()
+
+    raw_content = db.session.execute(text('SELECT content FROM resume')).scalar()
+    assert is_compressed(raw_content)
+
+    db.session.expunge_all()
+    resume = Resume.query.one()
+    assert {'content', 'analysis'} <= inspect(resume).unloaded
+    assert resume.content == LONG_TEXT
+    assert resume.analysis == '{"fit_score": 80}'
+
+def test_compress_existing_rows_rewrites_plain_rows(job):
+    db.session.execute(text(
+        "INSERT INTO resume (filename, content, content_hash, analysis, job_id) VALUES ('old.txt', :content, 'h', :analysis, :job_id)"
+    ), {'content': LONG_TEXT, 'analysis': '{"fit_score": 70}', 'job_id': job.id})
+    db.session.commit()
+    # Old plain-text rows keep reading before the migration.
+    assert Resume.query.one().content == LONG_TEXT
+
+    assert compress_existing_rows(db.session, Resume.__table__, ['content', 'analysis'], batch_size=1) == 1
+    assert compress_existing_rows(db.session, Resume.__table__, ['content', 'analysis']) == 0
+
+    raw_content, raw_analysis = db.session.execute(text('SELECT content, analysis FROM resume')).one()
+    assert is_compressed(raw_content)
+    assert raw_analysis == '{"fit_score": 70}'
+    db.session.expunge_all()
+    assert Resume.query.one().content == LONG_TEXT
@@ -0,0 +1,59 @@
+import pytest
+from backend.app import db, User, Job, Resume
+from backend.dedupe import NearDuplicateIndex, hamming_distance, partition_duplicates, simhash
+
+RESUME = """Ada Lovelace
+Senior data engineer with eight years building streaming pipelines in Python and Scala.
+Led the migration of nightly batch jobs to Kafka and Flink, cutting data latency from hours to seconds.
+Designed the warehouse schema used by forty analysts and mentored four junior engineers.
+Education: MSc Computer Science, University of London.
+""" + "\n".join(f"Project {i}: shipped the {name} service, owning its design, rollout and on-call rotation."
+                for i, name in enumerate(['billing', 'search', 'ingest', 'alerting', 'reporting', 'export',
+                                          'identity', 'catalogue', 'pricing', 'audit', 'scheduler', 'archive']))
+
+@pytest.fixture
+def job(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description='Data engineer', user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def test_simhash_is_close_for_trivial_edits_and_far_otherwise():
+    reexported = RESUME.replace('Ada Lovelace', 'ADA LOVELACE').replace('\n', '\n\n') + '\nPage 1 of 1'
+    unrelated = "Bob Smith\nPastry chef specialising in laminated doughs and wedding cakes for hotel banquets."
+
+    assert hamming_distance(simhash(RESUME), simhash(reexported)) <= 3
+    assert hamming_distance(simhash(RESUME), simhash(unrelated)) > 10
+    assert -(1 << 63) <= simhash(RESUME) < (1 << 63)
+
+def test_index_finds_fingerprints_within_the_distance():
+    index = NearDuplicateIndex(max_distance=3)
+    index.add(0b1011 << 40, 'a.pdf')
+
+    assert index.find((0b1011 << 40) ^ 0b111) == 'a.pdf'
+    assert index.find((0b1011 << 40) ^ 0b1111) is None
+
+def test_partition_duplicates_against_stored_and_uploaded(job):
+    db.session.add(Resume(filename='stored.txt', content='Stored', content_hash='stored-hash',
+                          simhash=simhash(RESUME), job_id=job.id))
+    db.session.commit()
+
+    unique, duplicates = partition_duplicates(job.id, [
+        {'filename': 'new.txt', 'content': 'A different candidate entirely, a nurse with ICU experience.'},
+        {'filename': 'again.txt', 'content': 'Stored', 'content_hash': 'stored-hash'},
+        {'filename': 'stored.txt', 'content': 'Renamed content'},
+        {'filename': 'copy.txt', 'content': 'A different candidate entirely, a nurse with ICU experience.'},
+        {'filename': 'reexport.pdf', 'content': RESUME + '\nPage 1 of 1'},
+    ])
+
+    assert [rd['filename'] for rd in unique] == ['new.txt']
+    assert unique[0]['content_hash'] and unique[0]['simhash'] is not None
+    assert [(rd['filename'], reason) for rd, reason in duplicates] == [
+        ('again.txt', 'Duplicate content'),
+        ('stored.txt', 'Duplicate filename'),
+        ('copy.txt', 'Duplicate content'),
+        ('reexport.pdf', 'Near-duplicate of stored.txt'),
+    ]
@@ -0,0 +1,75 @@
+import io
+import time
+import pytest
+import docx
+import fitz
+from backend import extraction
+from backend.extraction import ExtractionError, extract_document, extract_documents, _run_in_pool
+
+def make_pdf(pages):
+    pdf_doc = fitz.open()
+    for text in pages:
+        pdf_doc.new_page().insert_text((72, 72), text)
+    data = pdf_doc.tobytes()
+    pdf_doc.close()
+    return data
+
+def make_docx(paragraphs):
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def slow_task(seconds):
+    time.sleep(seconds)
+    return seconds
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(extraction, 'EXTRACTION_WORKERS', 2)
+    yield
+    extraction.shutdown_extraction_pool()
+
+def test_extracts_every_format_in_order():
+    results = extract_documents([
+        ('a.pdf', make_pdf(['Page one', 'Page two'])),
+        ('b.DOCX', make_docx(['Ada Lovelace', 'Analyst'])),
+        ('c.txt', 'Plain résumé'.encode('utf-8')),
+        ('d.pdf', b'not a pdf'),
+    ])
+
+    assert [r['filename'] for r in results] == ['a.pdf', 'b.DOCX', 'c.txt', 'd.pdf']
+    assert 'Page one' in results[0]['content'] and 'Page two' in results[0]['content']
+    assert results[1]['content'] == 'Ada Lovelace\nAnalyst\n'
+    assert results[2]['content'] == 'Plain résumé'
+    assert results[3]['content'] is None and results[3]['error']
+
+def test_size_and_page_limits():
+    results = extract_documents([('big.txt', b'x' * (1024 * 1024 + 1)), ('long.pdf', make_pdf(['First', 'Second', 'Third']))],
+                                max_file_bytes=1024 * 1024, max_pages=1)
+
+    assert results[0]['error'] and results[0]['content'] is None
+    assert 'First' in results[1]['content'] and 'Second' not in results[1]['content']
+
+def test_stuck_workers_time_out_and_the_pool_recovers():
+    outcomes = _run_in_pool(slow_task, [(0,), (30,)], timeout=2)
+
+    assert outcomes[0] == (0, None)
+    assert isinstance(outcomes[1][1], ExtractionError)
+    # The stuck worker was killed, so the next call gets a working pool.
+    assert extract_document('ok.docx', make_docx(['Still works'])) == 'Still works\n'
+
+def test_timeouts_count_from_when_each_file_starts(monkeypatch):
+    monkeypatch.setattr(extraction, 'EXTRACTION_WORKERS', 1)
+    _run_in_pool(slow_task, [(0,)], timeout=30)  # start the worker outside the timed part
+
+    # Together the files take longer than the timeout, but none of them does on its own.
+    outcomes = _run_in_pool(slow_task, [(0.5,)] * 4, timeout=1.5)
+
+    assert outcomes == [(0.5, None)] * 4
+
+def test_extract_document_raises_on_unreadable_files():
+    with pytest.raises(ExtractionError):
+        extract_document('broken.docx', b'not a docx')
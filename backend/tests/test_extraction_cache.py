@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch
+from backend.app import ExtractionCacheEntry
+from backend import extraction, extraction_cache
+from backend.extraction import extract_documents, shutdown_extraction_pool
+from backend.extraction_cache import store_extractions, get_cached_extractions, evict_extractions
+from backend.tests.test_extraction import make_docx, make_pdf
+
+@pytest.fixture
+def app(app):
+    extraction_cache.reset_extraction_cache_stats()
+    yield app
+    shutdown_extraction_pool()
+
+def _entry(file_hash, text):
+    return {'file_hash': file_hash, 'text': text, 'metadata': {'format': 'docx'}}
+
+def test_same_bytes_skip_parsing(app):
+    files = [('ada.docx', make_docx(['Ada Lovelace'])), ('cv.pdf', make_pdf(['One', 'Two']))]
+
+    first = extract_documents(files)
+    with patch.object(extraction, '_run_in_pool', wraps=extraction._run_in_pool) as mock_pool:
+        # The same file uploaded to another job under another name.
+        second = extract_documents([('ada-copy.docx', files[0][1]), files[1]])
+
+    mock_pool.assert_not_called()
+    assert [r['from_cache'] for r in first] == [False, False]
+    assert [r['from_cache'] for r in second] == [True, True]
+    assert [r['content'] for r in second] == [r['content'] for r in first]
+    assert second[1]['metadata'] == {'format': 'pdf', 'page_count': 2, 'pages_read': 2}
+
+    stats = app.test_client().get('/api/extraction-cache/stats').get_json()
+    assert stats['hits'] == 2 and stats['misses'] == 2
+    assert stats['hit_rate'] == 0.5
+    assert stats['entries'] == 2
+
+def test_a_different_page_cap_is_a_miss(app):
+    pdf = make_pdf(['One', 'Two', 'Three'])
+    extract_documents([('cv.pdf', pdf)], max_pages=1)
+
+    result = extract_documents([('cv.pdf', pdf)], max_pages=5)[0]
+
+    assert result['from_cache'] is False
+    assert 'Three' in result['content']
+    assert ExtractionCacheEntry.query.one().pages_read == 3
+
+def test_eviction_drops_least_recently_used_entries(app, monkeypatch):
+    monkeypatch.setattr(extraction_cache, 'EXTRACTION_CACHE_MAX_BYTES', 10)
+    store_extractions([_entry('old', 'aaaa')])
+    store_extractions([_entry('mid', 'bbbb')])
+    get_cached_extractions(['old'], max_pages=50)
+
+    store_extractions([_entry('new', 'cccc')])
+
+    assert sorted(e.file_hash for e in ExtractionCacheEntry.query.all()) == ['new', 'old']
+    assert evict_extractions() == 0
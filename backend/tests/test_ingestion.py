@@ -0,0 +1,126 @@
+import io
+import os
+import hashlib
+import tarfile
+import zipfile
+import pytest
+from unittest.mock import patch
+from werkzeug.datastructures import FileStorage
+from backend import ingestion
+from backend.ingestion import create_spool, discard_spool, spool_uploads, spool_archive, extract_spooled, resume_content, _windows
+from backend.extraction import shutdown_extraction_pool
+from backend.app import db, User, Job, Resume
+from backend.tasks import process_job_resumes
+
+@pytest.fixture
+def spool_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, 'INGEST_SPOOL_DIR', str(tmp_path / 'spool'))
+    yield tmp_path / 'spool'
+    shutdown_extraction_pool()
+
+def upload(filename, data):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+def test_windows_respect_the_inflight_limit():
+    sizes = [40, 40, 40, 150, 10]
+    windows = list(_windows([{'size': size} for size in sizes], max_bytes=100))
+    assert [[item['size'] for item in window] for window in windows] == [[40, 40], [40], [150], [10]]
+
+def test_spooled_uploads_become_text_references(spool_root):
+    spool_dir = create_spool(1)
+    errors, empty = [], []
+
+    refs = extract_spooled(
+        spool_uploads([upload('a.txt', b'Ada'), upload('../b.txt', b'  '), upload('c.txt', b'\xff'), upload('d.txt', b'Dan')],
+                      spool_dir),
+        on_error=lambda filename, error: errors.append(filename),
+        on_empty=empty.append,
+        max_inflight_bytes=4,
+    )
+
+    assert [ref['filename'] for ref in refs] == ['a.txt', 'd.txt']
+    assert 'content' not in refs[0]
+    assert resume_content(refs[1]) == 'Dan'
+    assert refs[0]['content_hash'] == hashlib.sha256(b'Ada').hexdigest()
+    assert errors == ['c.txt'] and empty == ['../b.txt']
+    # Raw uploads are removed as soon as they are extracted; only the text files remain.
+    assert sorted(os.listdir(spool_dir)) == sorted(os.path.basename(ref['content_path']) for ref in refs)
+
+    discard_spool(spool_dir)
+    assert not os.path.exists(spool_dir)
+
+def test_process_job_resumes_saves_spooled_references(app, spool_root, monkeypatch):
+    monkeypatch.setattr('backend.tasks.RESULT_COMMIT_BATCH_SIZE', 2)
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description='Python developer', user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    spool_dir = create_spool(job.id)
+    refs = extract_spooled(spool_uploads([upload(f'r{i}.txt', f'Resume {i}'.encode()) for i in range(5)], spool_dir))
+
+    process_job_resumes(job.id, refs, job.description, use_cache=False, provider='fake')
+
+    assert [resume.content for resume in Resume.query.order_by(Resume.filename)] == [f'Resume {i}' for i in range(5)]
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+def make_tar_gz(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+@pytest.mark.parametrize('filename, build', [('pack.zip', make_zip), ('pack.tar.gz', make_tar_gz)])
+def test_spool_archive_streams_supported_members(spool_root, filename, build):
+    members = {
+        'candidates/ada.txt': b'Ada',
+        'candidates/huge.txt': b'x' * 64,
+        'candidates/photo.png': b'png',
+        '__MACOSX/candidates/._ada.txt': b'meta',
+        'bob.txt': b'Bob',
+    }
+    skipped = []
+
+    spool_dir = create_spool(1)
+    archive = spool_uploads([upload(filename, build(members))], spool_dir)[0]
+
+    spooled = list(spool_archive(archive, spool_dir, on_skip=lambda name, reason: skipped.append(name), max_file_bytes=32))
+
+    assert [item['filename'] for item in spooled] == ['ada.txt', 'bob.txt']
+    assert [item['size'] for item in spooled] == [3, 3]
+    assert skipped == ['huge.txt']
+
+def test_spool_archive_reports_corrupt_archives(spool_root):
+    skipped = []
+    spool_dir = create_spool(1)
+    archive = spool_uploads([upload('pack.zip', b'not a zip')], spool_dir)[0]
+    assert list(spool_archive(archive, spool_dir, on_skip=lambda name, reason: skipped.append(name))) == []
+    assert skipped == ['pack.zip']
+
+def test_analyze_endpoint_processes_archives_in_chunks(app, spool_root, monkeypatch):
+    monkeypatch.setattr('backend.app.INGEST_ARCHIVE_CHUNK', 2)
+    archive = make_zip({f'r{i}.txt': f'Resume number {i}'.encode() for i in range(5)})
+
+    with patch('backend.app.process_job_resumes', wraps=process_job_resumes) as mock_process:
+        response = app.test_client().post('/api/analyze', data={
+            'jobDescription': 'Python developer',
+            'provider': 'fake',
+            'resumes': [(io.BytesIO(archive), 'pack.zip'), (io.BytesIO(b'Loose resume'), 'loose.txt')],
+        }, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.get_json()['total_resumes'] == 6
+    assert [len(call.args[1]) for call in mock_process.call_args_list] == [2, 2, 2]
+    assert all(call.kwargs['final'] is False for call in mock_process.call_args_list)
+    assert Resume.query.count() == 6
+    assert os.listdir(spool_root) == []
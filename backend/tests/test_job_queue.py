@@ -0,0 +1,101 @@
+import io
+import os
+import pytest
+from backend import ingestion, job_queue
+from backend.app import db, Resume, AnalysisRun
+from backend.analysis_runs import start_run, resume_interrupted_runs
+from backend.extraction import shutdown_extraction_pool
+from backend.job_queue import enqueue, claim, complete, fail, get_task, queue_stats, publish_event, drain_events, running_task, record_task_run
+from backend.progress import start_progress, get_progress
+from backend.worker import run_worker
+
+@pytest.fixture
+def app(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, 'INGEST_SPOOL_DIR', str(tmp_path / 'spool'))
+    yield app
+    shutdown_extraction_pool()
+
+def test_tasks_are_claimed_once_in_order():
+    first = enqueue('process_upload', {'n': 1}, job_id=7)
+    second = enqueue('process_upload', {'n': 2})
+
+    claimed = claim('w1')
+    assert claimed == {'id': first, 'task': 'process_upload', 'payload': {'n': 1}, 'job_id': 7, 'attempts': 1}
+    assert claim('w2')['id'] == second
+    assert claim('w3') is None
+
+    complete(first)
+    fail(second, 'boom')
+    assert get_task(first)['status'] == 'done'
+    assert get_task(second)['error'] == 'boom'
+    assert queue_stats() == {'queued': 0, 'running': 0, 'done': 1, 'failed': 1, 'cancelled': 0}
+
+def test_stalled_tasks_are_retried_then_failed(monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS', -1)
+    monkeypatch.setattr(job_queue, 'JOB_QUEUE_MAX_ATTEMPTS', 2)
+    task_id = enqueue('process_upload', {})
+
+    assert claim('crashed')['attempts'] == 1
+    assert claim('retry')['attempts'] == 2
+    assert claim('late') is None
+
+    task = get_task(task_id)
+    assert task['status'] == 'failed' and task['error'] == 'Worker stopped responding'
+
+def test_events_are_drained_in_order():
+    publish_event({'n': 1})
+    publish_event({'n': 2})
+
+    assert drain_events(limit=1) == [{'n': 1}]
+    assert drain_events() == [{'n': 2}]
+    assert drain_events() == []
+
+def test_queued_upload_runs_on_a_worker(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_EXECUTION', 'queue')
+    client = app.test_client()
+
+    response = client.post('/api/analyze', data={
+        'jobDescription': 'Python developer',
+        'provider': 'fake',
+        'resumes': [(io.BytesIO(b'Ada, Python and SQL'), 'ada.txt'), (io.BytesIO(b'Bob, Java'), 'bob.txt')],
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['total_resumes'] == 2
+    assert Resume.query.count() == 0
+    assert client.get(f"/api/tasks/{body['task_id']}").get_json()['status'] == 'queued'
+
+    assert run_worker('test', max_tasks=1) == 1
+
+    assert client.get(f"/api/tasks/{body['task_id']}").get_json()['status'] == 'done'
+    assert sorted(r.filename for r in Resume.query.all()) == ['ada.txt', 'bob.txt']
+    # The worker's progress events wait in the queue file for the web process to relay them.
+    assert any(event['job_id'] == body['job_id'] for event in drain_events())
+    assert os.listdir(tmp_path / 'spool') == []
+    assert client.get('/api/tasks/stats').get_json()['done'] == 1
+
+def test_a_retried_upload_closes_out_the_run_it_left_behind(app, monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_EXECUTION', 'queue')
+    monkeypatch.setattr(job_queue, 'JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS', -1)
+    client = app.test_client()
+    body = client.post('/api/analyze', data={
+        'jobDescription': 'Python developer',
+        'provider': 'fake',
+        'resumes': [(io.BytesIO(b'Ada, Python and SQL'), 'ada.txt'), (io.BytesIO(b'Bob, Java'), 'bob.txt')],
+    }, content_type='multipart/form-data').get_json()
+
+    # The first worker started analyzing, then stopped responding.
+    crashed = claim('crashed')
+    with running_task(crashed['id']):
+        orphan, _ = start_run(body['job_id'], [{'filename': 'ada.txt', 'content': 'Ada', 'content_hash': 'ada'}], provider='fake')
+        record_task_run(orphan.id)
+        start_progress(body['job_id'], 1)
+
+    assert run_worker('retry', max_tasks=1) == 1
+
+    db.session.expire_all()
+    assert db.session.get(AnalysisRun, orphan.id).status == 'superseded'
+    assert sorted(r.filename for r in Resume.query.all()) == ['ada.txt', 'bob.txt']
+    assert get_progress(body['job_id'])['status'] == 'complete'
+    assert resume_interrupted_runs() == {}
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import inspect, text
+from backend.app import db, User, Job, Resume
+from backend import job_titles
+from backend.job_titles import hash_description, lookup_job_title, populate_job_title, backfill_job_titles
+from backend.schema import upgrade_schema
+
+@pytest.fixture
+def app(app, monkeypatch):
+    monkeypatch.setattr(job_titles, '_title_memo', {})
+    return app
+
+@pytest.fixture
+def user(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@patch('backend.job_titles.extract_job_title_with_ai', return_value='Data Engineer')
+def test_populate_job_title_memoizes_by_description(mock_extract, user):
+    jobs = [Job(description='We need a data engineer.', user_id=user.id) for _ in range(2)]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    for job in jobs:
+        populate_job_title(job.id)
+    # The task commits from its own app context, so reload what this session cached.
+    db.session.expire_all()
+
+    assert [db.session.get(Job, job.id).title for job in jobs] == ['Data Engineer', 'Data Engineer']
+    assert jobs[0].description_hash == hash_description('We need a data engineer.')
+    mock_extract.assert_called_once()
+
+    # A fresh process reuses the stored title instead of calling the model again.
+    job_titles._title_memo.clear()
+    assert lookup_job_title('We need a data engineer.') == 'Data Engineer'
+    mock_extract.assert_called_once()
+
+@patch('backend.job_titles.extract_job_title_with_ai', side_effect=['Chef', 'Job Title Not Found'])
+def test_backfill_job_titles(mock_extract, user):
+    db.session.add_all([
+        Job(description='Head chef', user_id=user.id),
+        Job(description='Head chef', user_id=user.id),
+        Job(description='???', user_id=user.id),
+        Job(description='Already titled', title='Titled', user_id=user.id),
+    ])
+    db.session.commit()
+
+    assert backfill_job_titles(batch_size=2) == 2
+
+    assert [job.title for job in Job.query.order_by(Job.id)] == ['Chef', 'Chef', None, 'Titled']
+    assert mock_extract.call_count == 2
+
+def test_get_jobs_returns_title_and_preview(app, user):
+    long_description = 'Senior platform engineer. ' * 20
+    job = Job(description=long_description, title='Platform Engineer', user_id=user.id)
+    untitled = Job(description='Short description', user_id=user.id)
+    db.session.add_all([job, untitled])
+    db.session.flush()
+    db.session.add(Resume(filename='a.txt', content='A', content_hash='a', job_id=job.id))
+    db.session.commit()
+
+    data = app.test_client().get('/api/jobs').get_json()
+
+    assert data[0] == {'id': untitled.id, 'title': 'Short description', 'description': 'Short description', 'resume_count': 0}
+    assert data[1]['title'] == 'Platform Engineer'
+    assert data[1]['description'] == long_description[:100] + '...'
+    assert data[1]['resume_count'] == 1
+
+def test_upgrade_schema_adds_missing_columns(app):
+    with db.engine.begin() as conn:
+        conn.execute(text('ALTER TABLE job DROP COLUMN title'))
+
+    assert upgrade_schema() == ['job.title']
+    assert 'title' in {column['name'] for column in inspect(db.engine).get_columns('job')}
+    assert upgrade_schema() == []
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, AsyncMock
+from backend.json_stream import TopLevelFieldParser
+from backend.ai_service import analyze_resume_with_ai_async
+
+ANALYSIS = {
+    'candidate_name': 'Ada "Countess" Lovelace',
+    'fit_score': 93,
+    'bucket': '🚀 Green-Room Rocket',
+    'skill_matrix': {'matches': ['Python', 'a, b'], 'gaps': []},
+    'timeline': [{'period': '1842-1843', 'role': 'Analyst {notes}'}],
+}
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_parser_reports_fields_as_they_close():
+    text = json.dumps(ANALYSIS, indent=2, ensure_ascii=False)
+    parser = TopLevelFieldParser()
+    seen = []
+    for chunk in _chunks(text, 3):
+        seen.extend(parser.feed(chunk))
+
+    assert seen == list(ANALYSIS.items())
+
+def test_parser_reports_score_before_the_stream_ends():
+    text = json.dumps(ANALYSIS)
+    cut = text.index('"bucket"')
+    parser = TopLevelFieldParser()
+
+    assert parser.feed(text[:cut]) == [('candidate_name', ANALYSIS['candidate_name']), ('fit_score', 93)]
+
+def _stream_chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+async def _fake_stream(text):
+    for chunk in _chunks(text, 7):
+        yield _stream_chunk(chunk)
+    yield _stream_chunk(usage=SimpleNamespace(total_tokens=1200))
+
+def test_streaming_analysis_calls_back_per_field():
+    text = json.dumps(ANALYSIS)
+    client = MagicMock()
+    client.chat.completions.with_raw_response.create = AsyncMock(
+        return_value=SimpleNamespace(parse=lambda: _fake_stream(text), headers={}))
+    fields = {}
+
+    result = asyncio.run(analyze_resume_with_ai_async('JD', 'Resume', client, on_field=fields.__setitem__))
+
+    assert result == text
+    assert fields == ANALYSIS
+    assert client.chat.completions.with_raw_response.create.call_args.kwargs['stream'] is True
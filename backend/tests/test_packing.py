@@ -0,0 +1,68 @@
+import pytest
+import json
+from unittest.mock import patch, AsyncMock
+from backend.packing import plan_packs
+from backend.ai_service import parse_packed_analyses, build_packed_analysis_messages, build_analysis_messages
+from backend.async_analyzer import analyze_resumes_concurrently
+
+def _resume(filename, words):
+    return {'filename': filename, 'content': ' '.join(['word'] * words)}
+
+def test_plan_packs_groups_short_resumes_under_budget():
+    resumes = [_resume(f'r{i}.txt', 100) for i in range(7)] + [_resume('long.txt', 2000)]
+
+    packs = plan_packs(resumes, token_budget=300, max_resumes=5, max_resume_tokens=1500)
+
+    assert [[rd['filename'] for rd in pack] for pack in packs][0] == ['long.txt']
+    assert sorted(len(pack) for pack in packs[1:]) == [1, 3, 3]
+    assert sum(len(pack) for pack in packs) == len(resumes)
+
+def test_plan_packs_never_repeats_a_filename_in_a_pack():
+    packs = plan_packs([_resume('same.txt', 10), _resume('same.txt', 10)], token_budget=1000)
+
+    assert len(packs) == 2
+
+def test_packed_prompt_shares_the_single_request_prefix():
+    packed = build_packed_analysis_messages('JD text', [('a.txt', 'A'), ('b.txt', 'B')])
+    single = build_analysis_messages('JD text', 'A')
+
+    assert packed[0] == single[0]
+    assert packed[1]['content'].startswith(single[1]['content'].split('**Resume')[0])
+    assert '**Resume (b.txt):**' in packed[1]['content']
+
+def test_parse_packed_analyses():
+    content = json.dumps({'analyses': [
+        {'filename': 'a.txt', 'fit_score': 70},
+        {'filename': 'unknown.txt', 'fit_score': 10},
+        {'fit_score': 5},
+    ]})
+
+    results = parse_packed_analyses(content, ['a.txt', 'b.txt'])
+
+    assert list(results) == ['a.txt']
+    assert json.loads(results['a.txt']) == {'fit_score': 70}
+    with pytest.raises(ValueError):
+        parse_packed_analyses('{"fit_score": 70}', ['a.txt'])
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+@patch('backend.async_analyzer.analyze_resume_pack_async', new_callable=AsyncMock)
+def test_packed_analysis_falls_back_to_single_requests(mock_pack, mock_single, mock_client):
+    async def fake_pack(job_description, resumes, client):
+        if len(resumes) > 2:
+            raise ValueError('malformed')
+        # The model only answers the first resume of the pack.
+        return {resumes[0][0]: json.dumps({'fit_score': 90})}
+    mock_pack.side_effect = fake_pack
+    mock_single.return_value = json.dumps({'fit_score': 50})
+
+    with patch('backend.async_analyzer.plan_packs', side_effect=lambda rds: [rds[:3], rds[3:]]):
+        results, skipped = analyze_resumes_concurrently(
+            [_resume(f'r{i}.txt', 10) for i in range(5)], 'JD', packing=True
+        )
+
+    assert skipped == []
+    scores = {r['filename']: json.loads(r['analysis_json'])['fit_score'] for r in results}
+    assert scores == {'r0.txt': 50, 'r1.txt': 50, 'r2.txt': 50, 'r3.txt': 90, 'r4.txt': 50}
+    assert mock_pack.await_count == 2
+    assert mock_single.await_count == 4
@@ -0,0 +1,78 @@
+import pytest
+import io
+import json
+from unittest.mock import patch, AsyncMock
+from backend.app import Resume
+from backend.prerank import bm25_scores, relative_scores, parse_prefilter, split_by_prefilter
+
+JOB_DESCRIPTION = "Senior Python developer with Django, PostgreSQL and AWS experience."
+
+RESUMES = [
+    {'filename': 'python_dev.txt', 'content': 'Python developer. Built Django services on PostgreSQL, deployed to AWS.'},
+    {'filename': 'java_dev.txt', 'content': 'Java developer with Spring and Oracle. Some Python scripting.'},
+    {'filename': 'chef.txt', 'content': 'Head chef running a busy kitchen, menu planning and food safety.'},
+]
+
+def test_bm25_ranks_relevant_resumes_first():
+    scores = relative_scores(bm25_scores(JOB_DESCRIPTION, [rd['content'] for rd in RESUMES]))
+
+    assert scores[0] == 100.0
+    assert scores[0] > scores[1] > scores[2]
+    assert scores[2] == 0.0
+
+def test_bm25_handles_empty_inputs():
+    assert len(bm25_scores(JOB_DESCRIPTION, [])) == 0
+    assert list(bm25_scores('', ['anything'])) == [0.0]
+    assert list(relative_scores([0.0, 0.0])) == [0.0, 0.0]
+
+def test_parse_prefilter_validates_settings():
+    assert parse_prefilter(None) is None
+    assert parse_prefilter('top_k', top_k='5') == {'mode': 'top_k', 'top_k': 5}
+    assert parse_prefilter('threshold', threshold='40') == {'mode': 'threshold', 'threshold': 40.0}
+    for mode, kwargs in [('top_k', {'top_k': '0'}), ('threshold', {'threshold': '150'}), ('best', {})]:
+        with pytest.raises(ValueError):
+            parse_prefilter(mode, **kwargs)
+
+def test_split_by_prefilter_archives_with_local_score():
+    selected, archived = split_by_prefilter(RESUMES, JOB_DESCRIPTION, {'mode': 'top_k', 'top_k': 1})
+
+    assert [rd['filename'] for rd in selected] == ['python_dev.txt']
+    assert [rd['filename'] for rd in archived] == ['java_dev.txt', 'chef.txt']
+    analysis = json.loads(archived[1]['analysis_json'])
+    assert analysis['prefiltered'] is True
+    assert analysis['prefilter_rank'] == 3
+    assert analysis['fit_score'] < 65
+
+    selected, archived = split_by_prefilter(RESUMES, JOB_DESCRIPTION, {'mode': 'threshold', 'threshold': 1})
+    assert [rd['filename'] for rd in archived] == ['chef.txt']
+
+@patch('backend.async_analyzer.create_async_client', return_value=AsyncMock())
+@patch('backend.async_analyzer.analyze_resume_with_ai_async', new_callable=AsyncMock)
+def test_analyze_endpoint_sends_only_top_k(mock_analyze, mock_client, app):
+    mock_analyze.return_value = json.dumps({'candidate_name': 'Py Dev', 'fit_score': 92})
+    client = app.test_client()
+
+    response = client.post('/api/analyze', data={
+        'jobDescription': JOB_DESCRIPTION,
+        'prefilter_mode': 'top_k',
+        'prefilter_top_k': '1',
+        'resumes': [(io.BytesIO(rd['content'].encode()), rd['filename']) for rd in RESUMES],
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert mock_analyze.await_count == 1
+    resumes = {r.filename: r for r in Resume.query.all()}
+    assert set(resumes) == set(rd['filename'] for rd in RESUMES)
+    assert json.loads(resumes['python_dev.txt'].analysis)['bucket'] == '🚀 Green-Room Rocket'
+    chef = json.loads(resumes['chef.txt'].analysis)
+    assert chef['bucket'] == '🗄️ Swipe-Left Archive'
+    assert chef['prefiltered'] is True
+
+def test_analyze_endpoint_rejects_bad_prefilter(app):
+    response = app.test_client().post('/api/analyze', data={
+        'jobDescription': JOB_DESCRIPTION,
+        'prefilter_mode': 'top_k',
+        'prefilter_top_k': 'lots',
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 400
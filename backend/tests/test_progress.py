@@ -0,0 +1,73 @@
+import pytest
+from backend.app import app as flask_app, db, User, Job, Resume
+from backend.analysis_runs import start_run, mark_items, resume_interrupted_runs
+from backend.progress import start_progress, record_progress, complete_if_done, get_progress
+from backend.tasks import process_job_resumes
+
+@pytest.fixture
+def job(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description='Python developer', user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def test_counters_accumulate_across_chunks():
+    start_progress(1, 3)
+    record_progress(1, analyzed=2, failed=1)
+    start_progress(1, 2)
+    record_progress(1, skipped=1)
+
+    progress = get_progress(1)
+    assert (progress['total'], progress['analyzed'], progress['failed'], progress['skipped']) == (5, 2, 1, 1)
+    assert progress['completed'] == 4 and progress['remaining'] == 1
+    assert progress['percent'] == 80.0
+    assert progress['status'] == 'running'
+    assert get_progress(2) is None
+
+def test_completion_fires_once():
+    start_progress(1, 2)
+    record_progress(1, analyzed=1)
+    assert complete_if_done(1) is False
+
+    record_progress(1, failed=1)
+    assert complete_if_done(1) is True
+    assert complete_if_done(1) is False
+
+    progress = get_progress(1)
+    assert progress['status'] == 'complete' and progress['eta_seconds'] == 0.0
+    assert progress['finished_at'] is not None
+    # A new upload to a finished job starts counting afresh.
+    start_progress(1, 4)
+    assert (get_progress(1)['total'], get_progress(1)['completed']) == (4, 0)
+
+def test_progress_endpoint_reports_a_finished_job(job):
+    client = flask_app.test_client()
+    assert client.get(f'/api/jobs/{job.id}/progress').get_json()['status'] == 'idle'
+
+    resumes = [{'filename': f'{name}.txt', 'content': f'Resume of {name}'} for name in ('ada', 'bob')]
+    process_job_resumes(job.id, resumes, job.description, use_cache=False, provider='fake')
+
+    progress = client.get(f'/api/jobs/{job.id}/progress').get_json()
+    assert progress['status'] == 'complete'
+    assert (progress['total'], progress['analyzed'], progress['remaining']) == (2, 2, 0)
+    assert client.get('/api/jobs/999/progress').status_code == 404
+
+def test_a_resumed_run_is_not_counted_twice(job):
+    resumes = [{'filename': f'{name}.txt', 'content': f'Resume of {name}', 'content_hash': name} for name in ('ada', 'bob', 'cy')]
+    run, tracked = start_run(job.id, resumes, use_cache=False, provider='fake')
+    start_progress(job.id, 3)
+    # ada was saved and counted; bob was saved just before the process died, cy never finished.
+    mark_items([tracked[0]['run_item_id']], 'done')
+    record_progress(job.id, analyzed=1)
+    mark_items([tracked[1]['run_item_id'], tracked[2]['run_item_id']], 'analyzing')
+    db.session.add(Resume(filename='bob.txt', content='Resume of bob', content_hash='bob', job_id=job.id))
+    db.session.commit()
+
+    assert resume_interrupted_runs() == {run.id: 1}
+
+    progress = get_progress(job.id)
+    assert progress['status'] == 'complete'
+    assert (progress['total'], progress['analyzed']) == (3, 3)
@@ -0,0 +1,109 @@
+import time
+from backend.app import app as flask_app, socketio, emit_progress_update
+from backend.progress_events import ProgressCoalescer
+
+def event(job_id, n, progress_type='info'):
+    return {'job_id': job_id, 'message': f'event {n}', 'type': progress_type, 'timestamp': time.time()}
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, name, payload, room):
+        self.sent.append((name, room, payload))
+
+    def frames(self, room):
+        return [payload for name, frame_room, payload in self.sent if name == 'progress_batch' and frame_room == room]
+
+def test_summary_frames_are_coalesced_and_capped():
+    recorder = Recorder()
+    coalescer = ProgressCoalescer(recorder, frames_per_second=0.01, max_events=3)
+    for n in range(10):
+        coalescer.publish(event(1, n, 'success'))
+
+    # The first event goes out at once; the rest wait for the next frame.
+    assert len(recorder.frames('job:1:summary')) == 1
+    coalescer.flush()
+
+    frame = recorder.frames('job:1:summary')[1]
+    assert [e['message'] for e in frame['events']] == ['event 7', 'event 8', 'event 9']
+    assert frame['counts'] == {'success': 9} and frame['omitted'] == 6
+    # Verbose subscribers still see every event.
+    assert sum(1 for name, room, _ in recorder.sent if room == 'job:1:verbose') == 10
+
+def test_completion_is_sent_without_waiting():
+    recorder = Recorder()
+    coalescer = ProgressCoalescer(recorder, frames_per_second=0.01)
+    coalescer.publish(event(1, 1))
+    coalescer.publish(event(1, 2))
+    coalescer.publish(event(1, 3, 'complete'))
+
+    frames = recorder.frames('job:1:summary')
+    assert len(frames) == 2
+    assert [e['type'] for e in frames[1]['events']] == ['info', 'complete']
+
+def test_pending_frames_are_sent_by_timer():
+    recorder = Recorder()
+    coalescer = ProgressCoalescer(recorder, frames_per_second=20)
+    coalescer.publish(event(1, 1))
+    coalescer.publish(event(1, 2))
+    time.sleep(0.3)
+
+    assert [len(frame['events']) for frame in recorder.frames('job:1:summary')] == [1, 1]
+
+def test_only_subscribers_receive_a_jobs_events():
+    watching = socketio.test_client(flask_app)
+    elsewhere = socketio.test_client(flask_app)
+    watching.get_received()
+    elsewhere.get_received()
+
+    watching.emit('subscribe', {'job_id': 7, 'mode': 'verbose'})
+    elsewhere.emit('subscribe', {'job_id': 8})
+    assert watching.get_received()[0]['args'][0]['mode'] == 'verbose'
+    elsewhere.get_received()
+
+    emit_progress_update(7, 'Analyzing', 'processing')
+
+    received = watching.get_received()
+    assert [(r['name'], r['args'][0]['message']) for r in received] == [('progress_update', 'Analyzing')]
+    assert elsewhere.get_received() == []
+
+    watching.emit('subscribe', {'job_id': 7, 'mode': 'loud'})
+    assert watching.get_received()[0]['name'] == 'subscription_error'
+    watching.disconnect()
+    elsewhere.disconnect()
+
+def test_replay_sends_only_missed_events():
+    coalescer = ProgressCoalescer(Recorder(), frames_per_second=0, replay_events=3)
+    for n in range(1, 6):
+        coalescer.publish(event(1, n))
+
+    replay = coalescer.replay(1, last_seq=3, stream_id=coalescer.stream_id)
+    assert [e['seq'] for e in replay['events']] == [4, 5]
+    assert replay['latest_seq'] == 5 and not replay['gap'] and not replay['reset']
+    assert coalescer.replay(1, last_seq=5)['events'] == []
+    # Events 2 and earlier have left the buffer, so the client has to reload the job.
+    assert coalescer.replay(1, last_seq=1)['gap'] is True
+    # Sequence numbers from before a restart are not trusted.
+    stale = coalescer.replay(1, last_seq=4, stream_id='old')
+    assert stale['reset'] is True and [e['seq'] for e in stale['events']] == [3, 4, 5]
+
+def test_replay_buffers_are_bounded_per_job():
+    coalescer = ProgressCoalescer(Recorder(), frames_per_second=0, replay_jobs=2)
+    for job_id in (1, 2, 3):
+        coalescer.publish(event(job_id, 1))
+
+    assert coalescer.replay(1)['latest_seq'] == 0
+    assert coalescer.replay(3)['latest_seq'] == 1
+
+def test_subscribing_with_last_seq_replays_the_delta():
+    client = socketio.test_client(flask_app)
+    client.get_received()
+    emit_progress_update(9, 'Reading ada.pdf', 'info')
+    emit_progress_update(9, 'Analyzing ada.pdf', 'processing')
+
+    client.emit('subscribe', {'job_id': 9, 'last_seq': 1})
+
+    replay = client.get_received()[0]['args'][0]['replay']
+    assert [e['message'] for e in replay['events']] == ['Analyzing ada.pdf']
+    client.disconnect()
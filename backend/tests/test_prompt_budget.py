@@ -0,0 +1,79 @@
+from backend.ai_service import ANALYSIS_SYSTEM_PROMPT, build_analysis_messages
+from backend.prompt_budget import (
+    TRUNCATION_MARKER, compress_resume_text, estimate_tokens,
+    fit_to_budget, normalize_resume_text, TokenSavingsReport
+)
+
+
+def test_messages_keep_a_stable_prefix_per_job():
+    first = build_analysis_messages("Senior Python developer", "Resume A")
+    second = build_analysis_messages("Senior Python developer", "Resume B")
+
+    assert first[0] == second[0] == {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT}
+    assert '"fit_score"' in ANALYSIS_SYSTEM_PROMPT
+    # Everything before the resume text is identical, so provider prefix caching applies.
+    prefix = first[1]['content'].split('Resume A')[0]
+    assert second[1]['content'].startswith(prefix)
+    assert prefix.index('Senior Python developer') < len(prefix)
+
+
+def test_normalize_removes_noise_but_keeps_headings():
+    raw = (
+        "Jane Roe | jane@example.com | +1 555 0100\n"
+        "Experience\n"
+        "  Built   data\tpipelines  in Python\n\n\n\n"
+        "Page 1 of 2\n"
+        "Jane Roe | jane@example.com | +1 555 0100\n"
+        "Experience\n"
+        "- 2 -\n"
+        "Led a team of four engineers\r\n"
+    )
+
+    assert normalize_resume_text(raw) == (
+        "Jane Roe | jane@example.com | +1 555 0100\n"
+        "Experience\n"
+        "Built data pipelines in Python\n"
+        "\n"
+        "Experience\n"
+        "Led a team of four engineers"
+    )
+
+
+def test_estimate_tokens_is_close_to_word_count_for_prose():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Built data pipelines in Python.") == 7
+    assert estimate_tokens("internationalization") == 3
+
+
+def test_fit_to_budget_keeps_head_and_tail():
+    lines = [f"line {i} with some words" for i in range(1000)]
+    text = '\n'.join(lines)
+
+    trimmed = fit_to_budget(text, 200)
+
+    assert estimate_tokens(trimmed) <= 200
+    assert trimmed.startswith("line 0 ")
+    assert trimmed.endswith("line 999 with some words")
+    assert TRUNCATION_MARKER in trimmed
+    assert fit_to_budget("short text", 200) == "short text"
+
+
+def test_fit_to_budget_handles_text_without_line_breaks():
+    trimmed = fit_to_budget("word " * 5000, 100)
+
+    assert trimmed.startswith("word word")
+    assert estimate_tokens(trimmed) <= 100
+
+
+def test_savings_report_counts_each_resume_once():
+    text, original, compressed = compress_resume_text("Skills:    Python\n\n\n\nPage 3\n" * 3)
+    report = TokenSavingsReport()
+
+    report.add(original, compressed, key='a.txt')
+    report.add(original, compressed, key='a.txt')
+
+    assert text == "Skills: Python\n\nSkills: Python\n\nSkills: Python"
+    assert report.resumes == 1
+    assert report.tokens_saved == original - compressed > 0
+    assert report.to_dict()['tokens_saved'] == report.tokens_saved
+    assert compress_resume_text("Plain resume")[0] == "Plain resume"
@@ -0,0 +1,153 @@
+import pytest
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from backend import providers
+from backend.providers import (
+    AnthropicProvider, FakeProvider, ProviderError, StubHTTPProvider, fake_completion_text, get_provider
+)
+from backend.ai_service import (
+    analyze_resume_with_ai, analyze_resume_with_ai_async, build_analysis_messages,
+    build_packed_analysis_messages, extract_job_title_with_ai
+)
+from backend.async_analyzer import analyze_resumes_concurrently
+from backend.stub_server import start_stub_server_in_thread
+from backend.app import app as flask_app, db
+
+@pytest.fixture
+def fresh_providers(monkeypatch):
+    monkeypatch.setattr(providers, '_instances', {})
+
+def test_get_provider_rejects_unknown_names():
+    assert get_provider('fake') is get_provider('fake')
+    with pytest.raises(ValueError):
+        get_provider('carrier-pigeon')
+
+def test_providers_must_implement_sync_and_async_calls():
+    class SyncOnlyProvider(providers.AnalysisProvider):
+        def complete(self, messages, model, max_tokens=None, temperature=None, json_output=False):
+            return None
+
+    with pytest.raises(TypeError):
+        SyncOnlyProvider()
+
+def test_fake_responses_are_deterministic_per_resume():
+    single = json.loads(fake_completion_text(build_analysis_messages('JD', 'Ada Lovelace\nAnalyst')))
+    packed = json.loads(fake_completion_text(build_packed_analysis_messages(
+        'JD', [('ada.txt', 'Ada Lovelace\nAnalyst'), ('bob.txt', 'Bob')]
+    )))
+
+    assert single['candidate_name'] == 'Ada Lovelace'
+    assert packed['analyses'][0] == dict(single, filename='ada.txt')
+    assert packed['analyses'][1]['filename'] == 'bob.txt'
+
+def test_fake_provider_failures_follow_the_seed():
+    def failures(provider):
+        results = []
+        for _ in range(50):
+            try:
+                provider.complete(build_analysis_messages('JD', 'resume'), 'fake-analysis', json_output=True)
+                results.append(None)
+            except ProviderError as e:
+                results.append(e.status_code)
+        return results
+
+    first = failures(FakeProvider(error_rate=0.2, throttle_rate=0.2, seed=7))
+
+    assert first == failures(FakeProvider(error_rate=0.2, throttle_rate=0.2, seed=7))
+    assert {429, 503, None} == set(first)
+
+def test_sync_calls_go_through_the_selected_provider(fresh_providers):
+    analysis = json.loads(analyze_resume_with_ai('JD', 'Resume text', provider='fake'))
+    assert 0 <= analysis['fit_score'] <= 100
+    assert extract_job_title_with_ai('Staff Data Engineer\nWe are hiring.', provider='fake') == 'Staff Data Engineer'
+
+def test_fake_provider_runs_the_whole_engine(fresh_providers):
+    resumes = [{'filename': f'r{i}.txt', 'content': f'Resume {i}'} for i in range(30)]
+    partial = []
+
+    results, skipped = analyze_resumes_concurrently(
+        resumes, 'JD', provider='fake', on_partial=lambda rd, key, value: partial.append(key)
+    )
+
+    assert skipped == []
+    assert len(results) == 30
+    assert partial.count('fit_score') == 30
+
+def test_failover_to_the_fallback_provider(fresh_providers, monkeypatch):
+    monkeypatch.setattr(providers, 'ANALYSIS_FALLBACK_PROVIDER', 'fake')
+    failing = FakeProvider(error_rate=1.0)
+    failing.analysis_model = 'primary-analysis'
+    monkeypatch.setattr(providers, '_instances', {'stub': failing})
+
+    with patch('backend.async_analyzer.OPENAI_MAX_RETRIES', 1), \
+            patch('backend.rate_limiter.OPENAI_BACKOFF_MAX_SECONDS', 0):
+        results, skipped = analyze_resumes_concurrently([{'filename': 'a.txt', 'content': 'A'}], 'JD', provider='stub')
+
+    assert skipped == []
+    assert len(results) == 1
+    assert providers._instances['stub'].request_count == 2
+    # The result names the model that actually produced it.
+    assert results[0]['analysis_model'] == 'fake-analysis'
+
+def test_stub_server_speaks_the_openai_protocol():
+    server = start_stub_server_in_thread()
+    try:
+        provider = StubHTTPProvider(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+        messages = build_analysis_messages('JD', 'Resume text')
+
+        completion = provider.complete(messages, provider.analysis_model, json_output=True)
+        fields = {}
+
+        async def stream():
+            client = provider.create_async_client()
+            try:
+                return await analyze_resume_with_ai_async('JD', 'Resume text', client, on_field=fields.__setitem__,
+                                                          provider='stub')
+            finally:
+                await client.close()
+
+        with patch.object(providers, '_instances', {'stub': provider}):
+            streamed = asyncio.run(stream())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert json.loads(completion.content) == json.loads(streamed) == fields
+    assert completion.usage.total_tokens > 0
+
+def test_anthropic_request_shape():
+    provider = AnthropicProvider()
+    client = MagicMock()
+    client.messages.with_raw_response.create.return_value = SimpleNamespace(
+        parse=lambda: SimpleNamespace(
+            content=[SimpleNamespace(type='text', text='"fit_score": 70}')],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+        ),
+        headers={'anthropic-ratelimit-requests-limit': '50', 'anthropic-ratelimit-tokens-remaining': '9000'},
+    )
+    provider._client = client
+
+    completion = provider.complete(build_analysis_messages('JD', 'Resume'), 'claude-test', json_output=True)
+
+    assert json.loads(completion.content) == {'fit_score': 70}
+    assert completion.usage.total_tokens == 120
+    assert completion.headers == {'x-ratelimit-limit-requests': '50', 'x-ratelimit-remaining-tokens': '9000'}
+    kwargs = client.messages.with_raw_response.create.call_args.kwargs
+    assert 'talent acquisition' in kwargs['system']
+    assert [m['role'] for m in kwargs['messages']] == ['user', 'assistant']
+    assert kwargs['max_tokens'] == providers.ANTHROPIC_MAX_OUTPUT_TOKENS
+
+def test_analyze_endpoint_rejects_unknown_provider():
+    flask_app.config.update({"TESTING": True})
+    with flask_app.app_context():
+        db.create_all()
+        response = flask_app.test_client().post('/api/analyze', data={
+            'jobDescription': 'JD',
+            'provider': 'carrier-pigeon',
+        }, content_type='multipart/form-data')
+        db.session.remove()
+        db.drop_all()
+
+    assert response.status_code == 400
@@ -0,0 +1,153 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import httpx
+import openai
+import pytest
+
+from backend import rate_limiter
+from backend.rate_limiter import (
+    TokenBucketRateLimiter, call_with_retry, call_once_async,
+    is_retryable_error, parse_reset_duration
+)
+from backend.ai_service import analyze_resume_with_ai
+
+
+def _status_error(error_class, status_code, headers=None):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(status_code, request=request, headers=headers or {})
+    return error_class('error', response=response, body=None)
+
+
+def test_bucket_grants_until_empty_then_reports_wait(tmp_path):
+    limiter = TokenBucketRateLimiter('test-model', requests_per_minute=2, tokens_per_minute=600,
+                                     db_path=str(tmp_path / 'buckets.db'))
+
+    assert limiter.try_acquire(100) == 0
+    assert limiter.try_acquire(100) == 0
+    # Out of requests: one request refills in 30 seconds at 2 RPM.
+    assert limiter.try_acquire(100) == pytest.approx(30, abs=1)
+
+
+def test_buckets_are_shared_between_limiter_instances(tmp_path):
+    db_path = str(tmp_path / 'buckets.db')
+    first = TokenBucketRateLimiter('shared', requests_per_minute=100, tokens_per_minute=1000, db_path=db_path)
+    second = TokenBucketRateLimiter('shared', requests_per_minute=100, tokens_per_minute=1000, db_path=db_path)
+
+    assert first.try_acquire(900) == 0
+    assert second.try_acquire(900) > 0
+
+
+def test_configured_limits_replace_saved_ones(tmp_path):
+    db_path = str(tmp_path / 'buckets.db')
+    TokenBucketRateLimiter('config', requests_per_minute=100, tokens_per_minute=10000, db_path=db_path)
+
+    lowered = TokenBucketRateLimiter('config', requests_per_minute=10, tokens_per_minute=1000, db_path=db_path).snapshot()
+
+    assert lowered['requests']['capacity'] == 10
+    assert lowered['tokens']['capacity'] == 1000
+    assert lowered['tokens']['available'] == pytest.approx(1000)
+
+
+def test_headers_resize_and_pause_the_buckets(tmp_path):
+    limiter = TokenBucketRateLimiter('headers', requests_per_minute=100, tokens_per_minute=1000,
+                                     db_path=str(tmp_path / 'buckets.db'))
+
+    limiter.update_from_headers({
+        'x-ratelimit-limit-requests': '50',
+        'x-ratelimit-remaining-requests': '10',
+        'x-ratelimit-limit-tokens': '20000',
+        'x-ratelimit-remaining-tokens': '0',
+        'x-ratelimit-reset-tokens': '6m0s',
+    })
+
+    snapshot = limiter.snapshot()
+    assert snapshot['requests']['capacity'] == 50
+    assert snapshot['requests']['available'] == pytest.approx(10, abs=0.1)
+    assert snapshot['tokens']['capacity'] == 20000
+    assert limiter.try_acquire(10) == pytest.approx(360, abs=1)
+
+
+def test_successful_responses_resize_the_buckets(tmp_path):
+    limiter = TokenBucketRateLimiter('success-headers', requests_per_minute=100, tokens_per_minute=1000,
+                                     db_path=str(tmp_path / 'buckets.db'))
+    response = SimpleNamespace(usage=SimpleNamespace(total_tokens=10), headers={'x-ratelimit-limit-requests': '40'})
+
+    call_with_retry(lambda: response, 'success-headers', estimated_tokens=10, limiter=limiter)
+    assert limiter.snapshot()['requests']['capacity'] == 40
+
+    async def request():
+        return SimpleNamespace(usage=None, headers={'x-ratelimit-limit-tokens': '5000'})
+
+    asyncio.run(call_once_async(request, 'success-headers', estimated_tokens=10, limiter=limiter))
+    assert limiter.snapshot()['tokens']['capacity'] == 5000
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration('1s') == 1
+    assert parse_reset_duration('6m0s') == 360
+    assert parse_reset_duration('250ms') == 0.25
+    assert parse_reset_duration('2') == 2
+    assert parse_reset_duration(None) is None
+
+
+def test_error_classification():
+    assert is_retryable_error(_status_error(openai.RateLimitError, 429))
+    assert is_retryable_error(_status_error(openai.InternalServerError, 503))
+    assert not is_retryable_error(_status_error(openai.BadRequestError, 400))
+    assert not is_retryable_error(_status_error(openai.AuthenticationError, 401))
+    assert not is_retryable_error(ValueError('boom'))
+
+
+@patch('backend.rate_limiter.time.sleep')
+def test_call_with_retry_retries_throttling_then_succeeds(mock_sleep):
+    response = MagicMock()
+    request_fn = MagicMock(side_effect=[
+        _status_error(openai.RateLimitError, 429, {'retry-after': '0'}),
+        response,
+    ])
+
+    assert call_with_retry(request_fn, 'retry-model', estimated_tokens=10) is response
+    assert request_fn.call_count == 2
+
+
+@patch('backend.rate_limiter.time.sleep')
+def test_call_with_retry_does_not_retry_bad_requests(mock_sleep):
+    request_fn = MagicMock(side_effect=_status_error(openai.BadRequestError, 400))
+
+    with pytest.raises(openai.BadRequestError):
+        call_with_retry(request_fn, 'retry-model', estimated_tokens=10)
+    assert request_fn.call_count == 1
+
+
+@patch('backend.rate_limiter.time.sleep')
+def test_failed_calls_refund_their_token_estimate(mock_sleep, tmp_path):
+    limiter = TokenBucketRateLimiter('refund-model', requests_per_minute=100, tokens_per_minute=1000,
+                                     db_path=str(tmp_path / 'buckets.db'))
+    request_fn = MagicMock(side_effect=_status_error(openai.BadRequestError, 400))
+
+    for _ in range(3):
+        with pytest.raises(openai.BadRequestError):
+            call_with_retry(request_fn, 'refund-model', estimated_tokens=400, limiter=limiter)
+        with pytest.raises(openai.BadRequestError):
+            asyncio.run(call_once_async(MagicMock(side_effect=_status_error(openai.BadRequestError, 400)),
+                                        'refund-model', estimated_tokens=400, limiter=limiter))
+
+    assert limiter.snapshot()['tokens']['available'] == pytest.approx(1000, abs=1)
+
+
+@patch('backend.rate_limiter.time.sleep')
+@patch('backend.ai_service.get_client')
+def test_analysis_failure_is_flagged_as_error_not_scored(mock_get_client, mock_sleep):
+    mock_client = MagicMock()
+    mock_client.chat.completions.with_raw_response.create.side_effect = _status_error(openai.RateLimitError, 429, {'retry-after': '0'})
+    mock_get_client.return_value = mock_client
+
+    with patch.object(rate_limiter, 'OPENAI_MAX_RETRIES', 2):
+        analysis = json.loads(analyze_resume_with_ai("JD", "Resume"))
+
+    assert analysis['error'] is True
+    assert 'fit_score' not in analysis
+    assert mock_client.chat.completions.with_raw_response.create.call_count == 3
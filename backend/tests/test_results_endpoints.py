@@ -1,21 +1,8 @@
 import pytest
 import json
-from backend.app import app as flask_app, db
+from backend.app import db
 from backend.app import Job, Resume
 
-@pytest.fixture
-def app():
-    """Create and configure a new app instance for each test."""
-    flask_app.config.update({
-        "TESTING": True,
-        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
-    })
-
-    with flask_app.app_context():
-        db.create_all()
-        yield flask_app
-        db.drop_all()
-
 @pytest.fixture
 def client(app):
     """A test client for the app."""
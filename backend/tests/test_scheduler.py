@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from backend.app import app as flask_app
+from backend.scheduler import FairShareScheduler, default_priority
+
+async def _request(share, name, order):
+    async with share:
+        order.append(name)
+        await asyncio.sleep(0)
+
+def test_interactive_requests_overtake_a_bulk_backlog():
+    scheduler = FairShareScheduler(capacity=1)
+    bulk = scheduler.register(1, 'bulk')
+    interactive = scheduler.register(2, 'interactive')
+    order = []
+
+    async def run():
+        await scheduler.acquire(bulk)
+        tasks = [asyncio.create_task(_request(bulk, f'b{i}', order)) for i in range(10)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(_request(interactive, f'i{i}', order)) for i in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()['jobs'][0]['queue_depth'] == 10
+        scheduler.release(bulk)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order[:2] == ['i0', 'i1']
+    assert sorted(order[2:]) == sorted(f'b{i}' for i in range(10))
+    assert scheduler.in_flight == 0
+
+def test_user_cap_holds_back_only_that_user():
+    scheduler = FairShareScheduler(capacity=10, user_max_concurrency=1)
+    first = scheduler.register(1, 'interactive', user_id='ann')
+    second = scheduler.register(2, 'interactive', user_id='ann')
+    other = scheduler.register(3, 'bulk', user_id='bea')
+
+    async def run():
+        await scheduler.acquire(first)
+        held = asyncio.create_task(scheduler.acquire(second))
+        await asyncio.wait_for(scheduler.acquire(other), timeout=1)
+        await asyncio.sleep(0)
+        assert not held.done()
+        stats = {job['job_id']: job for job in scheduler.stats()['jobs']}
+        assert stats[2]['queue_depth'] == 1 and stats[3]['in_flight'] == 1
+
+        scheduler.release(first)
+        await asyncio.wait_for(held, timeout=1)
+
+        # A cancelled waiter gives up its place without leaking a slot.
+        cancelled = asyncio.create_task(scheduler.acquire(first))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        scheduler.release(second)
+        scheduler.release(other)
+
+    asyncio.run(run())
+
+    assert scheduler.in_flight == 0
+    assert scheduler.stats()['jobs'][0]['queue_depth'] == 0
+
+def test_priority_defaults_and_stats_endpoint():
+    assert default_priority(5) == 'interactive'
+    assert default_priority(5000) == 'bulk'
+    with pytest.raises(ValueError):
+        FairShareScheduler().register(1, 'urgent')
+
+    stats = flask_app.test_client().get('/api/scheduler/stats').get_json()
+    assert {'capacity', 'in_flight', 'jobs'} <= set(stats)
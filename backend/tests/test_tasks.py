@@ -0,0 +1,75 @@
+import json
+import pytest
+from backend.app import db, User, Job, Resume
+from backend.analysis_cache import make_cache_key, get_cached_analyses
+from backend.tasks import _ResultWriter
+
+@pytest.fixture
+def job(app):
+    user = User(username='default_user')
+    db.session.add(user)
+    db.session.flush()
+    job = Job(description='Python developer', user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def result(name, content=None):
+    return {
+        'filename': f'{name}.txt',
+        'content': f'Resume of {name}' if content is None else content,
+        'content_hash': name,
+        'analysis_json': json.dumps({'candidate_name': name.title(), 'fit_score': 85}),
+    }
+
+def test_results_are_committed_as_each_batch_fills(job):
+    writer = _ResultWriter(job.id, job.description, 'model', use_cache=False, batch_size=2, interval=60)
+
+    writer.add(result('ada'))
+    assert Resume.query.count() == 0
+    writer.add(result('bob'))
+    assert Resume.query.count() == 2
+
+    writer.add(result('cy'))
+    writer.flush()
+    assert writer.saved == 3
+    assert Resume.query.filter_by(filename='cy.txt').one().candidate_name == 'Cy'
+
+def test_existing_rows_are_ignored(job):
+    db.session.add(Resume(filename='old.txt', content='Old', content_hash='ada', job_id=job.id))
+    db.session.commit()
+    writer = _ResultWriter(job.id, job.description, 'model', use_cache=False, batch_size=10)
+
+    writer.add(result('ada'))
+    writer.add(result('bob'))
+    writer.flush()
+
+    assert writer.saved == 1
+    assert writer.skipped_files == [{'status': 'duplicate', 'filename': 'ada.txt', 'reason': 'Already saved for this job'}]
+    assert Resume.query.count() == 2
+
+def test_a_bad_row_only_costs_itself(job):
+    writer = _ResultWriter(job.id, job.description, 'model', use_cache=False, batch_size=10)
+    bad = dict(result('bad'), filename=None)
+
+    for res_data in (result('ada'), bad, result('bob')):
+        writer.add(res_data)
+    writer.flush()
+
+    assert sorted(r.filename for r in Resume.query.all()) == ['ada.txt', 'bob.txt']
+    assert [f['filename'] for f in writer.skipped_files] == [None]
+    assert writer.skipped_files[0]['status'] == 'error'
+
+def test_analyses_are_cached_under_the_model_that_produced_them(job):
+    writer = _ResultWriter(job.id, job.description, 'primary-model', use_cache=True, batch_size=10)
+
+    writer.add(result('ada'))
+    writer.add(dict(result('bob'), analysis_model='fallback-model'))
+    writer.flush()
+
+    keys = {
+        'ada': make_cache_key(job.description, 'ada', model='primary-model'),
+        'bob_primary': make_cache_key(job.description, 'bob', model='primary-model'),
+        'bob_fallback': make_cache_key(job.description, 'bob', model='fallback-model'),
+    }
+    assert set(get_cached_analyses(keys.values())) == {keys['ada'], keys['bob_fallback']}
@@ -0,0 +1,125 @@
+# Worker processes for the durable job queue (see job_queue.py). Start them next to the web server:
+#
+#     python -m backend.worker --workers 4
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from dotenv import load_dotenv
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+
+
+def _task_functions():
+    from backend.analysis_runs import resume_run
+    from backend.app import process_upload
+    return {'process_upload': process_upload, 'resume_run': resume_run}
+
+
+class _Heartbeat:
+    """Keeps a long-running task claimed by refreshing its heartbeat in the background."""
+
+    def __init__(self, task_id, interval):
+        self.task_id = task_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        from backend import job_queue
+        while not self._stop.wait(self.interval):
+            try:
+                job_queue.heartbeat(self.task_id)
+            except Exception as e:
+                print(f"Heartbeat for task {self.task_id} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_one(worker_name):
+    """Claims and runs a single queued task. Returns False if the queue was empty."""
+    from backend import job_queue
+    from backend.app import app
+
+    claimed = job_queue.claim(worker_name)
+    if claimed is None:
+        return False
+    task = _task_functions().get(claimed['task'])
+    print(f"[{worker_name}] Running task {claimed['id']} ({claimed['task']}, attempt {claimed['attempts']})")
+    try:
+        if task is None:
+            raise ValueError(f"Unknown task {claimed['task']}")
+        with _Heartbeat(claimed['id'], job_queue.JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS / 3), app.app_context(), \
+                job_queue.running_task(claimed['id']):
+            task(**claimed['payload'])
+    except Exception:
+        print(f"[{worker_name}] Task {claimed['id']} failed")
+        traceback.print_exc()
+        job_queue.fail(claimed['id'], traceback.format_exc())
+    else:
+        job_queue.complete(claimed['id'])
+    return True
+
+
+def run_worker(worker_name, stop_event=None, max_tasks=None):
+    """Processes queued tasks until stop_event is set (or max_tasks have run)."""
+    from backend import job_queue
+
+    job_queue.relay_events_to_web()
+    processed = 0
+    while not (stop_event and stop_event.is_set()):
+        if max_tasks is not None and processed >= max_tasks:
+            break
+        if run_one(worker_name):
+            processed += 1
+        else:
+            time.sleep(job_queue.JOB_QUEUE_POLL_SECONDS)
+    return processed
+
+
+def _worker_process(index, stop_event):
+    # Ctrl+C is handled by the parent, which asks every worker to finish its current task.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(f"{socket.gethostname()}:{os.getpid()}:{index}", stop_event)
+
+
+def main():
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    load_dotenv(dotenv_path=os.path.join(project_root, '.env'))
+
+    parser = argparse.ArgumentParser(description="Runs TalentVibe background workers for queued uploads.")
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS, help="Number of worker processes")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    processes = [
+        context.Process(target=_worker_process, args=(index, stop_event), name=f"worker-{index}")
+        for index in range(max(1, args.workers))
+    ]
+    for process in processes:
+        process.start()
+    print(f"Started {len(processes)} workers")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping workers after their current tasks...")
+        stop_event.set()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -76,7 +76,7 @@ const JobsListPage = () => {
                     {jobs.length > 0 ? (
                         jobs.map(job => (
                             <div key={job.id} className="glass-container job-card">
-                                <h3>{truncateText(job.description, 100)}</h3>
+                                <h3>{job.title || truncateText(job.description, 100)}</h3>
                                 <div className="job-card-meta">
                                     <span>{job.resume_count} Résumés</span>
                                 </div>
@@ -84,7 +84,7 @@ const JobsListPage = () => {
                                     <Link to={`/jobs/${job.id}`} className="details-button">View Analysis</Link>
                                     <button 
                                         className="delete-button"
-                                        onClick={() => handleDeleteJob(job.id, job.description)}
+                                        onClick={() => handleDeleteJob(job.id, job.title || job.description)}
                                         disabled={deletingJobId === job.id}
                                     >
                                         {deletingJobId === job.id ? 'Deleting...' : 'Delete'}
@@ -15,28 +15,72 @@ const UploadPage = () => {
     const [isDragging, setIsDragging] = useState(false);
     const [analysisResult, setAnalysisResult] = useState(null);
     const [progressUpdates, setProgressUpdates] = useState([]);
-    const [currentJobId, setCurrentJobId] = useState(null);
     const navigate = useNavigate();
     const socketRef = useRef(null);
+    const currentJobIdRef = useRef(null);
+    // Sequence number of the last progress event shown, and the server stream it came from.
+    const lastSeqRef = useRef(0);
+    const streamIdRef = useRef(null);
 
     // Initialize WebSocket connection
     useEffect(() => {
         socketRef.current = io('http://127.0.0.1:5000');
+
+        const showEvents = (jobId, events, extra = []) => {
+            // Events can arrive twice around a reconnect (replay and live frame); show each once.
+            const fresh = events.filter(event => !event.seq || event.seq > lastSeqRef.current);
+            fresh.forEach(event => {
+                if (event.seq) lastSeqRef.current = event.seq;
+            });
+            if (fresh.length === 0) return;
+            setProgressUpdates(prev => [...prev, ...fresh, ...extra]);
+
+            // Auto-navigate when analysis is complete
+            if (fresh.some(event => event.type === 'complete')) {
+                setTimeout(() => {
+                    navigate(`/jobs/${jobId}`);
+                }, 2000);
+            }
+        };
         
+        socketRef.current.on('status', (data) => {
+            if (!streamIdRef.current) streamIdRef.current = data.stream_id;
+        });
+
         socketRef.current.on('connect', () => {
             console.log('Connected to server');
+            // Rejoin the job's room after a reconnect and fetch only the events missed meanwhile;
+            // the upload request joins it the first time.
+            if (currentJobIdRef.current) {
+                socketRef.current.emit('subscribe', {
+                    job_id: currentJobIdRef.current,
+                    mode: 'summary',
+                    last_seq: lastSeqRef.current,
+                    stream_id: streamIdRef.current,
+                });
+            }
         });
 
-        socketRef.current.on('progress_update', (data) => {
-            console.log('Progress update:', data);
-            setProgressUpdates(prev => [...prev, data]);
-            
-            // Auto-navigate when analysis is complete
-            if (data.type === 'complete' && currentJobId) {
-                setTimeout(() => {
-                    navigate(`/jobs/${currentJobId}`);
-                }, 2000);
+        socketRef.current.on('subscribed', (data) => {
+            const replay = data.replay;
+            if (!replay) return;
+            streamIdRef.current = replay.stream_id;
+            if (replay.reset) {
+                lastSeqRef.current = 0;
+                setProgressUpdates([]);
             }
+            const notice = replay.gap
+                ? [{ type: 'warning', message: 'Some earlier updates are no longer available.', timestamp: Date.now() / 1000 }]
+                : [];
+            showEvents(data.job_id, replay.events, notice);
+        });
+
+        // Progress arrives in coalesced frames for the job this page is watching.
+        socketRef.current.on('progress_batch', (frame) => {
+            const extra = frame.omitted > 0
+                ? [{ type: 'info', message: `...and ${frame.omitted} more updates`, timestamp: frame.timestamp }]
+                : [];
+            showEvents(frame.job_id, frame.events, extra);
         });
 
         socketRef.current.on('disconnect', () => {
@@ -48,7 +92,7 @@ const UploadPage = () => {
                 socketRef.current.disconnect();
             }
         };
-    }, [navigate, currentJobId]);
+    }, [navigate]);
 
     // Job Description File Handlers
     const handleJobDescFileChange = (e) => {
@@ -127,6 +171,7 @@ const UploadPage = () => {
         setAnalysisResult(null);
         setMessage('');
         setProgressUpdates([]);
+        lastSeqRef.current = 0;
 
         setTimeout(async () => {
             const formData = new FormData();
@@ -138,6 +183,11 @@ const UploadPage = () => {
             for (let i = 0; i < resumes.length; i++) {
                 formData.append('resumes', resumes[i]);
             }
+            // Lets the server add this page to the job's progress room before analysis starts.
+            if (socketRef.current && socketRef.current.id) {
+                formData.append('socket_id', socketRef.current.id);
+                formData.append('progress_mode', 'summary');
+            }
 
             try {
                 const response = await fetch('/api/analyze', {
@@ -147,7 +197,7 @@ const UploadPage = () => {
 
                 const data = await response.json();
                 setAnalysisResult(data);
-                setCurrentJobId(data.job_id);
+                currentJobIdRef.current = data.job_id;
 
                 if (response.ok) {
                     setMessage(`Analysis queued successfully! ${data.total_resumes} resumes are being processed in the background. You'll be redirected when complete.`);
@@ -238,7 +288,7 @@ const UploadPage = () => {
                             <div className="drop-zone-prompt">
                                 <span className="drop-zone-icon">☁️</span>
                                 <p>Drag & drop files here, or click to select files</p>
-                                <p className="file-types">Supports: .pdf, .docx, .txt</p>
+                                <p className="file-types">Supports: .pdf, .docx, .txt, or a .zip/.tar archive of them</p>
                             </div>
                         </div>
                         {resumes.length > 0 && (